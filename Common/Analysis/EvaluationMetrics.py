@@ -13,25 +13,12 @@ __maintainer__ = "Jorge"
 __email__ = "jpena@ucam.edu"
 __status__ = "Production"
 
-import sys
-import pkg_resources
-import subprocess
 import json
-
-MODULES_REQUIRED = {'numpy', 'matplotlib', 'scipy', 'scikit-plot'}
-installed = {pkg.key for pkg in pkg_resources.working_set}
-missing = MODULES_REQUIRED - installed
-if missing:
-    python = sys.executable
-    print([python, '-m', 'pip', 'install', *missing])
-    subprocess.check_call([python, '-m', 'pip', 'install', *missing], stdout=subprocess.DEVNULL)
-
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy
 import sklearn
 import scikitplot as skplt
-import tensorflow as tf
 
 from sklearn.metrics import f1_score, precision_score, recall_score, mean_absolute_error, \
     mean_squared_error, confusion_matrix, accuracy_score, roc_curve, roc_auc_score, \
@@ -40,6 +27,7 @@ from Tools.Graphics import Graphics
 from Tools.ToolsModels import is_regression_by_config, is_multiclass
 from Tools.TypeML import TypeML
 from Tools.Timer import Timer
+from Tools.sparse import issparse
 
 class EvaluationMetrics:
     DECIMALS_ROUND = 3
@@ -78,8 +66,8 @@ class EvaluationMetrics:
             print('Error: ypr must be a numpy array')
             exit()
         if not xts is None:
-            if not isinstance(xts, np.ndarray):
-                print('Error: xts must be a numpy array')
+            if not isinstance(xts, np.ndarray) and not issparse(xts):
+                print('Error: xts must be a numpy array or a sparse matrix')
                 exit()
 
     def confusion_matrix(self):
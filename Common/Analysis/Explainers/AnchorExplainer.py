@@ -28,7 +28,7 @@ class AnchorExplainer(ExplainerModel):
             predict_fn = self.model.predict
 
         #explainer = AnchorTabular(self.model.predict_proba, self.id_list, seed=self.cfg.get_args()['seed'])
-        explainer = AnchorTabular(predict_fn, self.id_list, seed=self.cfg.get_args()['seed'])
+        explainer = AnchorTabular(self.with_dtype(predict_fn), self.id_list, seed=self.cfg.get_args()['seed'])
         explainer.fit(self.xtr, disc_perc=(25, 50, 75))
 
         df_local = []
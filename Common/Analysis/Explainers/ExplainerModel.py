@@ -11,6 +11,7 @@ import numpy as np
 import pandas as pd
 from Tools.Estimators.TensorFlowEstimator import TensorFlowEstimator
 from Tools.ToolsModels import is_tf_model
+from Tools.sparse import densify
 from Common.Config.ConfigHolder import ATTR, FEATURE, MAX_IMPORTANCES, STD
 
 class ExplainerModel(abc.ABC):
@@ -18,9 +19,12 @@ class ExplainerModel(abc.ABC):
     def __init__(self, model, xtr, ytr, xts, yts, id_list, cfg, io_data, idx_xts):
         self.io_data = io_data
         self.model = model
-        self.xtr = xtr
+        # explainers work on dense data
+        self.xtr = densify(xtr)
         self.ytr = ytr
-        self.xts = xts
+        self.xts = densify(xts)
+        # perturbed samples are sent to the model with the precision of the data (--dtype)
+        self.dtype = self.xtr.dtype if self.xtr.dtype.kind == 'f' else np.float64
         self.yts = yts
         self.idx_xts = idx_xts
         self.cfg = cfg
@@ -59,6 +63,12 @@ class ExplainerModel(abc.ABC):
             errors.append(_[0] if len(_) > 0 else 0.0)
         return errors
 
+    def with_dtype(self, predict_fn):
+        """
+        Wraps a prediction function so that it receives samples with the precision of the training data
+        """
+        return lambda x: predict_fn(np.asarray(x, dtype=self.dtype))
+
     def proba_sample(self, x):
         if hasattr(self.model, 'predict_proba') and callable(self.model.predict_proba):
             return np.amax(self.model.predict_proba(np.array([x])))
@@ -89,7 +89,7 @@ class LimeExplainer(ExplainerModel):
                                                       training_labels=self.ytr,
                                                       random_state=self.random_state,
                                                       feature_selection='forward_selection')
-        return explainer, self.model.predict_proba, 5000
+        return explainer, self.with_dtype(self.model.predict_proba), 5000
 
     def lime_regression(self):
         def lime_predict(x):
@@ -100,7 +100,7 @@ class LimeExplainer(ExplainerModel):
                                                       feature_names=self.id_list,
                                                       discretize_continuous=True,
                                                       mode='regression')
-        return explainer, lime_predict, 5000
+        return explainer, self.with_dtype(lime_predict), 5000
 
     def get_feature_name(self, e):
         m = re.split('[<]+ | [>]+ | [<=]+ | [>=]+ | [=]+', e)
@@ -12,6 +12,7 @@ from tqdm import tqdm
 from pathlib import Path
 from Common.Analysis.Explainers.ExplainerModel import ExplainerModel
 from Tools.ToolsModels import get_explainer_model
+from Tools.ResourceManager import ResourceManager
 
 
 class PDPExplainer(ExplainerModel):
@@ -28,6 +29,8 @@ class PDPExplainer(ExplainerModel):
         return xtr_df
 
     def plot(self, df, method=None):
+        # cores of the model, not the whole node, when it runs in a --parallel worker
+        jobs = ResourceManager(self.cfg).cpus
         for i in tqdm(range(len(self.id_list))):
             feat = self.id_list[i]
             pdp_file = '{}{}_PDP_{}.png'.format(
@@ -36,6 +39,6 @@ class PDPExplainer(ExplainerModel):
                 self.io_data.fix_filename(feat)  # / represents a path in UNIX and breaks the filename
             )
             try:
-                Graphics().plot_pdp_ice(self.model_, df, feat, pdp_file, jobs=self.cfg.get_cores(), seed=self.random_state)
+                Graphics().plot_pdp_ice(self.model_, df, feat, pdp_file, jobs=jobs, seed=self.random_state)
             except:
                 pass
@@ -38,7 +38,7 @@ class ShapleyExplainer(ExplainerModel):
         model_fn = ripper_predict if is_ripper_model(self.model) else model_fn
 
         background = shap.maskers.Independent(self.xtr)
-        explainer = shap.Explainer(model_fn, background)
+        explainer = shap.Explainer(self.with_dtype(model_fn), background)
         self.shap_values = explainer(self.xts)
 
         added_values = np.absolute(self.shap_values.values).sum(axis=0)
@@ -1,10 +1,39 @@
-from Common.Analysis.Explainers.IntegratedGradientsExplainer import IntegratedGradientsExplainer
-from Common.Analysis.Explainers.LearningCurveExplainer import LearningCurveExplainer
-from Common.Analysis.Explainers.LimeExplainer import LimeExplainer
-from Common.Analysis.Explainers.PDPExplainer import PDPExplainer
-from Common.Analysis.Explainers.PermutationImportanceExplainer import PermutationImportanceExplainer
-from Common.Analysis.Explainers.ShapleyExplainer import ShapleyExplainer
-from Common.Analysis.Explainers.ALEExplainer import ALEExplainer
-from Common.Analysis.Explainers.DiceExplainer import DiceExplainer
-from Common.Analysis.Explainers.RFPermutationImportanceExplainer import RFPermutationImportanceExplainer
-from Common.Analysis.Explainers.AnchorExplainer import AnchorExplainer
+"""
+Registry of explainers. Every explainer depends on a heavy backend (shap, lime, alibi, dice_ml, mlxtend...),
+so modules are only imported when the method is actually run. Explainers are resolved by the name of the
+method: 'Lime' -> Common.Analysis.Explainers.LimeExplainer.LimeExplainer
+"""
+from importlib import import_module
+
+EXPLAINERS = [
+    'IntegratedGradients',
+    'LearningCurve',
+    'Lime',
+    'PDP',
+    'PermutationImportance',
+    'Shapley',
+    'ALE',
+    'Dice',
+    'RFPermutationImportance',
+    'Anchor'
+]
+
+__all__ = ['{}Explainer'.format(m) for m in EXPLAINERS] + ['get_explainer']
+
+
+def get_explainer(method):
+    """
+    Returns the explainer class of a method, importing its module on demand
+    @param method: name of the method, e.g. Lime
+    """
+    if method not in EXPLAINERS:
+        raise KeyError('Explainer not found: {}'.format(method))
+    class_name = '{}Explainer'.format(method)
+    return getattr(import_module('{}.{}'.format(__name__, class_name)), class_name)
+
+
+def __getattr__(name):
+    # keeps 'from Common.Analysis.Explainers import LimeExplainer' working
+    if name.endswith('Explainer') and name[:-len('Explainer')] in EXPLAINERS:
+        return get_explainer(name[:-len('Explainer')])
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
@@ -15,7 +15,7 @@ import pandas as pd
 import time
 from Common.Config.ConfigHolder import ATTR, FEATURE, MAX_IMPORTANCES
 from Tools.IOData import get_serialized_params
-from Common.Analysis.Explainers import *
+from Common.Analysis.Explainers import get_explainer
 from Tools.Timer import Timer
 from Tools.Graphics import Graphics
 from os.path import basename, dirname, normpath
@@ -39,6 +39,7 @@ class Interpretability:
         "RLF": [],
         "LR": [],
         "BAG": [],
+        "HGB": [],
         "VOT": []
     }
 
@@ -90,7 +91,7 @@ class Interpretability:
             new_params = params.copy()
 
         t = Timer(method)
-        obj = globals()[method + 'Explainer'](**new_params)
+        obj = get_explainer(method)(**new_params)
         df = obj.explain()
 
         if df is not None:
@@ -108,10 +109,9 @@ class Interpretability:
         io_data.print_m("{}: Total time: {} s".format(method, round(total_time, 3)))
 
     def take_data(self, xts, yts, idx, block_id, N):
-        xts_splited = [xts[x:x+N] for x in range(0, len(xts), N)]
-        yts_splited = [yts[x:x+N] for x in range(0, len(yts), N)]
-        idx_splited = [idx[x:x+N] for x in range(0, len(idx), N)]
-        return xts_splited[block_id], yts_splited[block_id], idx_splited[block_id]
+        # slices are views, so memory-mapped data (--memmap) are not loaded beyond the block
+        start = block_id * N
+        return xts[start:start+N], yts[start:start+N], idx[start:start+N]
 
     def shorten_features(self, df, method, n_features):
         if df is not None and 'PDP' not in method:
@@ -33,7 +33,7 @@ class ConfigHolder:
     F_ROC_CURVE = '{}_roc.png'
     F_CORRELATION = '{}_correlation.png'
     F_INTERPRETABILITY_TIMES = '{}_interpretability_times.png'
-    N_CORES = 8
+    N_CORES = -1  # all the cores allocated to the run
 
     def __init__(self, f_dataset, folder, args, params=None):
         """
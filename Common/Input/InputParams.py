@@ -4,6 +4,7 @@ from Tools.IOData import IOData
 from Tools.DataNormalization import DataNormalization
 from Models.Utils.CrossValidation import CrossValidation
 from Tools.DatasetBalanced import DatasetBalanced
+from Tools.BatchPredictor import BatchPredictor
 """ 
   this class is responsible for receiving json files with parameters of the option and if any is different from the
    default, will be added
@@ -11,8 +12,8 @@ from Tools.DatasetBalanced import DatasetBalanced
 
 
 class InputParams:
-    ALLOW_EXTENSIONS_DATASET = ['csv', 'pkl']
-    REGRESSION_MODELS = ['ANN', 'KNN', 'RF', 'DT', 'SVM', 'XGBOOST', 'LR', 'BAG', 'VOT']
+    ALLOW_EXTENSIONS_DATASET = ['csv', 'pkl', 'parquet', 'feather', 'npy', 'npz']
+    REGRESSION_MODELS = ['ANN', 'KNN', 'RF', 'DT', 'SVM', 'XGBOOST', 'LR', 'BAG', 'HGB', 'VOT']
 
 
     def __init__(self):
@@ -27,6 +28,24 @@ class InputParams:
             parser.error("\nfile doesn't exits {}\n".format(file_name))
         return file_name
 
+    @staticmethod
+    def read_columns(parser, columns):
+        """
+        Replaces every @file of --columns with the names in the file, one per line
+        """
+        if columns is None:
+            return None
+        names = []
+        for c in columns:
+            if not c.startswith('@'):
+                names.append(c)
+                continue
+            if not isfile(c[1:]):
+                parser.error("\nfile doesn't exits {}\n".format(c[1:]))
+            with open(c[1:]) as f:
+                names += [line.strip() for line in f if line.strip()]
+        return names
+
     def check_params(self, args, parser):
         if args.dataset is None and args.explanation is None:
             parser.error("{-d, --dataset} is compulsory when {-e, --explantion} is not present")
@@ -36,7 +55,10 @@ class InputParams:
         if args.model is not None and any(v is not None
                                           for v in [args.option, args.parameters, args.balanced, args.crossvalidation]):
             self.iodata.print_e('-m argument is not compatible with -o, -t, -p, -b and -cv')
-        
+
+        if args.stream and args.model is None:
+            self.iodata.print_e('--stream argument is only valid with -m')
+
         if args.model is None:
             opt_aux = [value for value in args.option if value in self.REGRESSION_MODELS]
             if args.regression == True:
@@ -59,9 +81,20 @@ class InputParams:
         parser = argparse.ArgumentParser(description='SIBILA', add_help=True)
         parser.add_argument('-d',
                             '--dataset',
-                            help="Dataset file in CSV or PKL format",
+                            help="Dataset file in CSV, PKL, Parquet, Feather or NumPy (npy, npz) format",
                             type=lambda s: self.file_choices(parser, self.ALLOW_EXTENSIONS_DATASET, s)
                             )
+        parser.add_argument('--columns',
+                            nargs='+',
+                            help='Features to read from the dataset. @file reads one name per line from a file',
+                            type=str)
+        parser.add_argument('--no-cache', help='Do not use the binary cache of parsed datasets (SIBILA_CACHE_DIR) nor the cache of hyperparameter searches (SIBILA_SEARCH_CACHE)', action='store_true', default=False)
+        parser.add_argument('--search-cache', help='SQLite file that keeps the scores of the hyperparameter searches, so that repeated or interrupted searches only evaluate the missing candidates (SIBILA_SEARCH_CACHE)', type=str)
+        parser.add_argument('--parallel', help='Train the models of -o at the same time, in forked processes', action='store_true', default=False)
+        parser.add_argument('--cpus', help='Cores for the run, shared by the models run with --parallel (SLURM allocation or all the cores by default)', type=int)
+        parser.add_argument('--dtype', help='Precision of the features through the whole pipeline', type=str.lower, choices=['float64', 'float32'], default='float64')
+        parser.add_argument('--sparse', help='Keep the dataset as a sparse (CSR) matrix. Sparse .npz datasets are always read as sparse', action='store_true', default=False)
+        parser.add_argument('--memmap', help='Keep the feature matrix in memory-mapped files under this folder (e.g. local scratch)', type=str)
         parser.add_argument('-o',
                             '--option',
                             nargs='+',
@@ -95,6 +128,8 @@ class InputParams:
                             type=str.upper,
                             choices=list(CrossValidation.METHODS.keys()))
         parser.add_argument('-m', '--model', help='Model(s) to predict with', type=str, nargs='+')
+        parser.add_argument('--batch-size', help='Number of samples predicted at once with -m', type=int, default=BatchPredictor.BATCH_SIZE)
+        parser.add_argument('--stream', help='Read and predict the dataset by blocks of --batch-size rows (only with -m)', action='store_true', default=False)
         parser.add_argument('-r', '--regression', help='Regression', action='store_true')
         parser.add_argument('-b',
                             '--balanced',
@@ -107,6 +142,7 @@ class InputParams:
         parser.add_argument('-e', '--explanation', help='Explain a dataset given a .pkl file', type=str)
 
         args = parser.parse_args()
+        args.columns = self.read_columns(parser, args.columns)
         self.check_params(args, parser)
         
         if args.model and not args.explanation:
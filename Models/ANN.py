@@ -19,20 +19,40 @@ from matplotlib import pyplot as plt
 import tensorflow as tf
 import numpy as np
 import pandas as pd
-from alibi.explainers import IntegratedGradients
 from Tools.ToolsModels import is_regression_by_config, make_model
 import keras_tuner as kt
 from Models.Utils.LearningHistoryCallback import LearningHistoryCallback
 from Tools.DatasetBalanced import DatasetBalanced
+from Tools.ResourceManager import ResourceManager, ENV_CPUS
+from Models.Utils.KerasFold import KerasFold
+from Models.Utils.KerasDataset import enable_xla
+from Models.Utils import KerasTuner
+from keras_tuner.distribute.utils import has_chief_oracle
+from multiprocessing import get_context
+import os
+import shutil
 
 
 PREFIX_OUT_ANN = '{}_{}_{}_{}'  # Model, Dataset, Epochs, Learning rate
 
 
+def search_worker(io_data, cfg, id_list, xtr, ytr, env):
+    """
+    Worker process of a parallel Keras Tuner search, it runs the trials given by the chief oracle
+    """
+    os.environ.update(env)
+    ANN(io_data, cfg, id_list).grid_search(xtr, ytr)
+
+
 class ANN(BaseModel):
+    ACCEPTS_SPARSE = True
+
     def __init__(self, io_data, cfg, id_list):
         super(ANN, self).__init__(io_data, cfg, id_list)
         tf.compat.v1.logging.set_verbosity(tf.compat.v1.logging.ERROR)
+        ResourceManager(cfg, tensorflow=True).configure_tensorflow()  # before the first operation of tensorflow
+        if cfg.get_params()['params'].get('xla', False):
+            enable_xla()
         self.model = make_model(cfg, id_list)
         self.graphics = Graphics()
 
@@ -105,54 +125,79 @@ class ANN(BaseModel):
 
         build_model(kt.HyperParameters())
 
-        if search_type == 'train_grid':
-            tuner = kt.Hyperband(
-                hypermodel = build_model,
-                objective = kt.HyperParameters().Choice('objective',params["objective"]),
-                executions_per_trial = params['executions_per_trial'],
-                overwrite = True,
-                seed = seed,
-                directory = self.cfg.get_folder() + "/keras_tuner_dir",
-                project_name = "sibila"
-            )
-        elif search_type == 'train_random':
-            tuner = kt.RandomSearch(
-                hypermodel = build_model,
-                objective = kt.HyperParameters().Choice('objective',params["objective"]),
-                max_trials = params['executions_per_trial'],
-                overwrite = True,
-                seed = seed,
-                directory = self.cfg.get_folder() + "/keras_tuner_dir",
-                project_name = "sibila"
-            )
-        elif search_type == 'train_bayesian':
-            tuner = kt.BayesianOptimization(
+        # the trials of a cached search are kept and the search resumes from the last finished one
+        cache = self.get_search_cache()
+        if cache is None:
+            directory, project_name, overwrite = self.cfg.get_folder() + "/keras_tuner_dir", "sibila", True
+        else:
+            directory, project_name, overwrite = cache.get_tuner_folder(), cache.get_tuner_project(
+                xtr, ytr, params=params, seed=seed, search_type=search_type, regression=is_regression_by_config(self.cfg)), False
+
+        if search_type not in KerasTuner.TUNERS:
+            self.io_data.print_e("{} method does not exist for hyperparameter tuning".format(search_type))
+
+        # trials run in local worker processes that share a chief oracle
+        n_workers, threads = 1, None
+        worker = has_chief_oracle()
+        if not worker and self.cfg.get_params()['params'].get('tuner_workers', 1) > 1:
+            if search_type in KerasTuner.PARALLEL_SEARCHES:
+                tuner_workers = self.cfg.get_params()['params']['tuner_workers']
+                n_workers, threads = ResourceManager(self.cfg, tensorflow=True).split(tuner_workers)
+                if n_workers < tuner_workers:
+                    self.io_data.print_m('tuner_workers reduced from {} to {}, there are not enough cores'.format(
+                        tuner_workers, n_workers))
+                # the number of trials of Hyperband depends on its brackets, the one of the other searches is known
+                if search_type != 'train_grid' and params['executions_per_trial'] < n_workers:
+                    n_workers = max(1, params['executions_per_trial'])
+                    self.io_data.print_m('tuner_workers reduced to {}, the number of trials'.format(n_workers))
+            else:
+                self.io_data.print_m('{} runs its trials in sequence, tuner_workers is ignored'.format(search_type))
+        if n_workers > 1 and overwrite:
+            # the project is cleared once here, the tuners must not delete the trials of each other
+            shutil.rmtree(join(directory, project_name), ignore_errors=True)
+        overwrite = overwrite and n_workers == 1 and not worker
+
+        def make_tuner():
+            trials = {'executions_per_trial': params['executions_per_trial']} if search_type == 'train_grid' \
+                else {'max_trials': params['executions_per_trial']}
+            return KerasTuner.TUNERS[search_type](
                 hypermodel = build_model,
                 objective = kt.HyperParameters().Choice('objective',params["objective"]),
-                max_trials = params['executions_per_trial'],
-                overwrite = True,
+                overwrite = overwrite,
                 seed = seed,
-                directory = self.cfg.get_folder() + "/keras_tuner_dir",
-                project_name = "sibila"
+                directory = directory,
+                project_name = project_name,
+                **trials
             )
-        else:
-            self.io_data.print_m("ERROR {} method does not exist for hyperparameter tuning".format(search_type))
+
+        def start_worker(tuner_id, port):
+            env = {**KerasTuner.tuner_env(tuner_id, port), ENV_CPUS: str(threads)}
+            p = get_context('spawn').Process(target=search_worker, args=(self.io_data, self.cfg, self.id_list, xtr, ytr, env))
+            p.start()
+            return p
 
         # handling unbalanced data if requested
         class_weights = DatasetBalanced.get_class_weights(self.model, ytr, self.cfg)
         if is_regression_by_config(self.cfg):
             class_weights = None
 
-        tuner.search(xtr, ytr, 
+        if n_workers > 1:
+            self.io_data.print_m('Keras Tuner trials in {} processes of {} threads'.format(n_workers, threads))
+        tuner = KerasTuner.search(make_tuner, xtr, ytr,
+                     start_worker = start_worker,
+                     n_workers = n_workers,
+                     batch_size = self.cfg.get_params()['params']['batch_size'],
+                     seed = seed,
                      verbose = 0,
                      epochs = params['epochs'],
-                     batch_size = self.cfg.get_params()['params']['batch_size'],
                      class_weight = class_weights,
                      callbacks = [ 
                          tf.keras.callbacks.EarlyStopping('loss', patience=params['early_stopping_patience']),
                          tf.keras.callbacks.TerminateOnNaN()
                      ]
         )
+        if worker:
+            return None, None
         return tuner.get_best_hyperparameters(num_trials=1)[0], tuner.get_best_models()[0]
     
     def train(self, xtr, ytr):
@@ -161,29 +206,53 @@ class ANN(BaseModel):
         # find the optimal hyperparameters
         bestHP, self.model = self.grid_search(xtr, ytr)
 
+        if self.cfg.get_args()['crossvalidation'] is not None:
+            self.cross_validation(xtr, ytr)
+
         # For best performance, it is recommended to retrain your Model on the full dataset
         # (https://keras.io/api/keras_tuner/tuners/base_tuner/#get_best_hyperparameters-method)
-        if self.cfg.get_args()['crossvalidation'] is None:
-            self.model_fit(xtr, ytr)
-        else:
-            # handling cross-validation
-            # cope with different parameters in each method
-            params = self.cfg.get_params()['params']
-            cv_params = {
-                'n_splits': params.get('cv_splits', CrossValidation.N_SPLITS),
-                'random_state': params.get('random_state', CrossValidation.RANDOM_STATE)
-            }
-
-            cv = CrossValidation(self.io_data)
-            method = cv.choice_method(self.cfg.get_args()['crossvalidation'])
-            cv.run_method(method, xtr, ytr, self.cv_step_fn, **cv_params)
+        # the best model of the search can be fine-tuned instead for a few epochs
+        params = self.cfg.get_params()['params']
+        self.model_fit(xtr, ytr, epochs=params.get('fine_tune_epochs') if params.get('reuse_best_model', False) else None)
         
         # append the grid search hyperparams to the output
         params = { **self.cfg.get_params()['params_grid'], **bestHP.values }
         self.cfg.set_grid_params(params)
         
-    def cv_step_fn(self, xtr, ytr, xts=None, yts=None):
-        self.model_fit(xtr, ytr)
+    def cross_validation(self, xtr, ytr):
+        """
+        Every fold trains a new network with the best hyperparameters, in parallel processes. The validation
+        predictions are saved to <prefix>_cv_predictions.csv and the aggregated scores to _data.json.
+        """
+        # cope with different parameters in each method
+        params = self.cfg.get_params()['params']
+        params_grid = self.cfg.get_params()['params_grid']
+        cv_params = {
+            'n_splits': params.get('cv_splits', CrossValidation.N_SPLITS),
+            'random_state': params.get('random_state', CrossValidation.RANDOM_STATE)
+        }
+
+        cv = CrossValidation(self.io_data)
+        method = cv.choice_method(self.cfg.get_args()['crossvalidation'])
+        n_folds = sum(1 for _ in method(xtr, ytr, **cv_params))
+        n_jobs, threads = ResourceManager(self.cfg, tensorflow=True).split(n_folds)
+
+        regression = is_regression_by_config(self.cfg)
+        class_weights = None if regression else DatasetBalanced.get_class_weights(self.model, ytr, self.cfg)
+        fit_params = {'epochs': params_grid['epochs'], 'batch_size': params['batch_size'], 'class_weight': class_weights,
+                      'validation_split': params.get('validation_split', 0), 'patience': params_grid['early_stopping_patience']}
+        fold = KerasFold(self.model, params_grid['loss_function'], params_grid['metrics'], fit_params, regression,
+                         seed=self.cfg.get_args()['seed'], threads=threads)
+
+        results = cv.run_method(method, xtr, ytr, fold, n_jobs=n_jobs, **cv_params)
+        CrossValidation.save_predictions(results, ytr, '{}_cv_predictions.csv'.format(self.cfg.get_prefix()))
+        self.cfg.get_config()['Cross_validation'] = {
+            'Method': self.cfg.get_args()['crossvalidation'],
+            'Processes': n_jobs,
+            'Threads': threads,
+            'Epochs': [r['epochs'] for r in results if r],
+            **CrossValidation.aggregate(results)
+        }
 
     def predict(self, xts):  # Make a prediction
         ypr = self.model_predict(xts)
@@ -1,15 +1,16 @@
 from Models.Utils.TrainGrid import TrainGrid
-from Models.Utils.LearningHistoryCallback import LearningHistoryCallback
 from Models.Utils.CrossValidation import CrossValidation
+from Models.Utils.SearchCache import SearchCache
 import abc
 from Tools.DatasetBalanced import DatasetBalanced
 from Tools.ToolsModels import is_tf_model, is_regression_by_config, is_xgboost_model, is_ripper_model, is_rulefit_model
-import tensorflow as tf
 import os
 from joblib import dump
 from os.path import splitext
 from joblib import load
 from Tools.IOData import IOData
+from Tools.ResourceManager import ResourceManager
+from Tools.sparse import issparse, densify, BATCH_SIZE
 import pickle
 import numpy as np
 
@@ -17,6 +18,7 @@ class BaseModel(abc.ABC):
     RANDOM_STATE = 500
     N_ITER = 4  # Number of parameter settings that are sampled. n_iter trades off runtime vs quality of the solution.
     N_JOBS = 4  # Number of jobs to run in parallel. None means 1 unless in
+    ACCEPTS_SPARSE = False  # models trained on scipy.sparse matrices, the rest receive dense data
 
     def __init__(self, io_data, cfg, id_list):
         self.io_data = io_data
@@ -48,7 +50,17 @@ class BaseModel(abc.ABC):
             return True
         return False
 
-    def model_fit(self, xtr, ytr):
+    def get_search_cache(self):
+        """
+        Cache of the scores of previous hyperparameter searches (--search-cache or SIBILA_SEARCH_CACHE), None
+        when no file is given or it is disabled with --no-cache
+        """
+        file_db = SearchCache.get_file(self.cfg.get_args().get('search_cache'))
+        if file_db is None or self.cfg.get_args().get('no_cache'):
+            return None
+        return SearchCache(file_db)
+
+    def model_fit(self, xtr, ytr, epochs=None):
         self.io_data.print_m('\n\tStart Train {}'.format(self.cfg.get_params()['model']))
 
         self.targets = np.unique(ytr).astype(str)
@@ -57,54 +69,106 @@ class BaseModel(abc.ABC):
         if is_tf_model(self.model) and is_regression_by_config(self.cfg):
             class_weights = None
 
-        if 'train_grid' in self.cfg.get_params().keys() and self.cfg.get_params()['train_grid'].upper() != "NONE":
+        searching = 'train_grid' in self.cfg.get_params().keys() and self.cfg.get_params()['train_grid'].upper() != "NONE"
+        rm = ResourceManager(self.cfg, searching=searching, tensorflow=is_tf_model(self.model))
+
+        if searching:
             cvmethod = CrossValidation(self.io_data).choice_method('GKF')
             cvarg = self.cfg.get_args()['crossvalidation']
             if cvarg is not None:
                 cv = CrossValidation(self.io_data)
                 cvmethod = cv.choice_method(self.cfg.get_args()['crossvalidation'])
 
-            train_grid = TrainGrid(cvmethod)
+            train_grid = TrainGrid(cvmethod, cache=self.get_search_cache())
 
             func = getattr(train_grid, self.cfg.get_params()['train_grid'])
             try:
-                self.cfg.get_params()['params'] = func(self.model, self.cfg.get_params()['params_grid'], xtr, ytr)
+                if not is_tf_model(self.model):
+                    # the search workers get the cores, every estimator inside them runs on one core
+                    rm.set_n_jobs(self.model, rm.search_estimator_jobs)
+                with rm.search_context():
+                    self.cfg.get_params()['params'] = func(self.model, rm.search_grid(self.cfg.get_params()['params_grid']), xtr, ytr, n_jobs=rm.search_jobs)
+                if train_grid.report:
+                    self.cfg.get_config().update(train_grid.report)
                 self.model.set_params(**self.cfg.get_params()['params'])
             except Exception as e:
                 self.io_data.print_m("ERROR No hyperparameters search will be performed for {}".format(self.cfg.get_params()['model']))
                 pass
 
         if is_tf_model(self.model):
-            self.model.fit(xtr,
-                           ytr,
-                           verbose = 1,
-                           batch_size = self.cfg.get_params()['params']['batch_size'],
-                           epochs = self.cfg.get_params()['params_grid']['epochs'],
-                           class_weight = class_weights,
-                           callbacks = [ 
-                               tf.keras.callbacks.TerminateOnNaN(),
-                               tf.keras.callbacks.ReduceLROnPlateau(),
-                               LearningHistoryCallback(self.cfg) 
-                           ]
+            import tensorflow as tf
+            from Models.Utils.LearningHistoryCallback import LearningHistoryCallback
+            from Models.Utils.KerasDataset import make_dataset, validation_split
+
+            rm.log()
+            params = self.cfg.get_params()['params']
+            epochs = epochs or self.cfg.get_params()['params_grid']['epochs']
+            callbacks = [
+                tf.keras.callbacks.TerminateOnNaN(),
+                tf.keras.callbacks.ReduceLROnPlateau(),
+                LearningHistoryCallback(self.cfg)
+            ]
+
+            # the weights of the best epoch on the validation set are kept
+            xfit, yfit, xval, yval = validation_split(xtr, ytr, params.get('validation_split', 0), seed=self.cfg.get_args()['seed'],
+                                                      stratify=not is_regression_by_config(self.cfg))
+            validation = None
+            if xval is not None:
+                validation = make_dataset(xval, yval, params['batch_size'], shuffle=False)
+                callbacks.append(tf.keras.callbacks.EarlyStopping('val_loss', patience=self.cfg.get_params()['params_grid']['early_stopping_patience'],
+                                                                  restore_best_weights=True))
+
+            history = self.model.fit(make_dataset(xfit, yfit, params['batch_size'], seed=self.cfg.get_args()['seed']),
+                                     validation_data = validation,
+                                     verbose = 1,
+                                     epochs = epochs,
+                                     class_weight = class_weights,
+                                     callbacks = callbacks
             )
+
+            # the epochs saved are counted against a training from scratch, also when the best model is fine-tuned
+            trained, maximum = len(history.epoch), self.cfg.get_params()['params_grid']['epochs']
+            self.cfg.get_config()['Epochs'] = {
+                'Maximum': maximum,
+                'Trained': trained,
+                'Best': int(np.argmin(history.history['val_loss'])) + 1 if xval is not None else trained,
+                'Saved': maximum - trained
+            }
         else:
             params_model = self.model.get_params()
             if self.__has_seed():
                 # svr and knn are the only models that do not support random_state
                 params_model['random_state'] = self.cfg.get_args()['seed']
-            if self.__has_class_weights():
+            if self.__has_class_weights() and 'class_weight' in params_model:
                 params_model['class_weight'] = class_weights
+            elif self.__has_class_weights() and class_weights and any(w != 1 for w in class_weights.values()):
+                # e.g. XGBClassifier, or HistGradientBoostingClassifier before scikit-learn 1.2
+                self.io_data.print_m('{} has no class_weight, the penalty weights are not used'.format(
+                    self.cfg.get_params()['model']))
             if is_ripper_model(self.model):
                 params_model['feature_names'] = self.id_list
 
             self.model.set_params(**params_model)
-            self.model.fit(xtr, ytr)
+            estimator_parallel = rm.set_n_jobs(self.model, rm.fit_jobs)
+            rm.log(estimator_parallel=estimator_parallel)
+            with rm.fit_context(estimator_parallel):
+                self.fit_estimator(xtr, ytr)
 
         self.io_data.print_m('End Train {}'.format(self.cfg.get_params()['model']))
 
+    def fit_estimator(self, xtr, ytr):
+        """
+        Final fit of a scikit-learn compatible model, once its hyperparameters are set. Models that need more
+        than fit(x, y), e.g. an evaluation set, override it.
+        """
+        self.model.fit(xtr, ytr)
+
     def model_predict(self, xts):
         self.io_data.print_m('\n\tStart Predict {}'.format(self.cfg.get_params()['model']))
-        ypr = self.model.predict(xts)
+        if is_tf_model(self.model) and issparse(xts):
+            ypr = np.concatenate([self.model.predict(densify(xts[i:i + BATCH_SIZE])) for i in range(0, xts.shape[0], BATCH_SIZE)])
+        else:
+            ypr = self.model.predict(xts)
         self.io_data.print_m('End Predict {}'.format(self.cfg.get_params()['model']))
         self.cfg.set_time_end()
         try:
@@ -150,6 +214,7 @@ class BaseModel(abc.ABC):
         name, extension = os.path.splitext(filename)
 
         if extension == '.h5':
+            import tensorflow as tf
             return tf.keras.models.load_model(filename)
         elif extension == '.joblib':
             return load(filename)
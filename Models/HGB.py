@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""HGB.py:
+    Histogram-based gradient boosting, for large tabular datasets. Features are binned into integer histograms,
+    which keeps memory low and training fast with millions of rows, missing values (NaN) are handled natively
+    and the number of iterations is chosen by early stopping on a validation fraction of the training set.
+"""
+from os.path import join
+from .BaseModel import BaseModel
+from Tools.TypeML import TypeML
+try:
+    from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
+except ImportError:
+    # scikit-learn < 1.0
+    from sklearn.experimental import enable_hist_gradient_boosting  # noqa: F401
+    from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
+
+PREFIX_OUT_HGB = '{}_{}_{}'  # Model, Dataset, maximum number of iterations
+
+
+class HGB(BaseModel):
+
+    def __init__(self, io_data, cfg, id_list):
+        super(HGB, self).__init__(io_data, cfg, id_list)
+
+        if self.cfg.get_params()['type_ml'].lower() == TypeML.CLASSIFICATION.value:
+            self.model = HistGradientBoostingClassifier(**self.cfg.get_params()['params'])
+        elif self.cfg.get_params()['type_ml'].lower() == TypeML.REGRESSION.value:
+            self.model = HistGradientBoostingRegressor(**self.cfg.get_params()['params'])
+        else:
+            print("Error: type_model not found ")
+            exit()
+
+    def get_prefix(self):
+        return join(
+            self.cfg.get_folder(),
+            PREFIX_OUT_HGB.format(self.cfg.get_params()['model'],
+                                  self.cfg.get_name_dataset(),
+                                  self.cfg.get_params()['params'].get('max_iter', 100)
+                                 )
+        )
+
+    def train(self, xtr, ytr):
+        self.model_fit(xtr, ytr)
+        if self.model.do_early_stopping_:
+            self.io_data.print_m('Early stopping after {} iterations'.format(self.model.n_iter_))
+        self.cfg.get_config()['Iterations'] = int(self.model.n_iter_)
+
+    def predict(self, xts):
+        ypr = self.model_predict(xts)
+        return ypr
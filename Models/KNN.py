@@ -10,6 +10,8 @@ PREFIX_OUT_KNN = '{}_{}_{}_{}'
 
 
 class KNN(BaseModel):
+    ACCEPTS_SPARSE = True
+
     def __init__(self, io_data, cfg, id_list):
         super(KNN, self).__init__(io_data, cfg, id_list)
 
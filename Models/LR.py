@@ -9,6 +9,8 @@ PREFIX_OUT_LR = '{}_{}_{}'  # Model, Dataset, numero de arboles, numero de profu
 
 
 class LR(BaseModel):
+    ACCEPTS_SPARSE = True
+
     def __init__(self, io_data, cfg, id_list):
         super(LR, self).__init__(io_data, cfg, id_list)
 
@@ -10,6 +10,8 @@ REMOVE_PARAMS_REGRESSOR = ['criterion']
 
 
 class RF(BaseModel):
+    ACCEPTS_SPARSE = True
+
     def __init__(self, io_data, cfg, id_list):
         super(RF, self).__init__(io_data, cfg, id_list)
         if self.cfg.get_params()['type_ml'].lower() == TypeML.CLASSIFICATION.value:
@@ -4,13 +4,17 @@ from .BaseModel import *
 from os.path import join
 from joblib import dump
 from Tools.TypeML import TypeML
+from Tools.Estimators.ApproximateKernelSVM import ApproximateKernelSVC, ApproximateKernelSVR
 
 #### kernel "linear", "poly", "rbf", "sigmoid", "precomputed", default="rbf"
 PREFIX_OUT_SVM = '{}_{}_{}'  # Model, Dataset, numero de arboles, numero de profundidad, RANDOM_STATE
 REMOVE_PARAMS_REGRESSOR = ['decision_function_shape', 'probability']
+APPROXIMATE_MODELS = {TypeML.CLASSIFICATION.value: ApproximateKernelSVC, TypeML.REGRESSION.value: ApproximateKernelSVR}
 
 
 class SVM(BaseModel):
+    ACCEPTS_SPARSE = True
+
     def __init__(self, io_data, cfg, id_list):
         super(SVM, self).__init__(io_data, cfg, id_list)
 
@@ -38,8 +42,26 @@ class SVM(BaseModel):
 
     def train(self, xtr, ytr):
         #self.model.fit(xtr, ytr)
+        if self.is_large(xtr):
+            self.approximate(xtr)
         self.model_fit(xtr, ytr)
 
+    def is_large(self, xtr):
+        rows = self.cfg.get_params().get('approximate_rows')
+        return rows is not None and xtr.shape[0] > rows
+
+    def approximate(self, xtr):
+        """
+        Replaces the exact SVM with an approximation of its kernel, trained with its own params and params_grid
+        (approximate_params and approximate_params_grid in the configuration)
+        """
+        self.io_data.print_m('{} rows, the kernel of the SVM is approximated'.format(xtr.shape[0]))
+        params = self.cfg.get_params()
+        params['params'] = dict(params.get('approximate_params', {}))
+        params['params_grid'] = dict(params.get('approximate_params_grid', {}))
+        self.model = APPROXIMATE_MODELS[params['type_ml'].lower()](**params['params'])
+        self.cfg.get_config()['Approximation'] = {'Rows': xtr.shape[0], 'Threshold': params['approximate_rows']}
+
     def predict(self, xts):
         ypr = self.model_predict(xts)
         return ypr
@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from sklearn import model_selection
+from sklearn import metrics
+from joblib import Parallel, delayed
 from Tools.IOData import IOData
 import numpy as np
 """
@@ -43,22 +45,73 @@ class CrossValidation:
             IOData.print_e('Invalid cross-validation method')
             exit()
 
-    def run_method(self, method, x, y, custom_fn, **kwargs):
+    def run_method(self, method, x, y, custom_fn, n_jobs=1, **kwargs):
+        """
+        Calls custom_fn(xtr, ytr, xts, yts) on every fold.
+        With n_jobs > 1 the folds run in a pool of processes: x and y are shared with the workers (large arrays
+        are memory-mapped by joblib, memory-mapped arrays are passed by reference) and every worker only slices
+        its fold, so custom_fn must be picklable.
+
+        @return: list with the value returned by custom_fn on every fold
+        """
         if method:
-            cv_idx = 1
-            for train_idx, test_idx in method(x, y, **kwargs):
-                self.io_data.print_m('\n\tRunning Cross-Validation {}'.format(cv_idx))
-                xtr, ytr = np.take(x, train_idx, axis=0), y[train_idx]
-                xts, yts = np.take(x, test_idx, axis=0), y[test_idx]
-
-                # call user function to customize every cross validation
-                custom_fn(xtr, ytr)
-                
-                cv_idx += 1            
+            folds = list(method(x, y, **kwargs))
+            if n_jobs == 1 or len(folds) == 1:
+                results = []
+                for cv_idx, (train_idx, test_idx) in enumerate(folds, 1):
+                    self.io_data.print_m('\n\tRunning Cross-Validation {}'.format(cv_idx))
+                    results.append(run_fold(custom_fn, x, y, train_idx, test_idx))
+                return results
+
+            self.io_data.print_m('\n\tRunning {} Cross-Validation folds in {} processes'.format(len(folds), n_jobs))
+            return Parallel(n_jobs=n_jobs)(delayed(run_fold)(custom_fn, x, y, train_idx, test_idx)
+                                           for train_idx, test_idx in folds)
         else:
             IOData.print_e('Invalid method object')
             exit()
 
+    @staticmethod
+    def score_fold(y, ypr, regression):
+        """
+        Validation scores of a fold
+        @param ypr: predicted classes or values
+        """
+        if regression:
+            return {
+                'R2': metrics.r2_score(y, ypr),
+                'MAE': metrics.mean_absolute_error(y, ypr),
+                'RMSE': np.sqrt(metrics.mean_squared_error(y, ypr))
+            }
+        return {
+            'Accuracy': metrics.accuracy_score(y, ypr) * 100,
+            'F1': metrics.f1_score(y, ypr, average='binary' if len(np.unique(y)) <= 2 else 'macro') * 100
+        }
+
+    @staticmethod
+    def save_predictions(results, y, file_out):
+        """
+        Saves the validation predictions of every fold to a csv file (fold, sample position, true and predicted value)
+        """
+        import pandas as pd
+        df = pd.concat([pd.DataFrame({'fold': i, 'sample': r['idx'], 'y_true': np.asarray(y)[r['idx']], 'y_pred': r['predictions']})
+                        for i, r in enumerate(results, 1) if r])
+        df.to_csv(file_out, index=False)
+
+    @staticmethod
+    def aggregate(results):
+        """
+        Mean and standard deviation of the scores of all the folds
+        @param results: list of dicts with the 'scores' of every fold
+        """
+        scores = [r['scores'] for r in results if r]
+        if not scores:
+            return {}
+        summary = {'Folds': len(scores)}
+        for k in scores[0].keys():
+            values = np.array([s[k] for s in scores], dtype=float)
+            summary[k] = {'mean': float(np.mean(values)), 'std': float(np.std(values)), 'folds': values.tolist()}
+        return summary
+
     @staticmethod
     def kfold(x, y, n_splits=5, shuffle=False, random_state=RANDOM_STATE):
         """
@@ -161,3 +214,11 @@ class CrossValidation:
         groups = np.floor(np.linspace(0, n_groups, len(y)))
         gkf = model_selection.GroupKFold(n_splits=n_splits)
         return gkf.split(x, y, groups)
+
+
+def run_fold(custom_fn, x, y, train_idx, test_idx):
+    # row indexing works on numpy arrays, memory-mapped arrays and sparse matrices
+    result = custom_fn(x[train_idx], y[train_idx], x[test_idx], y[test_idx])
+    if isinstance(result, dict):
+        result['idx'] = test_idx
+    return result
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""KerasDataset.py:
+    tf.data input pipeline of the Keras models. The features are converted into a tensor of the Keras
+    float type once, and every epoch only shuffles the row indices, gathers a whole batch at a time and
+    prefetches the next batches while the current one is trained. The tensors are shared by all the trials
+    of a Keras Tuner search.
+"""
+import os
+import numpy as np
+from sklearn.model_selection import train_test_split
+from Tools.sparse import issparse
+
+XLA_FLAG = '--tf_xla_cpu_global_jit'
+
+
+def enable_xla():
+    """
+    Compiles the clusters of the graphs with XLA, on CPU too. It must be called before the first operation of
+    tensorflow, as the flags of XLA are read when it is initialized.
+    """
+    import tensorflow as tf
+    flags = os.environ.get('TF_XLA_FLAGS', '')
+    if XLA_FLAG not in flags:
+        os.environ['TF_XLA_FLAGS'] = '{} {}'.format(flags, XLA_FLAG).strip()
+    tf.config.optimizer.set_jit(True)
+
+
+def to_tensors(x, y):
+    """
+    Features and target as tensors, so that several datasets are built without copying them again
+    @param x: numpy.ndarray or scipy.sparse matrix
+    @param y: numpy.ndarray
+    @return: tf.Tensor (tf.SparseTensor for sparse data), tf.Tensor
+    """
+    import tensorflow as tf
+    floatx = tf.keras.backend.floatx()
+    if issparse(x):
+        coo = x.tocoo()
+        x = tf.sparse.reorder(tf.SparseTensor(indices=np.column_stack([coo.row, coo.col]).astype(np.int64),
+                                              values=coo.data.astype(floatx), dense_shape=coo.shape))
+    elif not tf.is_tensor(x):
+        x = tf.constant(np.asarray(x, dtype=floatx))
+    if not tf.is_tensor(y):
+        y = tf.constant(np.asarray(y))
+    return x, y
+
+
+def make_dataset(x, y, batch_size, shuffle=True, seed=None):
+    """
+    Batched and prefetched tf.data.Dataset of (x, y) to train with model.fit
+    @param x: numpy.ndarray, scipy.sparse matrix or tensor of to_tensors, sparse data are densified one batch at a time
+    @param y: numpy.ndarray or tensor of to_tensors
+    @param batch_size: rows of every batch
+    @param shuffle: the order of the rows changes in every epoch
+    @param seed: seed of the shuffling
+    """
+    import tensorflow as tf
+    autotune = tf.data.experimental.AUTOTUNE
+    x, y = to_tensors(x, y)
+
+    if isinstance(x, tf.SparseTensor):
+        ds = tf.data.Dataset.from_tensor_slices((x, y))
+        if shuffle:
+            ds = ds.shuffle(x.shape[0], seed=seed, reshuffle_each_iteration=True)
+        ds = ds.batch(batch_size).map(lambda xb, yb: (tf.sparse.to_dense(xb), yb), num_parallel_calls=autotune)
+    else:
+        # only the indices are shuffled, the rows of a batch are gathered at once
+        ds = tf.data.Dataset.range(x.shape[0])
+        if shuffle:
+            ds = ds.shuffle(x.shape[0], seed=seed, reshuffle_each_iteration=True)
+        ds = ds.batch(batch_size).map(lambda idx: (tf.gather(x, idx), tf.gather(y, idx)), num_parallel_calls=autotune)
+
+    return ds.prefetch(autotune)
+
+
+def validation_split(x, y, fraction, seed=None, stratify=False):
+    """
+    Random hold-out of the training set to stop the training when the validation loss stops improving
+    @param fraction: part of the rows for validation, 0 keeps all of them for training
+    @param stratify: keep the proportion of every class in both parts (classification)
+    @return: xtr, ytr, xval, yval (xval and yval are None when there is no validation set)
+    """
+    n_val = int(round(x.shape[0] * fraction))
+    if n_val <= 0 or n_val >= x.shape[0]:
+        return x, y, None, None
+
+    y = np.asarray(y)
+    idx = np.arange(x.shape[0])
+    try:
+        tr, val = train_test_split(idx, test_size=n_val, random_state=seed, stratify=y if stratify else None)
+    except ValueError:
+        # a class with a single row, or fewer rows than classes in one of the parts
+        tr, val = train_test_split(idx, test_size=n_val, random_state=seed)
+    tr, val = np.sort(tr), np.sort(val)
+    return x[tr], y[tr], x[val], y[val]
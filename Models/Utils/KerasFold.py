@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""KerasFold.py:
+    Picklable cross-validation fold of a Keras model, run by CrossValidation.run_method in a pool of
+    processes. The network is rebuilt in the worker from its architecture and compile settings, trained on
+    the training part of the fold and scored on its validation part.
+"""
+import numpy as np
+from Models.Utils.CrossValidation import CrossValidation
+from Tools.sparse import densify
+from Models.Utils.KerasDataset import make_dataset, validation_split
+
+
+class KerasFold:
+
+    def __init__(self, model, loss, metrics, fit_params, regression, seed=None, threads=None):
+        """
+        @param model: compiled tf.keras model with the best hyperparameters
+        @param loss: loss function of the model
+        @param metrics: metrics of the model
+        @param fit_params: epochs, batch_size, class_weight, validation_split and patience of the training
+        @param threads: intra-op threads of tensorflow in the worker
+        """
+        import tensorflow as tf
+        self.architecture = model.to_json()
+        self.optimizer = tf.keras.optimizers.serialize(model.optimizer)
+        self.loss = loss
+        self.metrics = metrics
+        self.fit_params = fit_params
+        self.regression = regression
+        self.seed = seed
+        self.threads = threads
+
+    def build(self):
+        import tensorflow as tf
+        if self.threads:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(self.threads)
+                tf.config.threading.set_inter_op_parallelism_threads(min(2, self.threads))
+            except RuntimeError:
+                pass
+        tf.random.set_seed(self.seed)
+
+        model = tf.keras.models.model_from_json(self.architecture)
+        model.compile(optimizer=tf.keras.optimizers.deserialize(self.optimizer), loss=self.loss, metrics=self.metrics)
+        return model
+
+    def __call__(self, xtr, ytr, xts, yts):
+        import tensorflow as tf
+        model = self.build()
+
+        callbacks = [tf.keras.callbacks.TerminateOnNaN(), tf.keras.callbacks.ReduceLROnPlateau()]
+        xfit, yfit, xval, yval = validation_split(xtr, ytr, self.fit_params.get('validation_split', 0), seed=self.seed,
+                                                  stratify=not self.regression)
+        validation = None
+        if xval is not None:
+            validation = make_dataset(xval, yval, self.fit_params['batch_size'], shuffle=False)
+            callbacks.append(tf.keras.callbacks.EarlyStopping('val_loss', patience=self.fit_params['patience'], restore_best_weights=True))
+
+        history = model.fit(make_dataset(xfit, yfit, self.fit_params['batch_size'], seed=self.seed),
+                            validation_data=validation,
+                            verbose=0,
+                            epochs=self.fit_params['epochs'],
+                            class_weight=self.fit_params['class_weight'],
+                            callbacks=callbacks)
+
+        ypr = model.predict(densify(xts))
+        ypr = np.squeeze(ypr) if self.regression else np.argmax(ypr, axis=1)
+        return {'predictions': ypr, 'scores': CrossValidation.score_fold(yts, ypr, self.regression), 'epochs': len(history.epoch)}
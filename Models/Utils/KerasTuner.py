@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""KerasTuner.py:
+    Keras Tuner searches of the ANN model. Every trial restarts the random state of tensorflow and builds its
+    own input pipeline from the shared tensors, so its score only depends on its hyperparameters and not on
+    the trials run before it. This makes the trials of a search independent of the order in which they are
+    run, which allows to run them in local worker processes that pull trials from a chief oracle
+    (distributed mode of Keras Tuner, configured through the KERASTUNER_* environment variables).
+
+    The chief oracle of Keras Tuner checks every 30 seconds whether the workers have finished and waits 10 more
+    seconds to stop its server, so a parallel search takes up to 40 seconds longer than its trials. It only
+    pays off for searches of several minutes, ANN never starts more workers than trials.
+"""
+import os
+import socket
+import threading
+from contextlib import contextmanager
+import keras_tuner as kt
+from Models.Utils.KerasDataset import make_dataset, to_tensors
+
+LOCALHOST = '127.0.0.1'
+# the oracle of these tuners does not depend on the order in which the trials finish
+PARALLEL_SEARCHES = ['train_random', 'train_grid']
+
+
+class SeededTrials:
+    """
+    Trials that run with the same random state. search() receives the tensors of KerasDataset.to_tensors plus
+    batch_size and seed instead of a dataset.
+    """
+
+    def run_trial(self, trial, x, y, batch_size=None, seed=None, **kwargs):
+        import tensorflow as tf
+        tf.random.set_seed(seed)
+        return super().run_trial(trial, make_dataset(x, y, batch_size, seed=seed), **kwargs)
+
+
+class RandomSearch(SeededTrials, kt.RandomSearch):
+    pass
+
+
+class Hyperband(SeededTrials, kt.Hyperband):
+    pass
+
+
+class BayesianOptimization(SeededTrials, kt.BayesianOptimization):
+    pass
+
+
+TUNERS = {
+    'train_grid': Hyperband,
+    'train_random': RandomSearch,
+    'train_bayesian': BayesianOptimization
+}
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((LOCALHOST, 0))
+        return s.getsockname()[1]
+
+
+def tuner_env(tuner_id, port):
+    """
+    Environment variables of a tuner in distributed mode
+    @param tuner_id: 'chief' for the oracle, any other name for the workers
+    """
+    return {
+        'KERASTUNER_TUNER_ID': tuner_id,
+        'KERASTUNER_ORACLE_IP': LOCALHOST,
+        'KERASTUNER_ORACLE_PORT': str(port)
+    }
+
+
+@contextmanager
+def environ(env):
+    old = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        for k, v in old.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def search(make_tuner, x, y, start_worker=None, n_workers=1, **kwargs):
+    """
+    Runs a search and returns the tuner that holds its results
+    @param make_tuner: function that builds the tuner, it is called in every worker too
+    @param start_worker: function(tuner_id, port) that starts a worker process and returns it
+    @param n_workers: worker processes, 1 runs the trials in this process
+    @param kwargs: parameters of model.fit (epochs, callbacks, class_weight...) plus batch_size and seed
+    """
+    if n_workers <= 1:
+        tuner = make_tuner()
+        tuner.search(*to_tensors(x, y), **kwargs)
+        return tuner
+
+    port = free_port()
+    workers = [start_worker('tuner{}'.format(i), port) for i in range(n_workers)]
+
+    # the chief oracle is served by the constructor of the tuner until the workers are told to stop
+    chief = {}
+    with environ(tuner_env('chief', port)):
+        thread = threading.Thread(target=lambda: chief.update(tuner=make_tuner()), daemon=True)
+        thread.start()
+        for w in workers:
+            w.join()
+        failed = [w.exitcode for w in workers if w.exitcode != 0]
+        if failed:
+            raise RuntimeError('{} Keras Tuner workers failed (exit codes {})'.format(len(failed), failed))
+        thread.join()
+
+    return chief['tuner']
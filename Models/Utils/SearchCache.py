@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""SearchCache.py:
+    SQLite store of the cross-validation scores of every candidate of a hyperparameter search, so that
+    repeated experiments, or experiments run again after a timeout, only evaluate the candidates that
+    were never scored.
+
+    A search is keyed by the hash of the training data, the estimator and its fixed parameters, the
+    cross-validation method, the number of splits, the seed and the scorer. Every candidate is keyed by its
+    parameter set. Scores are written after every block of candidates, so an interrupted search resumes
+    from the last finished block.
+
+    Keras Tuner searches are resumed from a persistent tuner folder next to the SQLite file, with a project
+    per training data, search space and seed.
+
+    The cache is opt-in: it is only used when a file is given with --search-cache or SIBILA_SEARCH_CACHE.
+    Nothing is evicted from it, the file and its tuner folder are removed by hand.
+
+    Environment variables:
+        SIBILA_SEARCH_CACHE: SQLite file of the cache when --search-cache is not given
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import closing
+from os.path import join, dirname, abspath, expanduser
+import numpy as np
+from scipy import sparse
+
+# parameters that do not change the scores
+IGNORED_PARAMS = ['n_jobs', 'verbose']
+ENV_SEARCH_CACHE = 'SIBILA_SEARCH_CACHE'
+
+
+class SearchCache:
+    HASH_ROWS = 4096
+    TIMEOUT = 60  # seconds waiting for the lock of other processes
+
+    def __init__(self, file_db):
+        """
+        @param file_db: SQLite file of the cache, it is created if it does not exist
+        """
+        self.file_db = abspath(expanduser(file_db))
+        os.makedirs(dirname(self.file_db), exist_ok=True)
+        self.execute('CREATE TABLE IF NOT EXISTS scores (search TEXT, params TEXT, mean REAL, std REAL, '
+                     'PRIMARY KEY (search, params))')
+
+    @staticmethod
+    def get_file(file_db=None):
+        """
+        @return: file of the cache given by the argument or the environment, None when the cache is not used
+        """
+        return file_db or os.getenv(ENV_SEARCH_CACHE) or None
+
+    def execute(self, sql, params=(), many=False):
+        # a connection per operation, so that forked processes never share one
+        with closing(sqlite3.connect(self.file_db, timeout=self.TIMEOUT)) as conn:
+            with conn:
+                if many:
+                    conn.executemany(sql, params)
+                    return []
+                return conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def params_key(params):
+        return json.dumps(params, sort_keys=True, default=str)
+
+    @staticmethod
+    def data_hash(x, y):
+        """
+        Hash of the training data, computed by blocks of rows so that memory-mapped matrices are not loaded
+        """
+        sha = hashlib.sha1()
+        sha.update('{}{}'.format(x.shape, x.dtype).encode())
+        if sparse.issparse(x):
+            x = x.tocsr()
+            for a in [x.data, x.indices, x.indptr]:
+                sha.update(np.ascontiguousarray(a).tobytes())
+        else:
+            for i in range(0, x.shape[0], SearchCache.HASH_ROWS):
+                sha.update(np.ascontiguousarray(x[i:i + SearchCache.HASH_ROWS]).tobytes())
+        sha.update(np.ascontiguousarray(y).tobytes())
+        return sha.hexdigest()
+
+    def get_key(self, model, candidates, x, y, cv, n_split, random_state, scoring):
+        """
+        @param model: estimator of the search
+        @param candidates: list of parameter sets, their keys are not part of the fixed parameters of the model
+        @param cv: cross-validation method of CrossValidation
+        """
+        searched = set(k for c in candidates for k in c.keys())
+        fixed = {k: v for k, v in model.get_params(deep=False).items() if k not in searched and k not in IGNORED_PARAMS}
+        search = {
+            'data': self.data_hash(x, y),
+            'model': '{}.{}'.format(type(model).__module__, type(model).__name__),
+            'params': fixed,
+            'cv': getattr(cv, '__name__', str(cv)),
+            'n_split': n_split,
+            'seed': random_state,
+            'scoring': scoring
+        }
+        return hashlib.sha1(self.params_key(search).encode()).hexdigest()
+
+    def get(self, key):
+        """
+        @return: dict parameter set (params_key) -> mean score of the cross-validation
+        """
+        rows = self.execute('SELECT params, mean FROM scores WHERE search = ?', (key,))
+        return {params: np.nan if mean is None else mean for params, mean in rows}
+
+    def put(self, key, results):
+        """
+        @param results: cv_results_ of a search
+        @return: dict parameter set (params_key) -> mean score of the cross-validation
+        """
+        rows = [(key, self.params_key(p), float(mean), float(std)) for p, mean, std in
+                zip(results['params'], results['mean_test_score'], results['std_test_score'])]
+        self.execute('INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?)', rows, many=True)
+        return {params: mean for _, params, mean, _ in rows}
+
+    def get_tuner_folder(self):
+        return join(dirname(self.file_db), 'keras_tuner')
+
+    def get_tuner_project(self, x, y, **search):
+        """
+        Keras Tuner project of a search on the given training data
+        @param search: search space, seed and any other option of the tuner
+        """
+        search['data'] = self.data_hash(x, y)
+        return hashlib.sha1(self.params_key(search).encode()).hexdigest()
@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""SearchEvaluators.py:
+    Model-specific evaluators used by TrainGrid instead of GridSearchCV when the candidates of a search can
+    share work. An evaluator groups the candidates that are scored together and returns the same scores as
+    a cross-validated search, in the format of cv_results_ (params, mean_test_score, std_test_score).
+
+    EnsembleSizeEvaluator: candidates that only differ in n_estimators (RF, BAG, XGBOOST) train the largest
+    ensemble once per fold and score the smaller ones as prefixes of it. Linear boosters (gblinear) and bagging
+    with oob_score cannot be scored as prefixes, their candidates are regular fits.
+    NeighborsEvaluator: candidates of KNN that only differ in n_neighbors, weights, algorithm or leaf_size
+    query the k_max nearest neighbors once per fold and vote with every k and weighting from that table.
+    Neighbors at the same distance as the k-th one may be taken in a different order than a query of k.
+    KernelEvaluator: candidates of SVM with the same kernel (kernel, gamma, degree, coef0) compute the Gram
+    matrices of every fold once, keep them in a bounded LRU cache and fit every C, tol... as precomputed-kernel
+    SVMs, one fold at a time. Folds whose Gram matrices do not fit in the cache are scored with regular fits.
+    RegularizationPathEvaluator: candidates of LR that only differ in C are solved from strong to weak
+    regularization on every fold, each fit warm-started from the coefficients of the previous one. It is only
+    used by TrainGrid.train_path, since warm starts may stop at a slightly different solution.
+
+    Environment variables:
+        SIBILA_GRAM_CACHE_SIZE: maximum size of the cache of Gram matrices in GB (1 by default)
+"""
+import os
+from collections import OrderedDict
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, r2_score
+from sklearn.metrics.pairwise import linear_kernel, polynomial_kernel, rbf_kernel, sigmoid_kernel
+from sklearn.neighbors import NearestNeighbors
+from scipy import sparse
+from Tools.ToolsModels import is_regression, is_xgboost_model
+from Models.Utils.SearchCache import SearchCache
+
+
+def score(model, x, y, ypr):
+    """ Default score of the estimator: R2 for regression, accuracy for classification """
+    return r2_score(y, ypr) if is_regression(model) else accuracy_score(y, ypr)
+
+
+class BaseEvaluator:
+    PARAMS = []  # parameters whose values are scored together
+
+    def __init__(self, model):
+        self.params = model.get_params()
+
+    @classmethod
+    def accepts(cls, model, candidates):
+        return False
+
+    def group_key(self, candidate):
+        return SearchCache.params_key({k: v for k, v in candidate.items() if k not in self.PARAMS})
+
+    def group(self, candidates):
+        """
+        @return: lists of candidates that only differ in PARAMS
+        """
+        groups = {}
+        for c in candidates:
+            groups.setdefault(self.group_key(c), []).append(c)
+        return list(groups.values())
+
+    def evaluate(self, model, candidates, x, y, folds, n_jobs):
+        """
+        @param folds: list of (train_idx, test_idx)
+        @return: dict in the format of cv_results_
+        """
+        groups = self.group(candidates)
+        tasks = [(g, train_idx, test_idx) for g in groups for train_idx, test_idx in folds]
+        fold_scores = Parallel(n_jobs=n_jobs)(delayed(self.fit_fold)(clone(model), g, x, y, train_idx, test_idx)
+                                              for g, train_idx, test_idx in tasks)
+        return self.collect([c for g in groups for c in g], [(g, s) for (g, _, _), s in zip(tasks, fold_scores)])
+
+    @staticmethod
+    def collect(params, fold_scores):
+        """
+        @param params: candidates of the search
+        @param fold_scores: list of (candidates, score of every candidate on a fold)
+        """
+        scores = {}
+        for g, s in fold_scores:
+            for c, v in zip(g, s):
+                scores.setdefault(SearchCache.params_key(c), []).append(v)
+
+        values = [np.array(scores[SearchCache.params_key(c)], dtype=float) for c in params]
+        return {
+            'params': params,
+            'mean_test_score': np.array([np.mean(v) for v in values]),
+            'std_test_score': np.array([np.std(v) for v in values])
+        }
+
+    def fit_fold(self, model, candidates, x, y, train_idx, test_idx):
+        """
+        @return: score of every candidate on the fold
+        """
+        raise NotImplementedError
+
+
+class EnsembleSizeEvaluator(BaseEvaluator):
+    PARAMS = ['n_estimators']
+
+    def __init__(self, model):
+        super(EnsembleSizeEvaluator, self).__init__(model)
+        self.model_name = type(model).__name__
+
+    @classmethod
+    def accepts(cls, model, candidates):
+        params = model.get_params()
+        if 'n_estimators' not in params or not ('warm_start' in params or is_xgboost_model(model)):
+            return False
+        return all('n_estimators' in c for c in candidates) and len(set(c['n_estimators'] for c in candidates)) > 1
+
+    def group_key(self, candidate):
+        if not self.shares_fit(candidate):
+            return SearchCache.params_key(candidate)
+        return super(EnsembleSizeEvaluator, self).group_key(candidate)
+
+    def shares_fit(self, candidate):
+        """
+        @return: False when the candidate cannot be scored as a prefix of a larger ensemble, it is a regular fit
+        """
+        params = {**self.params, **candidate}
+        # a linear booster updates every weight in every round and ignores iteration_range
+        if params.get('booster') == 'gblinear':
+            return False
+        # bagging has no out-of-bag estimate with warm_start
+        return not (params.get('oob_score', False) and 'Bagging' in self.model_name)
+
+    def fit_fold(self, model, candidates, x, y, train_idx, test_idx):
+        sizes = [c['n_estimators'] for c in candidates]
+        fixed = {k: v for k, v in candidates[0].items() if k not in self.PARAMS}
+        xtr, ytr, xts, yts = x[train_idx], y[train_idx], x[test_idx], y[test_idx]
+        # a wrong parameter name is an error of the configuration, it is not scored
+        model.set_params(**fixed)
+        if len(set(sizes)) > 1:
+            try:
+                return self.fit_prefixes(model, sizes, xtr, ytr, xts, yts)
+            except Exception:
+                # the candidates are scored one by one, only the ones that fail on their own get NaN
+                model = clone(model).set_params(warm_start=False) if 'warm_start' in self.params else clone(model)
+        return [self.fit_size(clone(model), k, xtr, ytr, xts, yts) for k in sizes]
+
+    def fit_prefixes(self, model, sizes, xtr, ytr, xts, yts):
+        scores = {}
+        if is_xgboost_model(model):
+            # boosting rounds: the first k rounds of the largest model are the model with k rounds
+            model.set_params(n_estimators=max(sizes)).fit(xtr, ytr)
+            for k in sorted(set(sizes)):
+                scores[k] = score(model, xts, yts, self.predict_rounds(model, xts, k))
+        else:
+            # warm start adds the trees of every larger size to the ones already trained
+            model.set_params(warm_start=True)
+            for k in sorted(set(sizes)):
+                model.set_params(n_estimators=k).fit(xtr, ytr)
+                scores[k] = score(model, xts, yts, model.predict(xts))
+        return [scores[k] for k in sizes]
+
+    @staticmethod
+    def fit_size(model, k, xtr, ytr, xts, yts):
+        try:
+            model.set_params(n_estimators=k).fit(xtr, ytr)
+            return score(model, xts, yts, model.predict(xts))
+        except Exception:
+            # same as error_score=np.nan in GridSearchCV
+            return np.nan
+
+    @staticmethod
+    def predict_rounds(model, x, k):
+        try:
+            return model.predict(x, iteration_range=(0, k))
+        except TypeError:
+            # xgboost < 1.4
+            return model.predict(x, ntree_limit=k)
+
+
+class NeighborsEvaluator(BaseEvaluator):
+    # algorithm and leaf_size only change the speed of the queries, not the neighbors
+    PARAMS = ['n_neighbors', 'weights', 'algorithm', 'leaf_size']
+    WEIGHTS = ['uniform', 'distance']
+
+    @classmethod
+    def accepts(cls, model, candidates):
+        if 'KNeighbors' not in str(model) or len(candidates) <= 1:
+            return False
+        return all(c.get('weights', model.get_params()['weights']) in cls.WEIGHTS for c in candidates)
+
+    def fit_fold(self, model, candidates, x, y, train_idx, test_idx):
+        xtr, ytr, xts, yts = x[train_idx], y[train_idx], x[test_idx], y[test_idx]
+        params = model.set_params(**{k: v for k, v in candidates[0].items() if k not in self.PARAMS}).get_params()
+        ks = [c.get('n_neighbors', params['n_neighbors']) for c in candidates]
+        k_max = min(max(ks), xtr.shape[0])
+
+        try:
+            nn = NearestNeighbors(n_neighbors=k_max, metric=params['metric'], p=params['p'],
+                                  metric_params=params['metric_params'], n_jobs=params['n_jobs'])
+            dist, ind = nn.fit(xtr).kneighbors(xts)
+        except Exception:
+            return [np.nan] * len(candidates)
+
+        regression = is_regression(model)
+        if regression:
+            targets = np.asarray(ytr, dtype=float)[ind]
+        else:
+            classes, ytr_idx = np.unique(ytr, return_inverse=True)
+            targets = ytr_idx[ind]
+
+        scores = []
+        for c, k in zip(candidates, ks):
+            if k > k_max:
+                scores.append(np.nan)
+                continue
+            weights = self.get_weights(dist[:, :k], c.get('weights', params['weights']))
+            if regression:
+                ypr = (targets[:, :k] * weights).sum(axis=1) / weights.sum(axis=1)
+            else:
+                votes = np.zeros((xts.shape[0], len(classes)))
+                for j in range(k):
+                    votes[np.arange(xts.shape[0]), targets[:, j]] += weights[:, j]
+                ypr = classes[votes.argmax(axis=1)]  # ties go to the smallest class, as in scikit-learn
+            scores.append(score(model, xts, yts, ypr))
+        return scores
+
+    @staticmethod
+    def get_weights(dist, weights):
+        if weights == 'uniform':
+            return np.ones(dist.shape)
+        # distance: neighbors at distance 0 get all the weight, as in scikit-learn
+        with np.errstate(divide='ignore'):
+            w = 1. / dist
+        inf_rows = np.isinf(w).any(axis=1)
+        w[inf_rows] = np.isinf(w[inf_rows])
+        return w
+
+
+class GramCache:
+    """ Gram matrices of the folds, the least recently used ones are removed over the size limit """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.items = OrderedDict()
+
+    def get(self, key):
+        if key in self.items:
+            self.items.move_to_end(key)
+            return self.items[key]
+        return None
+
+    def put(self, key, grams):
+        nbytes = sum(g.nbytes for g in grams)
+        if nbytes > self.max_size:
+            return False
+        while self.size + nbytes > self.max_size:
+            _, old = self.items.popitem(last=False)
+            self.size -= sum(g.nbytes for g in old)
+        self.items[key] = grams
+        self.size += nbytes
+        return True
+
+
+class KernelEvaluator(BaseEvaluator):
+    KERNELS = {
+        'linear': (linear_kernel, []),
+        'poly': (polynomial_kernel, ['degree', 'gamma', 'coef0']),
+        'rbf': (rbf_kernel, ['gamma']),
+        'sigmoid': (sigmoid_kernel, ['gamma', 'coef0'])
+    }
+    DEFAULT_CACHE_GB = 1
+
+    def __init__(self, model):
+        super(KernelEvaluator, self).__init__(model)
+        self.cache = GramCache(float(os.getenv('SIBILA_GRAM_CACHE_SIZE', self.DEFAULT_CACHE_GB)) * 1024 ** 3)
+
+    @classmethod
+    def accepts(cls, model, candidates):
+        if type(model).__name__ not in ['SVC', 'SVR'] or len(candidates) <= 1:
+            return False
+        return all(c.get('kernel', model.get_params()['kernel']) in cls.KERNELS for c in candidates)
+
+    def get_kernel(self, candidate):
+        """
+        @return: kernel name and the parameters that define its Gram matrix
+        """
+        params = {**self.params, **candidate}
+        return params['kernel'], {k: params[k] for k in self.KERNELS[params['kernel']][1]}
+
+    def group_key(self, candidate):
+        return SearchCache.params_key(self.get_kernel(candidate))
+
+    @staticmethod
+    def get_gamma(gamma, x):
+        # same values as scikit-learn computes on the training data
+        if gamma == 'scale':
+            var = (x.multiply(x)).mean() - x.mean() ** 2 if sparse.issparse(x) else x.var()
+            return 1.0 / (x.shape[1] * var) if var != 0 else 1.0
+        if gamma == 'auto':
+            return 1.0 / x.shape[1]
+        return gamma
+
+    def get_grams(self, candidate, x, fold, train_idx, test_idx):
+        kernel, kernel_params = self.get_kernel(candidate)
+        key = (fold, SearchCache.params_key([kernel, kernel_params]))
+        grams = self.cache.get(key)
+        if grams is None:
+            xtr, xts = x[train_idx], x[test_idx]
+            if 'gamma' in kernel_params:
+                kernel_params['gamma'] = self.get_gamma(kernel_params['gamma'], xtr)
+            func = self.KERNELS[kernel][0]
+            grams = (func(xtr, xtr, **kernel_params), func(xts, xtr, **kernel_params))
+            if not self.cache.put(key, grams):
+                return None
+        return grams
+
+    def evaluate(self, model, candidates, x, y, folds, n_jobs):
+        groups = self.group(candidates)
+        fold_scores = []
+        parallel = Parallel(n_jobs=n_jobs)
+        for g in groups:
+            # one fold at a time, so no Gram matrices are held besides the ones of the cache
+            for fold, (train_idx, test_idx) in enumerate(folds):
+                # estimated size of the Gram matrices of the fold
+                if (len(train_idx) + len(test_idx)) * len(train_idx) * 8 <= self.cache.max_size:
+                    grams = self.get_grams(g[0], x, fold, train_idx, test_idx)
+                else:
+                    grams = None
+
+                # large Gram matrices are memory-mapped by joblib and shared with the workers
+                scores = parallel(delayed(self.fit_candidate)(clone(model), c, grams, x, y, train_idx, test_idx) for c in g)
+                fold_scores += [([c], [s]) for c, s in zip(g, scores)]
+                grams = None
+        return self.collect([c for g in groups for c in g], fold_scores)
+
+    @staticmethod
+    def fit_candidate(model, candidate, grams, x, y, train_idx, test_idx):
+        ytr, yts = y[train_idx], y[test_idx]
+        try:
+            if grams is None:
+                model.set_params(**candidate).fit(x[train_idx], ytr)
+                return score(model, None, yts, model.predict(x[test_idx]))
+            model.set_params(**candidate).set_params(kernel='precomputed').fit(grams[0], ytr)
+            return score(model, None, yts, model.predict(grams[1]))
+        except Exception:
+            return np.nan
+
+
+class RegularizationPathEvaluator(BaseEvaluator):
+    PARAMS = ['C']
+    # liblinear ignores warm_start
+    WARM_START_SOLVERS = ['lbfgs', 'newton-cg', 'sag', 'saga']
+
+    @classmethod
+    def accepts(cls, model, candidates):
+        return type(model).__name__ == 'LogisticRegression'
+
+    def fit_fold(self, model, candidates, x, y, train_idx, test_idx):
+        xtr, ytr, xts, yts = x[train_idx], y[train_idx], x[test_idx], y[test_idx]
+        path = sorted(set(c.get('C', self.params['C']) for c in candidates))
+        scores = {}
+        model.set_params(**{k: v for k, v in candidates[0].items() if k not in self.PARAMS}).set_params(warm_start=True)
+        for C in path:
+            try:
+                model.set_params(C=C).fit(xtr, ytr)
+                scores[C] = score(model, xts, yts, model.predict(xts))
+            except Exception:
+                scores[C] = np.nan
+        return [scores[c.get('C', self.params['C'])] for c in candidates]
+
+
+# evaluators chosen automatically by get_evaluator, the rest are only used by their own search mode
+EVALUATORS = [EnsembleSizeEvaluator, NeighborsEvaluator, KernelEvaluator]
+
+
+def get_evaluator(model, candidates):
+    """
+    @return: evaluator for the candidates of the model, None if they are scored with GridSearchCV
+    """
+    for evaluator in EVALUATORS:
+        if evaluator.accepts(model, candidates):
+            return evaluator(model)
+    return None
@@ -1,7 +1,14 @@
 from sklearn.model_selection import RandomizedSearchCV
 from sklearn.model_selection import GridSearchCV
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401, required by scikit-learn < 2
+from sklearn.model_selection import HalvingRandomSearchCV
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+from joblib import effective_n_jobs
+import numpy as np
 from .CrossValidation import CrossValidation
 from Models.Utils.CrossValidation import CrossValidation
+from Models.Utils.SearchCache import SearchCache
+from Models.Utils.SearchEvaluators import get_evaluator, RegularizationPathEvaluator
 from Tools.ToolsModels import is_regression, is_rulefit_model
 
 
@@ -10,10 +17,18 @@ class TrainGrid:
     N_ITER = 4  # Number of parameter settings that are sampled. n_iter trades off runtime vs quality of the solution.
     N_JOBS = 4  # Number of jobs to run in parallel. None means 1 unless in
     N_SPLIT = 5  # Number of jobs to run in parallel. None means 1 unless in
+    FACTOR = 3  # Successive halving: only 1/FACTOR of the candidates are promoted to the next iteration
+    N_ESTIMATORS = 100  # trees of the ensembles whose n_estimators is None (xgboost >= 2)
 
 
-    def __init__(self, cv):
+    def __init__(self, cv, cache=None):
+        """
+        @param cv: cross-validation method of CrossValidation
+        @param cache: SearchCache with the scores of previous searches, None to always run the full search
+        """
         self.cv = cv
+        self.cache = cache
+        self.report = None  # summary of the search saved in _data.json, set by the searches that have one
 
     def get_scorer(self, model):
         if is_regression(model):
@@ -30,6 +45,64 @@ class TrainGrid:
         print('Mean test score:', src.cv_results_['mean_test_score'])
         print("__________-")
 
+    def use_candidates(self, model, candidates):
+        """
+             The candidates are scored by search_candidates when there is a cache or an evaluator for the model,
+             otherwise by a single GridSearchCV or RandomizedSearchCV
+        """
+        return self.cache is not None or get_evaluator(model, candidates) is not None
+
+    def search_candidates(self, model, candidates, xtr, ytr, n_split, n_jobs, random_state, evaluator=None):
+        """
+             Scores only the candidates that are not in the cache, with the evaluator of the model when it has one.
+             With a cache the candidates are scored by blocks of as many groups as jobs and the scores of every
+             block are saved as soon as it finishes.
+        """
+        scoring = self.get_scorer(model)
+        key, scores = None, {}
+        if self.cache is not None:
+            key = self.cache.get_key(model, candidates, xtr, ytr, self.cv, n_split, random_state, scoring)
+            scores = self.cache.get(key)
+        pending = [c for c in candidates if SearchCache.params_key(c) not in scores]
+        if self.cache is not None:
+            print('{} of {} candidates found in the search cache'.format(len(candidates) - len(pending), len(candidates)))
+
+        evaluator = evaluator or get_evaluator(model, pending)
+        groups = evaluator.group(pending) if evaluator is not None else [[c] for c in pending]
+        block = effective_n_jobs(n_jobs) if key is not None else len(groups)
+        for i in range(0, len(groups), max(1, block)):
+            block_candidates = [c for g in groups[i:i + block] for c in g]
+            folds = list(self.cv(xtr, ytr, n_splits=n_split, random_state=random_state))
+            if evaluator is not None:
+                results = evaluator.evaluate(model, block_candidates, xtr, ytr, folds, n_jobs)
+            else:
+                src = GridSearchCV(
+                    model,
+                    param_grid = [{k: [v] for k, v in c.items()} for c in block_candidates],
+                    n_jobs = n_jobs,
+                    scoring = scoring,
+                    cv = folds,
+                    refit = False,
+                    verbose = 1
+                )
+                src.fit(xtr, ytr)
+                results = src.cv_results_
+
+            if key is not None:
+                scores.update(self.cache.put(key, results))
+            else:
+                scores.update({SearchCache.params_key(p): m for p, m in zip(results['params'], results['mean_test_score'])})
+
+        mean_scores = np.array([scores[SearchCache.params_key(c)] for c in candidates], dtype=float)
+        best = int(np.nanargmax(mean_scores)) if not np.all(np.isnan(mean_scores)) else 0
+        self.mean_scores = mean_scores
+        print("__________-")
+        print('Best score across searched params:', mean_scores[best])
+        print('Best parameters across searched params:', candidates[best])
+        print('Mean test score:', mean_scores)
+        print("__________-")
+        return candidates[best]
+
     def train_random(
             self,
             model,
@@ -45,6 +118,10 @@ class TrainGrid:
         """
               with the random parameters it generates several runs by mixing them randomly
         """
+        candidates = list(ParameterSampler(grid_parameters, n_iter, random_state=random_state))
+        if self.use_candidates(model, candidates):
+            return self.search_candidates(model, candidates, xtr, ytr, n_split, n_jobs, random_state)
+
         random_src = RandomizedSearchCV(
                          model,
                          param_distributions = grid_parameters,
@@ -73,6 +150,10 @@ class TrainGrid:
         """
              With the grid parameters generates as many runs as possible combinations to find the best
         """
+        candidates = list(ParameterGrid(grid_parameters))
+        if self.use_candidates(model, candidates):
+            return self.search_candidates(model, candidates, xtr, ytr, n_split, n_jobs, random_state)
+
         grid_src = GridSearchCV(
             model,
             param_grid = grid_parameters,
@@ -86,3 +167,101 @@ class TrainGrid:
         self.print_search(grid_src)
         return grid_src.best_params_
 
+    def train_halving(self,
+                      model,
+                      grid_parameters,
+                      xtr,
+                      ytr,
+                      n_iter=N_ITER,
+                      n_split=N_SPLIT,
+                      n_jobs=N_JOBS,
+                      verbose=0,
+                      random_state=RANDOM_STATE,
+                      factor=FACTOR):
+        """
+             Successive halving: many candidates sampled from the grid are trained on a small budget and only the
+             best 1/factor of them are promoted to the next iteration, which has factor times more budget.
+             The budget is the number of trees for ensembles whose grid does not set n_estimators, otherwise the
+             number of samples. n_iter is not used, the number of candidates is computed from the budget.
+             The final model keeps its own number of trees, the reduced budgets are only used by the search.
+        """
+        if 'n_estimators' in model.get_params() and 'n_estimators' not in grid_parameters:
+            n_estimators = model.get_params()['n_estimators'] or self.N_ESTIMATORS
+            resource, max_resources = 'n_estimators', max(n_estimators, factor ** 2)
+            min_resources = max(1, max_resources // factor ** 2)
+        else:
+            resource, max_resources, min_resources = 'n_samples', 'auto', 'smallest'
+
+        halving_src = HalvingRandomSearchCV(
+            model,
+            param_distributions = grid_parameters,
+            n_candidates = 'exhaust',
+            factor = factor,
+            resource = resource,
+            max_resources = max_resources,
+            min_resources = min_resources,
+            n_jobs = n_jobs,
+            scoring = self.get_scorer(model),
+            cv = self.cv(xtr, ytr, n_splits=n_split, random_state=random_state),
+            verbose = 1,
+            random_state = random_state
+        )
+
+        halving_src.fit(xtr, ytr)
+        self.print_search(halving_src)
+        return {k: v for k, v in halving_src.best_params_.items() if k != resource}
+
+    def train_path(self,
+                   model,
+                   grid_parameters,
+                   xtr,
+                   ytr,
+                   n_iter=N_ITER,
+                   n_split=N_SPLIT,
+                   n_jobs=N_JOBS,
+                   verbose=0,
+                   random_state=RANDOM_STATE):
+        """
+             Regularization path of LR: n_iter settings of the rest of the parameters are sampled from the grid
+             and every one is solved for all the C values of the grid, from strong to weak regularization,
+             warm-starting each fit from the previous solution. The position of the best C on the path is saved
+             in the report of the search.
+        """
+        if not RegularizationPathEvaluator.accepts(model, []) or 'C' not in grid_parameters:
+            print('The regularization path is only available for LR with C in the grid, random search is used')
+            return self.train_random(model, grid_parameters, xtr, ytr, n_iter=n_iter, n_jobs=n_jobs, n_split=n_split,
+                                     random_state=random_state)
+
+        # only the solvers that start from the previous coefficients are solved along the path
+        warm_start = RegularizationPathEvaluator.WARM_START_SOLVERS
+        solvers = grid_parameters.get('solver', [model.get_params()['solver']])
+        if not any(s in warm_start for s in solvers):
+            print('The regularization path needs one of the solvers {}, random search is used'.format(warm_start))
+            return self.train_random(model, grid_parameters, xtr, ytr, n_iter=n_iter, n_jobs=n_jobs, n_split=n_split,
+                                     random_state=random_state)
+        if 'solver' in grid_parameters and not all(s in warm_start for s in solvers):
+            print('Solvers {} ignore warm starts, they are removed from the regularization path'.format(
+                [s for s in solvers if s not in warm_start]))
+            grid_parameters = {**grid_parameters, 'solver': [s for s in solvers if s in warm_start]}
+
+        path = sorted(grid_parameters['C'])
+        settings = {k: v for k, v in grid_parameters.items() if k != 'C'}
+        candidates = [{**s, 'C': C} for s in ParameterSampler(settings, n_iter, random_state=random_state) for C in path]
+        best = self.search_candidates(model, candidates, xtr, ytr, n_split, n_jobs, random_state,
+                                      evaluator=RegularizationPathEvaluator(model))
+
+        scores = [float(s) for c, s in zip(candidates, self.mean_scores)
+                  if {**c, 'C': best['C']} == best]
+        position = path.index(best['C'])
+        self.report = {
+            'Regularization_path': {
+                'C': path,
+                'mean_test_score': scores,
+                'best_C': best['C'],
+                'best_position': '{} of {}'.format(position + 1, len(path)),
+                # a best C at one end of the path suggests extending the grid
+                'at_bound': 'strongest' if position == 0 else 'weakest' if position == len(path) - 1 else None
+            }
+        }
+        print('Best C {} found at position {} of the regularization path'.format(best['C'], position + 1))
+        return best
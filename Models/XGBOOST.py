@@ -1,28 +1,46 @@
 from .BaseModel import BaseModel
 from os.path import join
+from inspect import signature
 import xgboost as xgb
 from joblib import dump
+from sklearn.model_selection import train_test_split
 from Tools.TypeML import TypeML
 import matplotlib.pyplot as plt
 
 PREFIX_OUT_XGBOOST = '{}_{}'  # Model, Dataset, numero de arboles, numero de profundidad, RANDOM_STATE
 
-REMOVE_PARAMS_REGRESSOR = []
+REMOVE_PARAMS_REGRESSOR = ['objective']
+# settings of sibila, they are not passed to xgboost
+EARLY_STOPPING_ROUNDS = 'early_stopping_rounds'
+VALIDATION_FRACTION = 'validation_fraction'
+PLOT_TREE = 'plot_tree'
+DEFAULT_ROUNDS = 100  # n_estimators of xgboost when it is None
 
 
 class XGBOOST(BaseModel):
+    ACCEPTS_SPARSE = True
+
     def __init__(self, io_data, cfg, id_list):
         super(XGBOOST, self).__init__(io_data, cfg, id_list)
 
+        # the search replaces the params with the best ones, so the settings of the final fit are kept apart
+        params = self.cfg.get_params()['params']
+        self.early_stopping_rounds = params.pop(EARLY_STOPPING_ROUNDS, None)
+        self.validation_fraction = params.pop(VALIDATION_FRACTION, 0.1)
+        self.plot_tree = params.pop(PLOT_TREE, False)
+        self.cfg.get_config()['Boosting_settings'] = {EARLY_STOPPING_ROUNDS: self.early_stopping_rounds,
+                                                      VALIDATION_FRACTION: self.validation_fraction,
+                                                      PLOT_TREE: self.plot_tree}
+
         if self.cfg.get_params()['type_ml'].lower() == TypeML.CLASSIFICATION.value:
-            self.model = xgb.XGBClassifier()
+            self.model = xgb.XGBClassifier(**params)
         elif self.cfg.get_params()['type_ml'].lower() == TypeML.REGRESSION.value:
             for i in REMOVE_PARAMS_REGRESSOR:
                 if i in self.cfg.get_params()['params']:
                     del self.cfg.get_params()['params'][i]
                 if i in self.cfg.get_params()['params_grid']:
                     del self.cfg.get_params()['params_grid'][i]
-            self.model = xgb.XGBRegressor()
+            self.model = xgb.XGBRegressor(**params)
 
     def get_prefix(self):
         return join(self.cfg.get_folder(),
@@ -34,9 +52,37 @@ class XGBOOST(BaseModel):
     def train(self, xtr, ytr):
         self.model_fit(xtr, ytr)
 
+    def fit_estimator(self, xtr, ytr):
+        """
+        Boosting stops when the score on a held-out part of the training set does not improve for
+        early_stopping_rounds rounds. Predictions use the best round.
+        """
+        if not self.early_stopping_rounds or not 0 < self.validation_fraction < 1:
+            self.model.fit(xtr, ytr)
+            return
+
+        classification = self.cfg.get_params()['type_ml'].lower() == TypeML.CLASSIFICATION.value
+        xfit, xval, yfit, yval = train_test_split(xtr, ytr, test_size=self.validation_fraction,
+                                                  random_state=self.cfg.get_args()['seed'],
+                                                  stratify=ytr if classification else None)
+
+        if EARLY_STOPPING_ROUNDS in signature(xgb.XGBModel.__init__).parameters:
+            # xgboost >= 1.6
+            self.model.set_params(early_stopping_rounds=self.early_stopping_rounds)
+            self.model.fit(xfit, yfit, eval_set=[(xval, yval)], verbose=False)
+        else:
+            self.model.fit(xfit, yfit, eval_set=[(xval, yval)], early_stopping_rounds=self.early_stopping_rounds, verbose=False)
+        if EARLY_STOPPING_ROUNDS in self.model.get_params():
+            # the best round is kept by the booster, later fits without an evaluation set must not fail
+            self.model.set_params(early_stopping_rounds=None)
+
+        best, maximum = int(self.model.best_iteration) + 1, self.model.get_params()['n_estimators'] or DEFAULT_ROUNDS
+        self.io_data.print_m('Early stopping: best round {} of {}'.format(best, maximum))
+        self.cfg.get_config()['Boosting_rounds'] = {'Maximum': maximum, 'Best': best}
+
     def predict(self, xts):
         ypr = self.model_predict(xts)
-        if self.cfg.get_params()['type_ml'].lower() == TypeML.CLASSIFICATION.value:
+        if self.plot_tree and self.cfg.get_params()['type_ml'].lower() == TypeML.CLASSIFICATION.value:
             self.plotting()
         return ypr
 
@@ -1,12 +1,30 @@
-from Models.DT import DT
-from Models.SVM import SVM
-from Models.RF import RF
-from Models.ANN import ANN
-from Models.XGBOOST import XGBOOST
-from Models.KNN import KNN
-from Models.RP import RP
-from Models.RLF import RLF
-from Models.LR import LR
-from Models.BAG import BAG
-from Models.VOT import VOT
+"""
+Registry of models. Every model pulls its own backend (tensorflow, xgboost, wittgenstein, rulefit...),
+so modules are only imported when the model is actually used: 'RF' -> Models.RF.RF
+"""
+from importlib import import_module
 from Models.BaseModel import BaseModel
+
+MODELS = ['DT', 'SVM', 'RF', 'ANN', 'XGBOOST', 'KNN', 'RP', 'RLF', 'LR', 'BAG', 'HGB', 'VOT']
+
+__all__ = MODELS + ['BaseModel', 'get_model_class']
+
+
+def get_model_class(name):
+    """
+    Returns the class of a model, importing its module on demand
+    @param name: name of the model, e.g. RF
+    """
+    if name not in MODELS:
+        raise KeyError('Model not found: {}'.format(name))
+    model_class = getattr(import_module('{}.{}'.format(__name__, name)), name)
+    # importing the submodule binds its name to the module, so the class is set back
+    globals()[name] = model_class
+    return model_class
+
+
+def __getattr__(name):
+    # keeps 'from Models import RF' and 'from Models import *' working
+    if name in MODELS:
+        return get_model_class(name)
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
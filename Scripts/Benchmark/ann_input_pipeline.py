@@ -0,0 +1,85 @@
+"""
+Measures the epoch time of a dense network trained from NumPy arrays against the tf.data pipeline of the
+ANN model (Models/Utils/KerasDataset.py), without and with XLA. Every scenario runs in a fresh python
+process, because XLA must be enabled before tensorflow is initialized.
+
+Usage (from the root folder of SIBILA):
+    python Scripts/Benchmark/ann_input_pipeline.py -n 200000 -f 100 -e 5
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+SCENARIO = """
+import time
+import numpy as np
+import tensorflow as tf
+from Models.Utils.KerasDataset import make_dataset, enable_xla
+
+if {xla}:
+    enable_xla()
+tf.random.set_seed(0)
+rng = np.random.RandomState(0)
+x = rng.rand({rows}, {features})
+y = (x[:, 0] + rng.rand({rows}) > 1).astype(int)
+
+model = tf.keras.Sequential([
+    tf.keras.layers.Dense(128, activation='relu'),
+    tf.keras.layers.Dense(64, activation='relu'),
+    tf.keras.layers.Dense(2, activation='softmax')
+])
+model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+
+
+class EpochTime(tf.keras.callbacks.Callback):
+    def on_epoch_begin(self, epoch, logs=None):
+        self.start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        times.append(time.perf_counter() - self.start)
+
+
+times = []
+if {pipeline}:
+    model.fit(make_dataset(x, y, {batch_size}, seed=0), epochs={epochs}, verbose=0, callbacks=[EpochTime()])
+else:
+    model.fit(x, y, batch_size={batch_size}, epochs={epochs}, shuffle=True, verbose=0, callbacks=[EpochTime()])
+# the first epoch traces and compiles the graph
+print(sum(times[1:]) / max(1, len(times) - 1))
+"""
+
+SCENARIOS = {
+    'NumPy arrays': {'pipeline': False, 'xla': False},
+    'tf.data pipeline': {'pipeline': True, 'xla': False},
+    'tf.data pipeline + XLA': {'pipeline': True, 'xla': True},
+}
+
+
+def run(code):
+    out = subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.PIPE, universal_newlines=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Epoch time of the input pipelines of the ANN model')
+    parser.add_argument('-n', '--rows', help='Rows of the synthetic dataset', type=int, default=200000)
+    parser.add_argument('-f', '--features', help='Features of the synthetic dataset', type=int, default=100)
+    parser.add_argument('-b', '--batch-size', help='Batch size', type=int, default=128)
+    parser.add_argument('-e', '--epochs', help='Epochs of every scenario (the first one is not measured)', type=int, default=5)
+    parser.add_argument('-o', '--output', help='Save the results to a json file', type=str)
+    args = parser.parse_args()
+
+    results = {}
+    for name, scenario in SCENARIOS.items():
+        results[name] = run(SCENARIO.format(rows=args.rows, features=args.features, batch_size=args.batch_size,
+                                            epochs=args.epochs, **scenario))
+
+    reference = results['NumPy arrays']
+    print('{:<30}{:>18}{:>10}'.format('Scenario', 'Epoch time (s)', 'Speedup'))
+    for name, seconds in results.items():
+        print('{:<30}{:>18.3f}{:>10.2f}'.format(name, seconds, reference / seconds))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
@@ -0,0 +1,52 @@
+"""
+Compares the metrics of two experiments on the same dataset, typically a float64 run and a float32 run
+(--dtype float32). The metrics of every model are read from its *_data.json file.
+
+Usage (from the root folder of SIBILA):
+    python sibila.py -d dataset.csv -o RF LR -f exp_float64
+    python sibila.py -d dataset.csv -o RF LR -f exp_float32 --dtype float32
+    python Scripts/Benchmark/compare_precision.py exp_float64 exp_float32 -t 1.0
+
+The exit code is 1 when any metric differs more than the tolerance.
+"""
+import argparse
+import json
+import sys
+from glob import glob
+from os.path import basename, join
+
+
+def read_metrics(folder):
+    metrics = {}
+    for file_json in glob(join(folder, '*_data.json')):
+        with open(file_json) as f:
+            data = json.load(f)
+        model = basename(file_json)[:-len('_data.json')]
+        for k, v in data.get('Analysis', {}).items():
+            if isinstance(v, (int, float)):
+                metrics['{} {}'.format(model, k)] = v
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Metrics of a float32 run against a float64 run')
+    parser.add_argument('reference', help='Folder of the float64 experiment', type=str)
+    parser.add_argument('candidate', help='Folder of the float32 experiment', type=str)
+    parser.add_argument('-t', '--tolerance', help='Maximum absolute difference of every metric', type=float, default=1.0)
+    args = parser.parse_args()
+
+    reference = read_metrics(args.reference)
+    candidate = read_metrics(args.candidate)
+    failed = False
+
+    print('{:<50}{:>12}{:>12}{:>10}'.format('Metric', 'Reference', 'Candidate', 'Diff'))
+    for k in sorted(reference):
+        if k not in candidate:
+            print('{:<50}{:>12}{:>12}'.format(k, reference[k], 'missing'))
+            failed = True
+            continue
+        diff = abs(reference[k] - candidate[k])
+        failed = failed or diff > args.tolerance
+        print('{:<50}{:>12}{:>12}{:>10}{}'.format(k, reference[k], candidate[k], round(diff, 3), '  *' if diff > args.tolerance else ''))
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,57 @@
+"""
+Measures the startup time of SIBILA entry points. Every scenario runs in a fresh python process,
+so that nothing is cached between measurements.
+
+Usage (from the root folder of SIBILA):
+    python Scripts/Benchmark/import_time.py -r 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+EAGER = """
+import tensorflow
+from Models import MODELS, get_model_class
+from Common.Analysis.Explainers import EXPLAINERS, get_explainer
+[get_model_class(m) for m in MODELS]
+[get_explainer(e) for e in EXPLAINERS]
+"""
+
+SCENARIOS = {
+    'Eager imports (all models, explainers and tensorflow)': EAGER,
+    'sibila.py startup': 'import sibila',
+    'Interpretability block job (PermutationImportance)': """
+from Common.Analysis.Interpretability import Interpretability
+from Common.Analysis.Explainers import get_explainer
+get_explainer('PermutationImportance')
+""",
+    'Interpretability block job (Shapley)': """
+from Common.Analysis.Interpretability import Interpretability
+from Common.Analysis.Explainers import get_explainer
+get_explainer('Shapley')
+""",
+}
+
+
+def measure(code, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.time()
+        p = subprocess.run([sys.executable, '-c', code], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if p.returncode != 0:
+            return None, p.stderr.decode().strip().split('\n')[-1]
+        times.append(time.time() - start)
+    return statistics.median(times), None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Startup time of SIBILA')
+    parser.add_argument('-r', '--repeats', help='Number of runs of every scenario', type=int, default=3)
+    args = parser.parse_args()
+
+    print('{:<60}{:>12}'.format('Scenario', 'Median (s)'))
+    for name, code in SCENARIOS.items():
+        t, error = measure(code, args.repeats)
+        print('{:<60}{:>12}'.format(name, round(t, 3) if t is not None else 'n/a ({})'.format(error)))
@@ -41,6 +41,7 @@ ERROR_BALANCING = 'E0111'
 ERROR_NOT_BINARY = 'E0112'
 ERROR_DIFF_LENGTH = 'E0113'
 ERROR_CORRELATION = 'E0114'
+ERROR_PRECISION = 'E0115'
 
 
 class Args:
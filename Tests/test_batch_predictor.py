@@ -0,0 +1,117 @@
+import unittest
+import threading
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression, LogisticRegression
+from Tests.BaseTest import *
+from Tests.errors import get_error, get_error_txt
+from Tools.BatchPredictor import BatchPredictor, Prefetcher, COL_ID, COL_CLASS, COL_PROBA
+
+
+class ChunkRecorder:
+    """
+    Model without predict_proba that returns a single value per sample and records the size of every call
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, x):
+        self.calls.append(x.shape[0])
+        return (x[:, 0] > 0.5).astype(float)
+
+
+class TestBatchPredictor(BaseTest):
+
+    def get_data(self):
+        rng = np.random.RandomState(SEED)
+        x = rng.rand(1000, 4)
+        return x, (x[:, 0] + 0.2 * rng.rand(1000) > 0.6).astype(int)
+
+    def test_chunks(self):
+        x, y = self.get_data()
+        model = LogisticRegression().fit(x, y)
+
+        ypr_class, ypr_prob = BatchPredictor(model, batch_size=64).predict(x)
+        proba = model.predict_proba(x)
+        self.assertTrue(np.array_equal(ypr_class, proba.argmax(axis=1)), get_error(ERROR_MODEL))
+        self.assertTrue(np.allclose(ypr_prob, proba.max(axis=1)), get_error(ERROR_MODEL))
+        self.assertTrue(np.array_equal(ypr_class, model.predict(x)), get_error(ERROR_MODEL))
+
+        model = LinearRegression().fit(x, y)
+        ypr_class, ypr_prob = BatchPredictor(model, regression=True, batch_size=64).predict(x)
+        self.assertTrue(np.allclose(ypr_prob, model.predict(x)), get_error(ERROR_MODEL))
+        self.assertTrue(np.all(ypr_class == -1), get_error(ERROR_MODEL))
+
+    def test_last_chunk(self):
+        x, y = self.get_data()
+        model = ChunkRecorder()
+        ypr_class, ypr_prob = BatchPredictor(model, batch_size=300).predict(x)
+
+        self.assertEqual(model.calls, [300, 300, 300, 100], get_error_txt(ERROR_MODEL, model.calls))
+        self.assertEqual(len(ypr_class), x.shape[0], get_error(ERROR_DIFF_LENGTH))
+
+    def test_single_output(self):
+        x, y = self.get_data()
+        ypr_class, ypr_prob = BatchPredictor(ChunkRecorder(), batch_size=128).predict(x)
+
+        # a single value per sample is read as the probability of the positive class
+        expected = (x[:, 0] > 0.5).astype(int)
+        self.assertTrue(np.array_equal(ypr_class, expected), get_error(ERROR_MODEL))
+        self.assertTrue(np.all(ypr_prob == 1), get_error(ERROR_MODEL))
+
+        proba = BatchPredictor.to_proba(np.array([0.2, 0.9, 1]), 3)
+        self.assertTrue(np.allclose(proba, [[0.8, 0.2], [0.1, 0.9], [0, 1]]), get_error_txt(ERROR_MODEL, proba))
+
+        # values that are not probabilities are not clipped into them
+        with self.assertRaises(ValueError):
+            BatchPredictor.to_proba(np.array([0.2, -0.9, 1.5]), 3)
+        with self.assertRaises(ValueError):
+            BatchPredictor(LinearRegression().fit(x, y)).predict(x)
+        ypr_class, ypr_prob = BatchPredictor(LinearRegression().fit(x, y), regression=True).predict(x)
+        self.assertTrue(np.all(ypr_class == -1), get_error(ERROR_MODEL))
+
+    def test_stream(self):
+        x, y = self.get_data()
+        model = LogisticRegression().fit(x, y)
+        blocks = [(np.arange(i, min(i + 150, x.shape[0])), x[i:i + 150]) for i in range(0, x.shape[0], 150)]
+        file_out = join(FOLDER_TEST, 'stream.csv')
+
+        n_samples = BatchPredictor(model, batch_size=64).predict_stream(iter(blocks), file_out, transform=lambda b: b * 1)
+        df = pd.read_csv(file_out)
+        ypr_class, ypr_prob = BatchPredictor(model).predict(x)
+
+        # a single header and the blocks in order
+        self.assertEqual(n_samples, x.shape[0], get_error(ERROR_DIFF_LENGTH))
+        self.assertEqual(list(df.columns), [COL_ID, COL_CLASS, COL_PROBA], get_error_txt(ERROR_DATA_CSV, df.columns))
+        self.assertTrue(np.array_equal(df[COL_ID], np.arange(x.shape[0])), get_error(ERROR_DATA_CSV))
+        self.assertTrue(np.array_equal(df[COL_CLASS], ypr_class), get_error(ERROR_DATA_CSV))
+        self.assertTrue(np.allclose(df[COL_PROBA], ypr_prob), get_error(ERROR_DATA_CSV))
+
+    def test_prefetcher(self):
+        # the items are read in another thread and keep their order
+        readers = []
+
+        def items():
+            for i in range(10):
+                readers.append(threading.current_thread())
+                yield i
+
+        self.assertEqual(list(Prefetcher(items(), depth=2)), list(range(10)), get_error(ERROR_MODEL))
+        self.assertTrue(all(t is not threading.current_thread() for t in readers), get_error(ERROR_MODEL))
+
+        # an error while reading reaches the consumer after the items read before it
+        def failing():
+            yield 0
+            yield 1
+            raise IOError('broken block')
+
+        read = []
+        with self.assertRaises(IOError):
+            for i in Prefetcher(failing(), depth=1):
+                read.append(i)
+        self.assertEqual(read, [0, 1], get_error_txt(ERROR_MODEL, read))
+
+
+if __name__ == '__main__':
+    unittest.main()
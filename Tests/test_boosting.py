@@ -0,0 +1,72 @@
+import unittest
+import numpy as np
+from Tests.BaseTest import *
+from Tests.errors import get_error, get_error_txt
+from Models import BaseModel
+from Models.HGB import HGB
+from Models.XGBOOST import XGBOOST
+
+FOLDER_CONFIGS = join('Common', 'Config', 'DefaultConfigs')
+
+
+class TestBoosting(BaseTest):
+
+    def get_model(self, model_class, io_data, id_list, regression):
+        name = model_class.__name__
+        args = Args(name)
+        args.regression = regression
+        params = io_data.read_json(join(FOLDER_CONFIGS, name + '.json'))
+        params['type_ml'] = 'regression' if regression else 'classification'
+        params['train_grid'] = 'NONE'
+        cfg = self.get_config_holder(args, params, FOLDER_TEST + name)
+        return model_class(io_data, cfg, id_list), cfg
+
+    def test_hgb(self):
+        io_data = self.get_iodata()
+        xtr, xts, ytr, yts, idx_xtr, idx_xts, id_list, idx_samples = self.get_dataset(io_data)
+
+        # missing values are handled natively
+        xtr, xts = xtr.astype(float), xts.astype(float)
+        rng = np.random.RandomState(SEED)
+        xtr[rng.rand(*xtr.shape) < 0.05] = np.nan
+        xts[rng.rand(*xts.shape) < 0.05] = np.nan
+
+        for regression in [False, True]:
+            y = ytr.astype(float) if regression else ytr
+            model, cfg = self.get_model(HGB, io_data, id_list, regression)
+            model.train(xtr, y)
+            ypr = model.predict(xts)
+            self.assertEqual(len(ypr), len(yts), get_error(ERROR_DIFF_LENGTH))
+
+            iterations = cfg.get_config()['Iterations']
+            self.assertTrue(0 < iterations <= cfg.get_params()['params']['max_iter'], get_error_txt(ERROR_MODEL, iterations))
+
+            BaseModel.save_model(cfg, model.get_model())
+            loaded = BaseModel.load(BaseModel.get_filename_save_model(cfg, model.get_model()))
+            self.assertTrue(np.array_equal(loaded.predict(xts), ypr), get_error(ERROR_SAVED_MODEL))
+
+    def test_xgboost(self):
+        io_data = self.get_iodata()
+        xtr, xts, ytr, yts, idx_xtr, idx_xts, id_list, idx_samples = self.get_dataset(io_data)
+
+        for regression in [False, True]:
+            y = ytr.astype(float) if regression else ytr
+            model, cfg = self.get_model(XGBOOST, io_data, id_list, regression)
+            model.get_model().set_params(n_estimators=300)
+            model.train(xtr, y)
+            self.assertEqual(len(model.predict(xts)), len(yts), get_error(ERROR_DIFF_LENGTH))
+
+            # the settings of sibila are saved with the best round
+            rounds = cfg.get_config()['Boosting_rounds']
+            self.assertEqual(rounds['Maximum'], 300, get_error_txt(ERROR_MODEL, rounds))
+            self.assertTrue(0 < rounds['Best'] <= rounds['Maximum'], get_error_txt(ERROR_MODEL, rounds))
+            self.assertEqual(cfg.get_config()['Boosting_settings'],
+                             {'early_stopping_rounds': 20, 'validation_fraction': 0.1, 'plot_tree': False},
+                             get_error(ERROR_MODEL))
+
+            # later fits, e.g. the ones of the interpretability methods, have no evaluation set
+            model.get_model().fit(xtr, y)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
 import unittest
+import numpy as np
+from sklearn.linear_model import LogisticRegression
 from Common.Config.config import get_default_config
 from Models import *
 from Models.Utils.CrossValidation import CrossValidation
@@ -7,6 +9,12 @@ from Tests.errors import get_error, get_error_txt
 
 CV_METHODS = list(CrossValidation.METHODS.keys())
 
+
+def fit_fold(xtr, ytr, xts, yts):
+    ypr = LogisticRegression().fit(xtr, ytr).predict(xts)
+    return {'predictions': ypr, 'scores': CrossValidation.score_fold(yts, ypr, False)}
+
+
 class TestCrossValidation(BaseTest):
 
     def test_cross_validation(self):
@@ -34,5 +42,25 @@ class TestCrossValidation(BaseTest):
             model.train(xtr, ytr)
             # there's no need to assert anything because we just want to prove it finishes correctly
 
+    def test_parallel_folds(self):
+        io_data = self.get_iodata()
+        xtr, xts, ytr, yts, idx_xtr, idx_xts, id_list, idx_samples = self.get_dataset(io_data)
+        cv = CrossValidation(io_data)
+        method = cv.choice_method('ST')
+
+        serial = cv.run_method(method, xtr, ytr, fit_fold, n_splits=4, random_state=SEED)
+        parallel = cv.run_method(method, xtr, ytr, fit_fold, n_jobs=2, n_splits=4, random_state=SEED)
+        self.assertEqual(len(parallel), 4, get_error(ERROR_MODEL))
+        for s, p in zip(serial, parallel):
+            self.assertTrue(np.array_equal(s['idx'], p['idx']), get_error(ERROR_MODEL))
+            self.assertTrue(np.array_equal(s['predictions'], p['predictions']), get_error(ERROR_MODEL))
+
+        summary = CrossValidation.aggregate(parallel)
+        self.assertEqual(summary['Folds'], 4, get_error(ERROR_MODEL))
+        self.assertEqual(len(summary['Accuracy']['folds']), 4, get_error(ERROR_MODEL))
+
+        CrossValidation.save_predictions(parallel, ytr, join(FOLDER_TEST, 'cv_predictions.csv'))
+        self.assertTrue(isfile(join(FOLDER_TEST, 'cv_predictions.csv')), get_error(ERROR_FILE))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,160 @@
+import json
+import pickle
+import unittest
+from argparse import Namespace
+import numpy as np
+import pandas as pd
+from Tests.BaseTest import *
+from Tests.errors import get_error, get_error_txt
+from Tools.datasets import get_dataset, split_samples
+from Tools.DatasetCache import DatasetCache
+from Tools.DataNormalization import DataNormalization
+from Tools.MemmapStore import MemmapStore, MemmapRef, to_ref, from_ref
+from Tools.sparse import issparse, to_csr, densify
+from scipy import sparse
+
+FILE_DATASET_UNBALANCED = 'Datasets/Tests/clasificacion-sintetico-desbalanceado_v1.csv'
+
+class TestDatasets(BaseTest):
+
+    def test_split_samples(self):
+        io_data = self.get_iodata()
+        x, y, id_list, idx_samples, target_classes = get_dataset(FILE_DATASET_UNBALANCED, io_data)
+        xtr, xts, ytr, yts, idx_xtr, idx_xts = split_samples(x, y, 0.8, io_data, SEED, idx_samples)
+
+        # IDs must stay aligned with their samples
+        rows = {str(i): r for i, r in zip(idx_samples, x)}
+        for ids, xs in [(idx_xtr, xtr), (idx_xts, xts)]:
+            for i, r in zip(ids, xs):
+                self.assertTrue(np.array_equal(rows[i], r), get_error_txt(ERROR_READ_DATASET, i))
+
+        self.assertEqual(len(set(idx_xtr) & set(idx_xts)), 0, get_error_txt(ERROR_READ_DATASET, "overlapping IDs"))
+        self.assertEqual(xtr.dtype, np.float64, get_error_txt(ERROR_READ_DATASET, "xtr type"))
+
+        # the proportion of classes is kept in both sets
+        for c in np.unique(y):
+            self.assertAlmostEqual(np.mean(ytr == c), np.mean(y == c), delta=0.05, msg=get_error_txt(ERROR_READ_DATASET, c))
+            self.assertAlmostEqual(np.mean(yts == c), np.mean(y == c), delta=0.05, msg=get_error_txt(ERROR_READ_DATASET, c))
+
+
+    def test_numpy_formats(self):
+        io_data = self.get_iodata()
+        x, y, id_list, idx_samples, target_classes = get_dataset(FILE_DATASET_UNBALANCED, io_data)
+
+        file_npz = join(FOLDER_TEST, 'dataset.npz')
+        np.savez(file_npz, x=x, y=y, features=np.asarray(id_list), ids=np.asarray(idx_samples))
+        file_npy = join(FOLDER_TEST, 'dataset.npy')
+        np.save(file_npy, x)
+        with open(join(FOLDER_TEST, 'dataset.json'), 'w') as f:
+            json.dump({'features': id_list, 'ids': idx_samples, 'y': y.tolist()}, f)
+
+        for file_in in [file_npz, file_npy]:
+            x2, y2, id_list2, idx_samples2, target_classes2 = get_dataset(file_in, io_data)
+            self.assertTrue(np.array_equal(x, x2), get_error_txt(ERROR_READ_DATASET, file_in))
+            self.assertTrue(np.array_equal(y, y2), get_error_txt(ERROR_READ_DATASET, file_in))
+            self.assertEqual(id_list, id_list2, get_error_txt(ERROR_READ_DATASET, file_in))
+            self.assertEqual(target_classes, target_classes2, get_error_txt(ERROR_READ_DATASET, file_in))
+
+        # selected columns are returned in the order of the dataset
+        columns = [id_list[3], id_list[0]]
+        for file_in in [FILE_DATASET_UNBALANCED, file_npz, file_npy]:
+            x2, y2, id_list2, idx_samples2, _ = get_dataset(file_in, io_data, columns=columns)
+            self.assertEqual(id_list2, [id_list[0], id_list[3]], get_error_txt(ERROR_READ_DATASET, file_in))
+            self.assertTrue(np.array_equal(x2, x[:, [0, 3]]), get_error_txt(ERROR_READ_DATASET, file_in))
+            self.assertTrue(np.array_equal(y2, y), get_error_txt(ERROR_READ_DATASET, file_in))
+
+
+    def test_dataset_cache(self):
+        io_data = self.get_iodata()
+        os.environ['SIBILA_CACHE_DIR'] = join(FOLDER_TEST, 'cache')
+        try:
+            expected = get_dataset(FILE_DATASET_UNBALANCED, io_data)
+            for _ in range(2):  # parsed and saved, then memory-mapped
+                x, y, id_list, idx_samples, target_classes = get_dataset(FILE_DATASET_UNBALANCED, io_data, cache=True)
+                self.assertTrue(np.array_equal(x, expected[0]), get_error_txt(ERROR_READ_DATASET, "cached x"))
+                self.assertTrue(np.array_equal(y, expected[1]), get_error_txt(ERROR_READ_DATASET, "cached y"))
+                self.assertEqual(id_list, expected[2], get_error_txt(ERROR_READ_DATASET, "cached features"))
+                self.assertEqual(idx_samples, expected[3], get_error_txt(ERROR_READ_DATASET, "cached IDs"))
+                self.assertEqual(target_classes, expected[4], get_error_txt(ERROR_READ_DATASET, "cached classes"))
+            self.assertIsInstance(x, np.memmap, get_error_txt(ERROR_READ_DATASET, "cached x is not memory-mapped"))
+
+            # object features (string columns) cannot be memory-mapped, they are not cached
+            df = pd.read_csv(FILE_DATASET_UNBALANCED)
+            df.insert(2, 'color', np.where(np.arange(len(df)) % 2 == 0, 'red', 'blue'))
+            file_object = join(FOLDER_TEST, 'object.csv')
+            df.to_csv(file_object, index=False)
+            expected = get_dataset(file_object, io_data)
+            for _ in range(2):
+                x, y, id_list, idx_samples, target_classes = get_dataset(file_object, io_data, cache=True)
+                self.assertEqual(x.dtype, object, get_error_txt(ERROR_READ_DATASET, "object x"))
+                self.assertTrue(np.array_equal(x, expected[0]), get_error_txt(ERROR_READ_DATASET, "object x"))
+            key = DatasetCache().get_key(file_object)
+            self.assertFalse(isdir(join(FOLDER_TEST, 'cache', key)), get_error_txt(ERROR_READ_DATASET, "object x cached"))
+
+            # a cache without room keeps nothing
+            cache = DatasetCache(max_size=0)
+            cache.evict()
+            self.assertEqual(len([f for f in os.listdir(cache.cache_dir) if isdir(join(cache.cache_dir, f))]), 0,
+                             get_error_txt(ERROR_READ_DATASET, "cache not evicted"))
+        finally:
+            del os.environ['SIBILA_CACHE_DIR']
+
+
+    def test_memmap(self):
+        io_data = self.get_iodata()
+        x, y, id_list, idx_samples, target_classes = get_dataset(FILE_DATASET_UNBALANCED, io_data)
+        store = MemmapStore(join(FOLDER_TEST, 'memmap'), block_rows=64)
+        args = Namespace(normalize=['SC'])
+
+        # normalization fitted by blocks gives the same result as in memory
+        expected = DataNormalization().choice_method_normalize(x, args)
+        xm = DataNormalization().choice_method_normalize(store.copy('x', x), args, store)
+        self.assertIsInstance(xm, np.memmap, get_error_txt(ERROR_READ_DATASET, "normalization not memory-mapped"))
+        self.assertTrue(np.allclose(xm, expected), get_error_txt(ERROR_READ_DATASET, "normalization by blocks"))
+
+        split = split_samples(expected, y, 0.8, io_data, SEED, idx_samples)
+        split_m = split_samples(xm, y, 0.8, io_data, SEED, idx_samples, store=store)
+        for a, b in zip(split, split_m):
+            self.assertTrue(np.allclose(a, b) if a.dtype.kind == 'f' else np.array_equal(a, b), get_error_txt(ERROR_READ_DATASET, "split"))
+
+        # whole memory-mapped matrices are pickled by reference, views are pickled as data
+        xtr = split_m[0]
+        ref = pickle.loads(pickle.dumps(to_ref(xtr)))
+        self.assertIsInstance(ref, MemmapRef, get_error_txt(ERROR_READ_DATASET, "memmap not referenced"))
+        self.assertTrue(np.array_equal(from_ref(ref), xtr), get_error_txt(ERROR_READ_DATASET, "memmap reference"))
+        self.assertNotIsInstance(to_ref(xtr[:10]), MemmapRef, get_error_txt(ERROR_READ_DATASET, "memmap view referenced"))
+
+
+    def test_sparse(self):
+        io_data = self.get_iodata()
+        x, y, id_list, idx_samples, target_classes = get_dataset(FILE_DATASET_UNBALANCED, io_data)
+
+        file_npz = join(FOLDER_TEST, 'sparse.npz')
+        sparse.save_npz(file_npz, to_csr(x))
+        with open(join(FOLDER_TEST, 'sparse.json'), 'w') as f:
+            json.dump({'features': id_list, 'ids': idx_samples, 'y': y.tolist()}, f)
+
+        xs, ys, id_list2, idx_samples2, _ = get_dataset(file_npz, io_data)
+        self.assertTrue(issparse(xs), get_error_txt(ERROR_READ_DATASET, "sparse dataset densified"))
+        self.assertTrue(np.array_equal(densify(xs), x), get_error_txt(ERROR_READ_DATASET, file_npz))
+
+        # the split keeps the matrix sparse and picks the same rows
+        split = split_samples(x, y, 0.8, io_data, SEED, idx_samples)
+        split_s = split_samples(xs, ys, 0.8, io_data, SEED, idx_samples2)
+        self.assertTrue(issparse(split_s[0]) and issparse(split_s[1]), get_error_txt(ERROR_READ_DATASET, "sparse split"))
+        self.assertTrue(np.array_equal(densify(split_s[0]), split[0]), get_error_txt(ERROR_READ_DATASET, "sparse split"))
+        self.assertTrue(np.array_equal(split_s[4], split[4]), get_error_txt(ERROR_READ_DATASET, "sparse split"))
+
+        # the precision of the features is kept
+        self.assertEqual(to_csr(x.astype(np.float32)).dtype, np.float32, get_error_txt(ERROR_READ_DATASET, "sparse dtype"))
+        self.assertEqual(to_csr(x, dtype='float32').dtype, np.float32, get_error_txt(ERROR_READ_DATASET, "sparse dtype"))
+        self.assertEqual(to_csr(xs, dtype='float32').dtype, np.float32, get_error_txt(ERROR_READ_DATASET, "sparse dtype"))
+
+        xn = DataNormalization().choice_method_normalize(xs, Namespace(normalize=['MA']))
+        self.assertTrue(issparse(xn), get_error_txt(ERROR_READ_DATASET, "sparse normalization"))
+        with self.assertRaises(SystemExit):
+            DataNormalization().choice_method_normalize(xs, Namespace(normalize=['SC']))
+
+
+if __name__ == '__main__':
+    unittest.main()
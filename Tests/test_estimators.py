@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, r2_score
+from sklearn.svm import SVC
+from Tests.BaseTest import *
+from Tests.errors import get_error, get_error_txt
+from Tools.datasets import get_dataset, split_samples
+from Tools.Estimators.ApproximateKernelSVM import ApproximateKernelSVC, ApproximateKernelSVR
+
+
+class TestEstimators(BaseTest):
+
+    def get_split(self, io_data):
+        x, y, id_list, idx_samples, target_classes = get_dataset(FILE_DATASET, io_data)
+        return split_samples(x, y, SPLIT_DATASET, io_data, SEED, idx_samples)[:4]
+
+    def test_approximate_svc(self):
+        io_data = self.get_iodata()
+        xtr, xts, ytr, yts = self.get_split(io_data)
+
+        exact = accuracy_score(yts, SVC(gamma='scale').fit(xtr, ytr).predict(xts))
+        for approximation in ['nystroem', 'rff']:
+            model = ApproximateKernelSVC(approximation=approximation, n_components=200, random_state=SEED)
+            clone(model).fit(xtr, ytr)
+            model.fit(xtr, ytr)
+
+            # calibrated probabilities of every class
+            proba = model.predict_proba(xts)
+            self.assertEqual(proba.shape, (xts.shape[0], len(np.unique(ytr))), get_error(ERROR_MODEL))
+            self.assertTrue(np.allclose(proba.sum(axis=1), 1), get_error(ERROR_MODEL))
+
+            score = accuracy_score(yts, model.predict(xts))
+            self.assertGreater(score, exact - 0.1, get_error_txt(ERROR_MODEL, score))
+
+    def test_approximate_svr(self):
+        io_data = self.get_iodata()
+        xtr, xts, ytr, yts = self.get_split(io_data)
+
+        for solver in ['liblinear', 'sgd']:
+            model = ApproximateKernelSVR(solver=solver, n_components=200, max_iter=5000, random_state=SEED).fit(xtr, ytr)
+            score = r2_score(yts, model.predict(xts))
+            self.assertTrue(np.isfinite(score), get_error_txt(ERROR_MODEL, score))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+import numpy as np
+from Tests.BaseTest import *
+from Tests.errors import get_error, get_error_txt
+from Models.Utils.KerasDataset import validation_split
+
+
+class TestKerasDataset(BaseTest):
+
+    def test_validation_split(self):
+        x = np.arange(400).reshape(200, 2)
+        y = np.array([0] * 180 + [1] * 20)
+
+        # the validation set of a classification keeps the proportion of every class
+        xtr, ytr, xval, yval = validation_split(x, y, 0.1, seed=SEED, stratify=True)
+        self.assertEqual(np.bincount(yval).tolist(), [18, 2], get_error_txt(ERROR_MODEL, np.bincount(yval)))
+        self.assertEqual(sorted(np.concatenate([xtr[:, 0], xval[:, 0]]).tolist()), x[:, 0].tolist(), get_error(ERROR_MODEL))
+
+        # same rows with the same seed
+        self.assertTrue(np.array_equal(validation_split(x, y, 0.1, seed=SEED, stratify=True)[2], xval), get_error(ERROR_MODEL))
+        self.assertIsNone(validation_split(x, y, 0, seed=SEED)[2], get_error(ERROR_MODEL))
+
+
+if __name__ == '__main__':
+    unittest.main()
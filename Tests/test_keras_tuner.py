@@ -0,0 +1,69 @@
+import unittest
+import numpy as np
+import pytest
+from multiprocessing import get_context
+kt = pytest.importorskip('keras_tuner')
+tf = pytest.importorskip('tensorflow')
+from Tests.BaseTest import *
+from Tests.errors import get_error, get_error_txt
+from Models.Utils import KerasTuner
+
+MAX_TRIALS = 4
+SEARCH = {'batch_size': 32, 'seed': SEED, 'epochs': 3, 'verbose': 0}
+
+
+def get_data():
+    rng = np.random.RandomState(SEED)
+    x = rng.rand(200, 4)
+    return x, (x[:, 0] + x[:, 1] > 1).astype(int)
+
+
+def build_model(hp):
+    init = tf.keras.initializers.GlorotUniform(seed=SEED)
+    model = tf.keras.Sequential([
+        tf.keras.layers.Dense(hp.Int('units', 2, 16, step=2), activation='relu', kernel_initializer=init),
+        tf.keras.layers.Dense(2, activation='softmax', kernel_initializer=init)
+    ])
+    model.compile(optimizer=tf.keras.optimizers.Adam(hp.Choice('lr', [1e-3, 1e-2])),
+                  loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def make_tuner(directory, overwrite):
+    return KerasTuner.RandomSearch(hypermodel=build_model, objective='loss', max_trials=MAX_TRIALS, seed=SEED,
+                                   directory=directory, project_name='search', overwrite=overwrite)
+
+
+def search_worker(directory, env):
+    """
+    Worker process, it runs the trials given by the chief oracle
+    """
+    os.environ.update(env)
+    KerasTuner.search(lambda: make_tuner(directory, False), *get_data(), **SEARCH)
+
+
+class TestKerasTuner(BaseTest):
+
+    def test_parallel_search(self):
+        x, y = get_data()
+        serial = KerasTuner.search(lambda: make_tuner(join(FOLDER_TEST, 'serial'), True), x, y, **SEARCH)
+
+        directory = join(FOLDER_TEST, 'parallel')
+
+        def start_worker(tuner_id, port):
+            p = get_context('spawn').Process(target=search_worker, args=(directory, KerasTuner.tuner_env(tuner_id, port)))
+            p.start()
+            return p
+
+        parallel = KerasTuner.search(lambda: make_tuner(directory, False), x, y, start_worker=start_worker,
+                                     n_workers=2, **SEARCH)
+
+        # every trial is seeded the same way, the workers do not change the best hyperparameters
+        best_serial = serial.get_best_hyperparameters(num_trials=1)[0].values
+        best_parallel = parallel.get_best_hyperparameters(num_trials=1)[0].values
+        self.assertEqual(best_parallel, best_serial, get_error_txt(ERROR_MODEL, best_parallel))
+        self.assertEqual(len(parallel.oracle.trials), MAX_TRIALS, get_error(ERROR_MODEL))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+from argparse import Namespace
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+from Tests.BaseTest import *
+from Tests.errors import get_error, get_error_txt
+from Tools.DataNormalization import DataNormalization
+from Tools.datasets import get_dataset, split_samples
+
+# maximum difference of the metrics (in %) between the float32 and the float64 runs
+TOLERANCE = 1.0
+
+
+class TestPrecision(BaseTest):
+
+    def run_pipeline(self, io_data, dtype):
+        x, y, id_list, idx_samples, target_classes = get_dataset(FILE_DATASET, io_data, dtype=dtype)
+        x = DataNormalization().choice_method_normalize(x, Namespace(normalize=['SC']))
+        xtr, xts, ytr, yts, idx_xtr, idx_xts = split_samples(x, y, SPLIT_DATASET, io_data, SEED, idx_samples, dtype=dtype)
+        self.assertEqual(xtr.dtype, np.dtype(dtype), get_error_txt(ERROR_PRECISION, dtype))
+        self.assertEqual(xts.dtype, np.dtype(dtype), get_error_txt(ERROR_PRECISION, dtype))
+
+        metrics = {}
+        for model in [LogisticRegression(random_state=SEED), RandomForestClassifier(n_estimators=50, random_state=SEED)]:
+            ypr = model.fit(xtr, ytr).predict(xts)
+            name = type(model).__name__
+            metrics[name + ' Accuracy'] = accuracy_score(yts, ypr) * 100
+            metrics[name + ' F1'] = f1_score(yts, ypr) * 100
+            metrics[name + ' Auc'] = roc_auc_score(yts, model.predict_proba(xts)[:, 1]) * 100
+        return metrics
+
+    def test_float32(self):
+        io_data = self.get_iodata()
+        expected = self.run_pipeline(io_data, 'float64')
+        metrics = self.run_pipeline(io_data, 'float32')
+        for k, v in expected.items():
+            self.assertAlmostEqual(metrics[k], v, delta=TOLERANCE, msg=get_error_txt(ERROR_PRECISION, k))
+
+
+if __name__ == '__main__':
+    unittest.main()
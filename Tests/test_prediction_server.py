@@ -0,0 +1,152 @@
+import unittest
+import threading
+import time
+import numpy as np
+from joblib import dump
+from sklearn.linear_model import LogisticRegression
+from Tests.BaseTest import *
+from Tests.errors import get_error, get_error_txt
+from Tools.PredictionServer import ModelCache, MicroBatcher, PredictionServer
+
+
+class CallRecorder:
+    """
+    Classifier that records the number of samples of every call
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.n_features_in_ = model.n_features_in_
+        self.calls = []
+
+    def predict_proba(self, x):
+        self.calls.append(len(x))
+        return self.model.predict_proba(x)
+
+
+class TestPredictionServer(BaseTest):
+
+    def get_model(self):
+        rng = np.random.RandomState(SEED)
+        x = rng.rand(200, 4)
+        return LogisticRegression().fit(x, (x[:, 0] > 0.5).astype(int)), x
+
+    def get_batcher(self, model, max_wait):
+        cache = ModelCache(1)
+        cache.models['model'] = (model, None)
+        return MicroBatcher(cache, 'model', False, max_batch=1000, max_wait=max_wait)
+
+    def predict_together(self, batcher, requests):
+        results = [None] * len(requests)
+
+        def client(i):
+            try:
+                results[i] = batcher.predict(requests[i])
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(len(requests))]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        return results
+
+    def test_model_cache(self):
+        model, x = self.get_model()
+        files = [join(FOLDER_TEST, 'model_{}.joblib'.format(i)) for i in range(3)]
+        [dump(model, f) for f in files]
+
+        cache = ModelCache(2)
+        cache.get(files[0])
+        cache.get(files[1])
+        cache.get(files[0])
+        cache.get(files[2])
+
+        # the least recently used model is evicted
+        self.assertEqual(cache.keys(), [files[0], files[2]], get_error_txt(ERROR_MODEL, cache.keys()))
+        self.assertIs(cache.get(files[2]), cache.get(files[2]), get_error(ERROR_MODEL))
+        with self.assertRaises(FileNotFoundError):
+            cache.get(join(FOLDER_TEST, 'missing.joblib'))
+
+    def test_concurrent_loads(self):
+        model, x = self.get_model()
+        file_model = join(FOLDER_TEST, 'model.joblib')
+        dump(model, file_model)
+
+        loads = []
+
+        class CountingCache(ModelCache):
+            @staticmethod
+            def load(file_model):
+                loads.append(file_model)
+                time.sleep(0.2)
+                return ModelCache.load(file_model)
+
+        # the requests that miss the cache at the same time wait for a single load
+        cache = CountingCache(2)
+        entries = [None] * 4
+
+        def client(i):
+            entries[i] = cache.get(file_model)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(len(entries))]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        self.assertEqual(len(loads), 1, get_error_txt(ERROR_MODEL, loads))
+        self.assertTrue(all(e is entries[0] for e in entries), get_error(ERROR_MODEL))
+
+    def test_evicted_batchers(self):
+        model, x = self.get_model()
+        files = [join(FOLDER_TEST, 'model_{}.joblib'.format(i)) for i in range(3)]
+        [dump(model, f) for f in files]
+
+        server = PredictionServer(cache_size=1, max_wait_ms=1)
+        for f in files:
+            server.predict({'model': f, 'samples': x[:2].tolist()})
+        batcher = server.get_batcher(os.path.abspath(files[-1]), False)
+
+        # only the batcher of the cached model is kept, the threads of the others end
+        self.assertEqual(list(server.batchers.keys()), [(os.path.abspath(files[-1]), False)], get_error(ERROR_MODEL))
+        time.sleep(0.2)
+        names = [t.name for t in threading.enumerate() if t.name in ['batcher-' + os.path.abspath(f) for f in files]]
+        self.assertEqual(names, ['batcher-' + os.path.abspath(files[-1])], get_error_txt(ERROR_MODEL, names))
+
+        # an evicted model is served again by a new batcher
+        response = server.predict({'model': files[0], 'samples': x[:2].tolist()})
+        self.assertEqual(response['Predicted class'], model.predict(x[:2]).tolist(), get_error(ERROR_MODEL))
+        self.assertTrue(batcher.stopped, get_error(ERROR_MODEL))
+
+    def test_micro_batches(self):
+        model, x = self.get_model()
+        recorder = CallRecorder(model)
+        requests = [x[0:10], x[10:13], x[13:40]]
+        results = self.predict_together(self.get_batcher(recorder, max_wait=0.5), requests)
+
+        # one call to the model and every client gets its own rows
+        self.assertEqual(recorder.calls, [40], get_error_txt(ERROR_MODEL, recorder.calls))
+        for r, xr in zip(results, requests):
+            self.assertTrue(np.array_equal(r[0], model.predict(xr)), get_error(ERROR_MODEL))
+            self.assertTrue(np.allclose(r[1], model.predict_proba(xr).max(axis=1)), get_error(ERROR_MODEL))
+
+    def test_wrong_request(self):
+        model, x = self.get_model()
+        requests = [x[0:10], np.ones((3, 7)), x[10:20]]
+        results = self.predict_together(self.get_batcher(model, max_wait=0.5), requests)
+
+        self.assertIsInstance(results[1], ValueError, get_error_txt(ERROR_MODEL, results[1]))
+        self.assertTrue(np.array_equal(results[0][0], model.predict(x[0:10])), get_error(ERROR_MODEL))
+        self.assertTrue(np.array_equal(results[2][0], model.predict(x[10:20])), get_error(ERROR_MODEL))
+
+    def test_server(self):
+        model, x = self.get_model()
+        file_model = join(FOLDER_TEST, 'model.joblib')
+        dump(model, file_model)
+
+        server = PredictionServer(max_wait_ms=1)
+        response = server.predict({'model': file_model, 'samples': x[:5].tolist(), 'ids': list('abcde')})
+        self.assertEqual(response['Sample ID'], list('abcde'), get_error(ERROR_MODEL))
+        self.assertEqual(response['Predicted class'], model.predict(x[:5]).tolist(), get_error(ERROR_MODEL))
+        self.assertEqual(server.health()['models'], [os.path.abspath(file_model)], get_error(ERROR_MODEL))
+
+
+if __name__ == '__main__':
+    unittest.main()
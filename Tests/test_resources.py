@@ -0,0 +1,76 @@
+import unittest
+from unittest import mock
+from Tests.BaseTest import *
+from Tests.errors import get_error, get_error_txt
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.svm import SVC
+from Tools.ResourceManager import ResourceManager, ENV_CPUS, allocated_cpus, available_cpus
+
+ENV_VARS = [ENV_CPUS, 'SLURM_CPUS_PER_TASK', 'SLURM_CPUS_ON_NODE']
+FOLDER_CONFIGS = join('Common', 'Config', 'DefaultConfigs')
+
+
+class TestResources(BaseTest):
+
+    def setUp(self):
+        self.env = {var: os.environ.get(var) for var in ENV_VARS}
+
+    def tearDown(self):
+        for var, value in self.env.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+    def get_default_cfg(self, model):
+        return ConfigHolder(FILE_DATASET, FOLDER_TEST, Args(None), IOData().read_json(join(FOLDER_CONFIGS, model + '.json')))
+
+    def test_budget(self):
+        os.environ[ENV_CPUS] = '1'
+        self.assertEqual(allocated_cpus(8), 1, get_error(ERROR_MODEL))
+
+        os.environ.pop(ENV_CPUS)
+        self.assertEqual(allocated_cpus('-1'), available_cpus(), get_error(ERROR_MODEL))
+        self.assertEqual(allocated_cpus([1, 2]), available_cpus(), get_error(ERROR_MODEL))
+
+    def test_default_configs(self):
+        [os.environ.pop(var, None) for var in ENV_VARS]
+
+        # without an allocation every model gets all the cores, the configurations do not limit them
+        with mock.patch('Tools.ResourceManager.available_cpus', return_value=16):
+            for model in ['ANN', 'RF', 'SVM', 'XGBOOST', 'HGB', 'VOT']:
+                cpus = ResourceManager(self.get_default_cfg(model)).cpus
+                self.assertEqual(cpus, 16, get_error_txt(ERROR_MODEL, model))
+
+            cfg = self.get_default_cfg('RF')
+            cfg.get_params()['params']['n_jobs'] = 2
+            self.assertEqual(ResourceManager(cfg).cpus, 2, get_error(ERROR_MODEL))
+
+    def test_cross_validation_processes(self):
+        [os.environ.pop(var, None) for var in ENV_VARS]
+
+        # the folds of ANN.cross_validation run in several processes with the default configuration
+        cfg = self.get_default_cfg('ANN')
+        with mock.patch('Tools.ResourceManager.available_cpus', return_value=16):
+            processes, threads = ResourceManager(cfg, tensorflow=True).split(cfg.get_params()['params']['cv_splits'])
+        self.assertGreater(processes, 1, get_error_txt(ERROR_MODEL, processes))
+        self.assertLessEqual(processes * threads, 16, get_error(ERROR_MODEL))
+
+    def test_split(self):
+        os.environ[ENV_CPUS] = '1'
+        rm = ResourceManager(searching=True)
+
+        # nested levels never multiply the cores
+        self.assertEqual(rm.search_jobs * rm.search_estimator_jobs, rm.cpus, get_error(ERROR_MODEL))
+        self.assertEqual(rm.search_grid({'n_jobs': [4, 8], 'C': [1]})['n_jobs'], [1], get_error(ERROR_MODEL))
+
+        model = RandomForestClassifier(n_jobs=8)
+        self.assertTrue(rm.set_n_jobs(model, rm.fit_jobs), get_error(ERROR_MODEL))
+        self.assertEqual(model.n_jobs, 1, get_error(ERROR_MODEL))
+        self.assertFalse(rm.set_n_jobs(SVC(), rm.fit_jobs), get_error(ERROR_MODEL))
+
+        self.assertEqual(ResourceManager(searching=True, tensorflow=True).search_jobs, 1, get_error(ERROR_MODEL))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import time
+from Tests.BaseTest import *
+from Tests.errors import get_error, get_error_txt
+from Tools.ModelScheduler import ModelScheduler
+
+
+class TestScheduler(BaseTest):
+
+    def test_parallel_models(self):
+        io_data = self.get_iodata()
+
+        def run_model(name):
+            if name == 'FAIL':
+                io_data.print_e('Failed on purpose')
+            with open(join(FOLDER_TEST, name + '.done'), 'w') as f:
+                f.write(name)
+
+        # models asking for more cores than the budget are capped
+        tasks = [('DT', 1), ('RF', 8), ('SVM', 2), ('FAIL', 1)]
+        failed = ModelScheduler(cpus=2, io_data=io_data).run(run_model, tasks)
+
+        self.assertEqual(failed, ['FAIL'], get_error_txt(ERROR_N_MODELS, failed))
+        for name in ['DT', 'RF', 'SVM']:
+            self.assertTrue(isfile(join(FOLDER_TEST, name + '.done')), get_error_txt(ERROR_N_MODELS, name))
+
+    def test_dependent_models(self):
+        io_data = self.get_iodata()
+
+        def run_model(name):
+            if name == 'VOT':
+                # the base models must be saved before the voting model starts
+                done = sorted(f for f in os.listdir(FOLDER_TEST) if f.endswith('.done'))
+                with open(join(FOLDER_TEST, 'VOT.txt'), 'w') as f:
+                    f.write(','.join(done))
+            else:
+                time.sleep(0.5)
+                with open(join(FOLDER_TEST, name + '.done'), 'w') as f:
+                    f.write(name)
+
+        tasks = [('VOT', 1, ['DT', 'RF']), ('DT', 1), ('RF', 1)]
+        failed = ModelScheduler(cpus=4, io_data=io_data).run(run_model, tasks)
+
+        self.assertEqual(failed, [], get_error_txt(ERROR_N_MODELS, failed))
+        with open(join(FOLDER_TEST, 'VOT.txt')) as f:
+            self.assertEqual(f.read(), 'DT.done,RF.done', get_error(ERROR_N_MODELS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+import unittest
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import GridSearchCV, ParameterGrid
+from sklearn.linear_model import LogisticRegression
+from sklearn.neighbors import KNeighborsClassifier, KNeighborsRegressor
+from sklearn.svm import SVC
+from Tests.BaseTest import *
+from Tests.errors import get_error, get_error_txt
+from Models.Utils.CrossValidation import CrossValidation
+from unittest import mock
+from Models.Utils.SearchCache import SearchCache, ENV_SEARCH_CACHE
+from Models.Utils.SearchEvaluators import get_evaluator, EnsembleSizeEvaluator, NeighborsEvaluator, KernelEvaluator
+from Models.Utils.TrainGrid import TrainGrid
+from Tools.datasets import get_dataset, split_samples
+
+
+class TestSearch(BaseTest):
+
+    def get_train(self, io_data):
+        x, y, id_list, idx_samples, target_classes = get_dataset(FILE_DATASET, io_data)
+        xtr, xts, ytr, yts, idx_xtr, idx_xts = split_samples(x, y, SPLIT_DATASET, io_data, SEED, idx_samples)
+        return xtr, ytr
+
+    def test_halving(self):
+        io_data = self.get_iodata()
+        xtr, ytr = self.get_train(io_data)
+        train_grid = TrainGrid(CrossValidation(io_data).choice_method('ST'))
+
+        # the budget is the number of samples
+        grid = {'C': [0.01, 0.1, 1, 10, 100], 'solver': ['lbfgs', 'liblinear']}
+        params = train_grid.train_halving(LogisticRegression(), grid, xtr, ytr, n_jobs=1, random_state=SEED)
+        self.assertEqual(set(params.keys()), set(grid.keys()), get_error_txt(ERROR_MODEL, params))
+
+        # the budget is the number of trees
+        grid = {'max_depth': [2, 5, None], 'min_samples_leaf': [1, 5]}
+        params = train_grid.train_halving(RandomForestClassifier(n_estimators=27), grid, xtr, ytr, n_jobs=1, random_state=SEED)
+        self.assertEqual(set(params.keys()), set(grid.keys()), get_error_txt(ERROR_MODEL, params))
+
+        # xgboost >= 2 leaves n_estimators as None
+        import xgboost as xgb
+        grid = {'max_depth': [2, 4], 'learning_rate': [0.1, 0.3]}
+        params = train_grid.train_halving(xgb.XGBClassifier(n_jobs=1), grid, xtr, ytr, n_jobs=1, random_state=SEED)
+        self.assertEqual(set(params.keys()), set(grid.keys()), get_error_txt(ERROR_MODEL, params))
+
+    def test_search_cache_file(self):
+        # the cache is only used when a file is given
+        with mock.patch.dict(os.environ, {ENV_SEARCH_CACHE: ''}):
+            self.assertIsNone(SearchCache.get_file(), get_error(ERROR_MODEL))
+            self.assertEqual(SearchCache.get_file('search.sqlite'), 'search.sqlite', get_error(ERROR_MODEL))
+        with mock.patch.dict(os.environ, {ENV_SEARCH_CACHE: 'env.sqlite'}):
+            self.assertEqual(SearchCache.get_file(), 'env.sqlite', get_error(ERROR_MODEL))
+
+    def test_search_cache(self):
+        io_data = self.get_iodata()
+        xtr, ytr = self.get_train(io_data)
+        cache = SearchCache(join(FOLDER_TEST, 'search.sqlite'))
+        train_grid = TrainGrid(CrossValidation(io_data).choice_method('ST'), cache=cache)
+        model, grid = LogisticRegression(), {'C': [0.01, 0.1, 1, 10], 'solver': ['lbfgs', 'liblinear']}
+        expected = TrainGrid(train_grid.cv).train_grid(model, grid, xtr, ytr, n_jobs=1, random_state=SEED)
+
+        # an interrupted search only scored the first block of candidates
+        candidates = [{'C': 0.01, 'solver': 'lbfgs'}, {'C': 0.01, 'solver': 'liblinear'}]
+        train_grid.train_grid(model, {'C': [0.01], 'solver': ['lbfgs', 'liblinear']}, xtr, ytr, n_jobs=1, random_state=SEED)
+        key = cache.get_key(model, candidates, xtr, ytr, train_grid.cv, TrainGrid.N_SPLIT, SEED, None)
+        self.assertEqual(len(cache.get(key)), 2, get_error(ERROR_MODEL))
+
+        params = train_grid.train_grid(model, grid, xtr, ytr, n_jobs=1, random_state=SEED)
+        self.assertEqual(params, expected, get_error_txt(ERROR_MODEL, params))
+        self.assertEqual(len(cache.get(key)), 8, get_error(ERROR_MODEL))
+
+        # a different seed is a different search
+        key = cache.get_key(model, candidates, xtr, ytr, train_grid.cv, TrainGrid.N_SPLIT, SEED + 1, None)
+        self.assertEqual(len(cache.get(key)), 0, get_error(ERROR_MODEL))
+
+    def test_ensemble_size(self):
+        io_data = self.get_iodata()
+        xtr, ytr = self.get_train(io_data)
+        cv = CrossValidation(io_data).choice_method('ST')
+        model, grid = RandomForestClassifier(random_state=SEED), {'n_estimators': [5, 10, 20], 'max_depth': [2, None]}
+        candidates = list(ParameterGrid(grid))
+
+        evaluator = get_evaluator(model, candidates)
+        self.assertIsInstance(evaluator, EnsembleSizeEvaluator, get_error(ERROR_MODEL))
+        self.assertEqual(len(evaluator.group(candidates)), 2, get_error(ERROR_MODEL))
+
+        # the prefixes of the largest forest score the same as forests trained from scratch
+        folds = list(cv(xtr, ytr, n_splits=TrainGrid.N_SPLIT, random_state=SEED))
+        results = evaluator.evaluate(model, candidates, xtr, ytr, folds, 1)
+        expected = GridSearchCV(model, grid, cv=folds).fit(xtr, ytr).cv_results_
+        for p, m in zip(results['params'], results['mean_test_score']):
+            i = expected['params'].index(p)
+            self.assertAlmostEqual(m, expected['mean_test_score'][i], msg=get_error_txt(ERROR_MODEL, p))
+
+        params = TrainGrid(cv).train_grid(model, grid, xtr, ytr, n_jobs=1, random_state=SEED)
+        self.assertEqual(params, expected['params'][int(np.argmin(expected['rank_test_score']))], get_error_txt(ERROR_MODEL, params))
+
+    def test_bagging_oob(self):
+        from sklearn.ensemble import BaggingClassifier
+        io_data = self.get_iodata()
+        xtr, ytr = self.get_train(io_data)
+        folds = list(CrossValidation(io_data).choice_method('ST')(xtr, ytr, n_splits=TrainGrid.N_SPLIT, random_state=SEED))
+        model = BaggingClassifier(random_state=SEED)
+        grid = {'n_estimators': [5, 10, 20], 'oob_score': [True, False], 'bootstrap': [True, False]}
+        candidates = list(ParameterGrid(grid))
+
+        # out-of-bag scores are not available with warm_start, those candidates are regular fits
+        evaluator = get_evaluator(model, candidates)
+        self.assertIsInstance(evaluator, EnsembleSizeEvaluator, get_error(ERROR_MODEL))
+        self.assertEqual(len(evaluator.group(candidates)), 8, get_error(ERROR_MODEL))
+
+        results = evaluator.evaluate(model, candidates, xtr, ytr, folds, 1)
+        expected = GridSearchCV(model, grid, cv=folds).fit(xtr, ytr).cv_results_
+        for p, m in zip(results['params'], results['mean_test_score']):
+            e = expected['mean_test_score'][expected['params'].index(p)]
+            if np.isnan(e):
+                # oob_score without bootstrap fails in both searches
+                self.assertTrue(np.isnan(m), get_error_txt(ERROR_MODEL, p))
+            else:
+                self.assertAlmostEqual(m, e, msg=get_error_txt(ERROR_MODEL, p))
+
+        with self.assertRaises(ValueError):
+            evaluator.evaluate(model, [{'n_estimators': 5, 'wrong': 1}, {'n_estimators': 10, 'wrong': 1}], xtr, ytr, folds, 1)
+
+    def test_linear_booster(self):
+        import xgboost as xgb
+        io_data = self.get_iodata()
+        xtr, ytr = self.get_train(io_data)
+        folds = list(CrossValidation(io_data).choice_method('ST')(xtr, ytr, n_splits=TrainGrid.N_SPLIT, random_state=SEED))
+        model = xgb.XGBClassifier(n_jobs=1, random_state=SEED)
+        grid = {'n_estimators': [2, 10, 30], 'booster': ['gbtree', 'gblinear']}
+        candidates = list(ParameterGrid(grid))
+
+        # the gblinear candidates are not prefixes of the largest booster
+        evaluator = get_evaluator(model, candidates)
+        self.assertEqual(len(evaluator.group(candidates)), 4, get_error(ERROR_MODEL))
+
+        results = evaluator.evaluate(model, candidates, xtr, ytr, folds, 1)
+        expected = GridSearchCV(model, grid, cv=folds).fit(xtr, ytr).cv_results_
+        for p, m in zip(results['params'], results['mean_test_score']):
+            i = expected['params'].index(p)
+            self.assertAlmostEqual(m, expected['mean_test_score'][i], msg=get_error_txt(ERROR_MODEL, p))
+
+    def test_neighbors(self):
+        io_data = self.get_iodata()
+        xtr, ytr = self.get_train(io_data)
+        # the features are integers, the noise breaks the ties between neighbors at the same distance
+        xtr = xtr + np.random.RandomState(SEED).rand(*xtr.shape) * 1e-3
+        folds = list(CrossValidation(io_data).choice_method('ST')(xtr, ytr, n_splits=TrainGrid.N_SPLIT, random_state=SEED))
+        grid = {'n_neighbors': [1, 3, 5, 8], 'weights': ['uniform', 'distance'], 'algorithm': ['ball_tree', 'brute'], 'p': [1, 2]}
+        candidates = list(ParameterGrid(grid))
+
+        # every neighbor table is shared by the candidates with the same metric
+        for model, y in [(KNeighborsClassifier(), ytr), (KNeighborsRegressor(), ytr.astype(float))]:
+            evaluator = get_evaluator(model, candidates)
+            self.assertIsInstance(evaluator, NeighborsEvaluator, get_error(ERROR_MODEL))
+            self.assertEqual(len(evaluator.group(candidates)), 2, get_error(ERROR_MODEL))
+
+            results = evaluator.evaluate(model, candidates, xtr, y, folds, 1)
+            expected = GridSearchCV(model, grid, cv=folds).fit(xtr, y).cv_results_
+            for p, m in zip(results['params'], results['mean_test_score']):
+                i = expected['params'].index(p)
+                self.assertAlmostEqual(m, expected['mean_test_score'][i], msg=get_error_txt(ERROR_MODEL, p))
+
+    def test_kernel(self):
+        io_data = self.get_iodata()
+        xtr, ytr = self.get_train(io_data)
+        xtr = (xtr - xtr.mean(axis=0)) / xtr.std(axis=0)
+        folds = list(CrossValidation(io_data).choice_method('ST')(xtr, ytr, n_splits=TrainGrid.N_SPLIT, random_state=SEED))
+        grid = [{'kernel': ['rbf'], 'gamma': ['scale', 'auto', 0.1], 'C': [0.1, 1, 10]},
+                {'kernel': ['poly'], 'degree': [2, 3], 'coef0': [0, 1], 'C': [0.5, 2]}]
+        candidates = list(ParameterGrid(grid))
+        model = SVC()
+
+        # one Gram matrix per kernel and fold, shared by all the C values
+        evaluator = get_evaluator(model, candidates)
+        self.assertIsInstance(evaluator, KernelEvaluator, get_error(ERROR_MODEL))
+        self.assertEqual(len(evaluator.group(candidates)), 7, get_error(ERROR_MODEL))
+
+        results = evaluator.evaluate(model, candidates, xtr, ytr, folds, 1)
+        self.assertEqual(len(evaluator.cache.items), 7 * len(folds), get_error(ERROR_MODEL))
+        expected = GridSearchCV(model, grid, cv=folds).fit(xtr, ytr).cv_results_
+        for p, m in zip(results['params'], results['mean_test_score']):
+            i = expected['params'].index(p)
+            self.assertAlmostEqual(m, expected['mean_test_score'][i], msg=get_error_txt(ERROR_MODEL, p))
+
+    def test_regularization_path(self):
+        io_data = self.get_iodata()
+        xtr, ytr = self.get_train(io_data)
+        train_grid = TrainGrid(CrossValidation(io_data).choice_method('ST'))
+        grid = {'C': [1, 0.01, 0.1, 10], 'solver': ['lbfgs', 'saga'], 'max_iter': [1000]}
+
+        params = train_grid.train_path(LogisticRegression(), grid, xtr, ytr, n_jobs=1, random_state=SEED)
+        report = train_grid.report['Regularization_path']
+        self.assertEqual(report['C'], [0.01, 0.1, 1, 10], get_error(ERROR_MODEL))
+        self.assertEqual(report['best_C'], params['C'], get_error_txt(ERROR_MODEL, params))
+        self.assertEqual(len(report['mean_test_score']), 4, get_error(ERROR_MODEL))
+        self.assertEqual(max(report['mean_test_score']), report['mean_test_score'][report['C'].index(params['C'])], get_error(ERROR_MODEL))
+
+        # liblinear ignores warm starts
+        grid['solver'] = ['lbfgs', 'liblinear']
+        params = train_grid.train_path(LogisticRegression(), grid, xtr, ytr, n_jobs=1, random_state=SEED)
+        self.assertEqual(params['solver'], 'lbfgs', get_error_txt(ERROR_MODEL, params))
+        self.assertIn('Regularization_path', train_grid.report, get_error(ERROR_MODEL))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""BatchPredictor.py:
+    Vectorized prediction of large sets of samples. The input is split into fixed-size chunks and every
+    chunk is sent to the model in a single call. The way of calling the model (probabilities or raw
+    predictions, 2D or 3D input) is chosen once, before the first chunk, instead of for every sample.
+
+    In streaming mode the input is read by blocks in a background thread, so that reading the next
+    block overlaps with predicting the current one, and the results are appended to the output csv.
+"""
+import threading
+import queue
+import numpy as np
+import pandas as pd
+from sklearn.base import is_regressor
+from Tools.ToolsModels import is_tf_model
+from Tools.sparse import densify
+
+LAYOUT_2D = '2d'
+LAYOUT_3D = '3d'  # recurrent models expect (samples, features, 1)
+COL_ID = 'Sample ID'
+COL_CLASS = 'Predicted class'
+COL_PROBA = 'Probability'
+
+
+class BatchPredictor:
+    BATCH_SIZE = 4096
+
+    def __init__(self, model, regression=False, batch_size=BATCH_SIZE):
+        """
+        @param model: model loaded with BaseModel.load
+        @param regression: bool
+        @param batch_size: number of samples predicted at once
+        """
+        self.model = model
+        self.regression = regression
+        self.batch_size = max(1, int(batch_size)) if batch_size else self.BATCH_SIZE
+        self.layout = None
+        self.use_proba = not is_tf_model(model) and hasattr(model, 'predict_proba') and callable(model.predict_proba)
+        self.regressor = self.is_sklearn_regressor(model)
+
+    def predict(self, x):
+        """
+        Predicts all the samples chunk by chunk
+        @param x: numpy.ndarray
+        @return: predicted classes and probabilities (classification) or -1 and predicted values (regression)
+        """
+        ypr_class, ypr_prob = [], []
+        for start in range(0, x.shape[0], self.batch_size):
+            yclass, yprob = self.predict_chunk(x[start:start + self.batch_size])
+            ypr_class.append(yclass)
+            ypr_prob.append(yprob)
+
+        if len(ypr_class) == 0:
+            return np.array([]), np.array([])
+        return np.concatenate(ypr_class), np.concatenate(ypr_prob)
+
+    def predict_stream(self, chunks, file_out, transform=None, prefetch=2):
+        """
+        Predicts a stream of blocks and appends the results to a csv file as they are computed
+        @param chunks: iterable of (ids, x) blocks
+        @param file_out: output csv file
+        @param transform: function applied to every block before predicting (e.g. persisted normalization)
+        @param prefetch: number of blocks read in advance
+        @return: number of predicted samples
+        """
+        n_samples = 0
+        header = True
+        for ids, x in Prefetcher(chunks, prefetch):
+            if transform is not None:
+                x = transform(x)
+            ypr_class, ypr_prob = self.predict(x)
+            df = pd.DataFrame({COL_ID: ids, COL_CLASS: ypr_class, COL_PROBA: ypr_prob})
+            df.to_csv(file_out, index=False, header=header, mode='w' if header else 'a')
+            header = False
+            n_samples += len(ids)
+        return n_samples
+
+    def predict_chunk(self, x):
+        """
+        Predicts a single chunk with one call to the model
+        @param x: numpy.ndarray
+        """
+        yhat = self.raw_predict(x)
+        if self.regression:
+            yhat = yhat.reshape(x.shape[0], -1)
+            return np.full(x.shape[0], -1), np.amax(yhat, axis=1)
+
+        if self.regressor:
+            raise ValueError('{} is a regressor, its predictions are not probabilities'.format(type(self.model).__name__))
+        yhat = self.to_proba(yhat, x.shape[0])
+        return yhat.argmax(axis=1), np.amax(yhat, axis=1)
+
+    def raw_predict(self, x):
+        if self.layout is None:
+            self.layout = self.choose_layout(x)
+
+        if is_tf_model(self.model):
+            x = densify(x)
+
+        if self.layout == LAYOUT_3D:
+            x = np.expand_dims(x, -1)
+
+        if is_tf_model(self.model):
+            return np.asarray(self.model.predict(x, batch_size=self.batch_size))
+        elif self.use_proba:
+            return np.asarray(self.model.predict_proba(x))
+        return np.asarray(self.model.predict(x))
+
+    def choose_layout(self, x):
+        """
+        Only TensorFlow models may need a different shape. A single sample is used as probe.
+        """
+        if not is_tf_model(self.model):
+            return LAYOUT_2D
+        try:
+            self.model.predict(densify(x[:1]))
+            return LAYOUT_2D
+        except Exception:
+            return LAYOUT_3D
+
+    @staticmethod
+    def is_sklearn_regressor(model):
+        try:
+            return is_regressor(model)
+        except (AttributeError, TypeError):
+            # not a scikit-learn estimator (e.g. keras or a custom model)
+            return False
+
+    @staticmethod
+    def to_proba(yhat, n_samples):
+        """
+        Models without predict_proba (e.g. RuleFit) return a single value per sample,
+        which is read as the probability of the positive class
+        @raise ValueError: a single value out of [0, 1], e.g. a decision function, is not a probability
+        """
+        yhat = yhat.reshape(n_samples, -1)
+        if yhat.shape[1] == 1:
+            pred = yhat[:, 0].astype(float)
+            if np.any((pred < 0) | (pred > 1)):
+                raise ValueError('Single predictions out of [0, 1] cannot be read as probabilities, '
+                                 'the model may be a regressor')
+            yhat = np.vstack([1 - pred, pred]).T
+        return yhat
+
+
+class Prefetcher:
+    """
+    Reads the items of an iterable in a background thread. At most 'depth' items are kept in memory.
+    """
+    _END = object()
+
+    def __init__(self, iterable, depth=2):
+        self.queue = queue.Queue(maxsize=max(1, depth))
+        self.error = None
+        self.thread = threading.Thread(target=self._fill, args=(iterable,), daemon=True)
+        self.thread.start()
+
+    def _fill(self, iterable):
+        try:
+            for item in iterable:
+                self.queue.put(item)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.queue.put(self._END)
+
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is self._END:
+                break
+            yield item
+
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
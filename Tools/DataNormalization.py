@@ -1,10 +1,16 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import numpy as np
 from sklearn import preprocessing
+from joblib import dump, load
 from Tools.IOData import IOData
+from Tools.sparse import issparse
 """
     DataNormalization.py:
     source: https://scikit-learn.org/stable/modules/preprocessing.html
+
+    Every method returns the transformer fitted on the data, so that the same preprocessing can be
+    persisted and applied later to new samples (e.g. when predicting by chunks).
 """
 __author__ = "Jorge de la Peña García"
 __version__ = "1.0"
@@ -29,27 +35,72 @@ class DataNormalization:
         'SMA': ['SC', 'MA']
     }
 
-    def choice_method_normalize(self, x, args):
+    FILE_PERSISTED = 'normalization.joblib'
+    # methods that can be fitted by blocks of rows when the data are memory-mapped
+    PARTIAL_FIT = ['SC', 'MM', 'MA']
+    # methods that keep sparse matrices sparse
+    SPARSE_METHODS = ['MA', 'NE', 'BI']
+
+    def __init__(self, transformers=None):
+        self.transformers = transformers if transformers is not None else []
 
+    def choice_method_normalize(self, x, args, store=None):
+        """
+        @param x: numpy.ndarray
+        @param args: input parameters
+        @param store: Tools.MemmapStore.MemmapStore. Normalized data are written into memory-mapped files
+        """
         if args.normalize:
             for i in args.normalize:
                 if isinstance(self.METHODS[i], list):
                     for m in self.METHODS[i]:
-                        x = self._run_method(x, m)
+                        x = self._run_method(x, m, store)
                 else:
-                    x = self._run_method(x, i)
+                    x = self._run_method(x, i, store)
             return x
         else:
             return x
 
-    def _run_method(self, x, method):
+    def _run_method(self, x, method, store=None):
         if method in self.METHODS.keys():
+            if issparse(x) and method not in self.SPARSE_METHODS:
+                IOData.print_e("Sparse data can only be normalized with {}".format(', '.join(self.SPARSE_METHODS)))
             func = getattr(self, self.METHODS[method])
-            return func(x)
+            # float32 data (--dtype float32) stay in float32, the rest is normalized in float64
+            dtype = np.float32 if x.dtype == np.float32 else np.float64
+            if store is None:
+                transformer = func(x)
+                self.transformers.append(transformer)
+                return transformer.transform(x).astype(dtype, copy=False)
+
+            if method in self.PARTIAL_FIT:
+                transformer = func(x[:store.block_rows])
+                for i in range(store.block_rows, x.shape[0], store.block_rows):
+                    transformer.partial_fit(x[i:i + store.block_rows])
+            else:
+                transformer = func(x)
+            self.transformers.append(transformer)
+            return store.transform('x_{}{}'.format(method, len(self.transformers)), x, transformer.transform, dtype)
         else:
             IOData.print_e("Error normalized")
             exit()
 
+    def transform(self, x):
+        """
+        Applies the already fitted transformers to new samples
+        @param x: numpy.ndarray
+        """
+        for transformer in self.transformers:
+            x = transformer.transform(x)
+        return x
+
+    def save(self, file_out):
+        dump(self.transformers, file_out)
+
+    @staticmethod
+    def load(file_in):
+        return DataNormalization(load(file_in))
+
     @staticmethod
     def scaler(x):
         """
@@ -57,7 +108,7 @@ class DataNormalization:
         @param x: numpy.ndarray:
         @return:
         """
-        return preprocessing.scale(x)
+        return preprocessing.StandardScaler().fit(x)
 
     @staticmethod
     def scaler_min_max(x, min=0, max=1):
@@ -66,7 +117,7 @@ class DataNormalization:
             @param x: numpy.ndarray:
         """
         min_max_scaler = preprocessing.MinMaxScaler([min, max])
-        return min_max_scaler.fit_transform(x)
+        return min_max_scaler.fit(x)
 
     @staticmethod
     def scaler_max_abs(x):
@@ -76,7 +127,7 @@ class DataNormalization:
             @param x: numpy.ndarray:
         """
         max_abs_scaler = preprocessing.MaxAbsScaler()
-        return max_abs_scaler.fit_transform(x)
+        return max_abs_scaler.fit(x)
 
     @staticmethod
     def quantile_transformer(x, random_state=2020):
@@ -86,8 +137,7 @@ class DataNormalization:
             @param x: numpy.ndarray:
         """
         quantile_transformer = preprocessing.QuantileTransformer(random_state=random_state)
-        x_aux = quantile_transformer.fit_transform(x)
-        return (x_aux)
+        return quantile_transformer.fit(x)
 
     @staticmethod
     def box_cox(x):
@@ -98,7 +148,7 @@ class DataNormalization:
             @param x: numpy.ndarray:
         """
         try:
-            return preprocessing.PowerTransformer(method='box-cox', standardize=False).fit_transform(x)
+            return preprocessing.PowerTransformer(method='box-cox', standardize=False).fit(x)
         except (ValueError, KeyError):
             IOData.print_e("Error normalized,  it could be that the matrix is not strictly positive")
 
@@ -109,7 +159,7 @@ class DataNormalization:
             variables to be strictly positive.
             @param x: numpy.ndarray:
         """
-        return preprocessing.PowerTransformer(method='yeo-johnson', standardize=False).fit_transform(x)
+        return preprocessing.PowerTransformer(method='yeo-johnson', standardize=False).fit(x)
 
     @staticmethod
     def normalize(x, norm='l2'):
@@ -118,7 +168,7 @@ class DataNormalization:
         @param x: numpy.ndarray:
         @param norm: The norm to use to normalize each non zero sample.
         """
-        return preprocessing.Normalizer(norm=norm).fit_transform(x)
+        return preprocessing.Normalizer(norm=norm).fit(x)
 
     @staticmethod
     def binarizer(x, threshold=0.5):
@@ -128,7 +178,7 @@ class DataNormalization:
         @param threshold: cutoff
         @return:
         """
-        return preprocessing.Binarizer(threshold=threshold).fit_transform(x)
+        return preprocessing.Binarizer(threshold=threshold).fit(x)
 
     @staticmethod
     def polynomialfeatures(x, degree=2, interaction_only=False):
@@ -139,4 +189,4 @@ class DataNormalization:
         @param interaction_only: only interaction features are produced
         @return:
         """
-        return preprocessing.PolynomialFeatures(degree=degree, interaction_only=interaction_only).fit_transform(x)
+        return preprocessing.PolynomialFeatures(degree=degree, interaction_only=interaction_only).fit(x)
@@ -5,6 +5,7 @@ from Tools.IOData import IOData
 from imblearn.over_sampling import ADASYN, RandomOverSampler, SMOTE
 from imblearn.under_sampling import RandomUnderSampler
 from Tools.ToolsModels import is_penalty_weighted, is_regression_by_config
+from Tools.ResourceManager import ResourceManager
 
 __author__ = "Jorge de la Peña García"
 __version__ = "1.0"
@@ -23,16 +24,17 @@ def print_size(x, y):
 
 class DatasetBalanced:
     METHODS = {'ADASYN': 'adasyn', 'ROS': 'random_over_sample', 'SMOTE': 'smote', 'PEN': 'weight_penalty', 'RUS': 'random_under_sample'}
+    PARALLEL_METHODS = ['ADASYN', 'SMOTE']  # n_jobs is given by the ResourceManager
 
-    def choice_method_balanced(self, x, y, args, idx_samples):
+    def choice_method_balanced(self, x, y, args, idx_samples, n_jobs=None):
 
         if args.balanced:
             for i in args.balanced:
                 if isinstance(self.METHODS[i], list):
                     for m in self.METHODS[i]:
-                        x, y = self._run_method(x, y, m, random_state=args.seed)
+                        x, y = self._run_method(x, y, m, random_state=args.seed, n_jobs=n_jobs)
                 else:
-                    x, y = self._run_method(x, y, i, random_state=args.seed)
+                    x, y = self._run_method(x, y, i, random_state=args.seed, n_jobs=n_jobs)
             if (len(y) != len(idx_samples)):
                 diff_lst = len(y) - len(idx_samples)
                 for i in range(diff_lst):
@@ -42,9 +44,11 @@ class DatasetBalanced:
         else:
             return x, y, idx_samples
 
-    def _run_method(self, x, y, method, random_state=None):
+    def _run_method(self, x, y, method, random_state=None, n_jobs=None):
         if method in self.METHODS.keys():
             func = getattr(self, self.METHODS[method])
+            if method in self.PARALLEL_METHODS:
+                return func(x, y, random_state=random_state, n_jobs=n_jobs)
             return func(x, y, random_state=random_state)
         else:
             IOData.print_e("Error normalized")
@@ -81,7 +85,7 @@ class DatasetBalanced:
         return x, y
 
     @staticmethod
-    def adasyn(x, y, random_state=None):
+    def adasyn(x, y, random_state=None, n_jobs=None):
         """
 
         @param x: numpy.ndarray:
@@ -94,7 +98,8 @@ class DatasetBalanced:
         n_neighbors = 5
         while True:
             try:
-                os = ADASYN(random_state=random_state, n_neighbors=n_neighbors, n_jobs=-1)
+                os = ADASYN(random_state=random_state, n_neighbors=n_neighbors)
+                ResourceManager.set_n_jobs(os, n_jobs)  # recent imblearn versions have no n_jobs
                 x, y = os.fit_resample(x, y)
             except:
                 n_neighbors -= 1
@@ -103,7 +108,7 @@ class DatasetBalanced:
         return x, y
 
     @staticmethod
-    def smote(x, y, random_state=None):
+    def smote(x, y, random_state=None, n_jobs=None):
         """
 
         @param x: numpy.ndarray:
@@ -116,7 +121,8 @@ class DatasetBalanced:
         k_neighbors = 5
         while True:
             try:
-                os = SMOTE(random_state=random_state, k_neighbors=k_neighbors, n_jobs=-1)
+                os = SMOTE(random_state=random_state, k_neighbors=k_neighbors)
+                ResourceManager.set_n_jobs(os, n_jobs)  # recent imblearn versions have no n_jobs
                 x, y = os.fit_resample(x, y)
                 break
             except:
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""DatasetCache.py:
+    Binary cache of parsed datasets. The first load of a dataset stores x, y and the sample IDs as .npy files
+    (plus a json with the feature names and the number of classes), so that later runs memory-map them instead
+    of parsing the file again.
+
+    Entries are keyed by the hash of the file content, its modification time and its size, along with the
+    options that change the parsed result (prediction mode, selected columns, type of the features). The hash
+    of a file is only computed again when its mtime or size change. The least recently used entries are
+    removed when the cache grows over its size limit.
+
+    Environment variables:
+        SIBILA_CACHE_DIR: folder of the cache (~/.cache/sibila/datasets by default)
+        SIBILA_CACHE_SIZE: maximum size of the cache in GB (10 by default)
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from os.path import join, isdir, isfile, abspath, expanduser, getmtime, getsize
+import numpy as np
+
+
+class DatasetCache:
+    DEFAULT_DIR = join('~', '.cache', 'sibila', 'datasets')
+    DEFAULT_SIZE_GB = 10
+    FILE_INDEX = 'index.json'
+    FILE_META = 'meta.json'
+    HASH_BLOCK = 1 << 24
+
+    def __init__(self, cache_dir=None, max_size=None):
+        """
+        @param cache_dir: folder of the cache
+        @param max_size: maximum size of the cache in bytes
+        """
+        if cache_dir is None:
+            cache_dir = os.getenv('SIBILA_CACHE_DIR', self.DEFAULT_DIR)
+        if max_size is None:
+            max_size = float(os.getenv('SIBILA_CACHE_SIZE', self.DEFAULT_SIZE_GB)) * 1024 ** 3
+        self.cache_dir = abspath(expanduser(cache_dir))
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_key(self, data_set, predicting=False, columns=None, dtype=None):
+        stat = os.stat(data_set)
+        options = {'predicting': bool(predicting), 'columns': columns}
+        if dtype is not None:
+            options['dtype'] = np.dtype(dtype).name
+        options = json.dumps(options, sort_keys=True, default=str)
+        key = '{}-{}-{}-{}'.format(self.file_hash(data_set, stat), int(stat.st_mtime), stat.st_size, options)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def file_hash(self, data_set, stat):
+        """ Hash of the file content, reused while the file keeps its mtime and size """
+        file_index = join(self.cache_dir, self.FILE_INDEX)
+        index = {}
+        if isfile(file_index):
+            try:
+                with open(file_index) as f:
+                    index = json.load(f)
+            except ValueError:
+                index = {}
+
+        path = abspath(data_set)
+        entry = index.get(path)
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            return entry['hash']
+
+        sha = hashlib.sha1()
+        with open(data_set, 'rb') as f:
+            for block in iter(lambda: f.read(self.HASH_BLOCK), b''):
+                sha.update(block)
+        index[path] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'hash': sha.hexdigest()}
+        self.write_json(index, file_index)
+        return index[path]['hash']
+
+    def load(self, key):
+        """
+        Memory-maps a cached dataset
+        @return: x, y, id_list, idx_samples, n_classes, or None if the dataset is not cached
+        """
+        folder = join(self.cache_dir, key)
+        if not isfile(join(folder, self.FILE_META)):
+            return None
+
+        try:
+            with open(join(folder, self.FILE_META)) as f:
+                meta = json.load(f)
+            x = np.load(join(folder, 'x.npy'), mmap_mode='r')
+            y = np.load(join(folder, 'y.npy'), mmap_mode='r')
+            idx_samples = np.load(join(folder, 'idx_samples.npy')).tolist()
+        except (ValueError, OSError):
+            # broken entry, it is built again
+            shutil.rmtree(folder, ignore_errors=True)
+            return None
+
+        os.utime(join(folder, self.FILE_META))  # last use, for the eviction
+        return x, y, meta['id_list'], idx_samples, meta['n_classes']
+
+    def save(self, key, x, y, id_list, idx_samples, n_classes):
+        folder = join(self.cache_dir, key)
+        if isdir(folder) or not (self.is_numeric(x) and self.is_numeric(y)):
+            # object arrays (mixed or string columns) cannot be memory-mapped
+            return
+
+        # the entry is written aside and renamed, so that concurrent runs never read it half written
+        tmp = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            np.save(join(tmp, 'x.npy'), np.ascontiguousarray(x))
+            np.save(join(tmp, 'y.npy'), np.asarray(y))
+            ids = np.asarray(idx_samples)
+            np.save(join(tmp, 'idx_samples.npy'), ids.astype(str) if ids.dtype == object else ids)
+            self.write_json({'id_list': list(map(str, id_list)), 'n_classes': int(n_classes)}, join(tmp, self.FILE_META))
+            os.rename(tmp, folder)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def evict(self):
+        """ Removes the least recently used entries while the cache is over its size limit """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            folder = join(self.cache_dir, name)
+            if name.startswith('.') or not isfile(join(folder, self.FILE_META)):
+                continue
+            size = sum(getsize(join(folder, f)) for f in os.listdir(folder))
+            entries.append((getmtime(join(folder, self.FILE_META)), size, folder))
+
+        total = sum(e[1] for e in entries)
+        for _, size, folder in sorted(entries):
+            if total <= self.max_size:
+                break
+            shutil.rmtree(folder, ignore_errors=True)
+            total -= size
+
+    @staticmethod
+    def is_numeric(a):
+        dtype = np.asarray(a).dtype if not hasattr(a, 'dtype') else a.dtype
+        return np.issubdtype(dtype, np.number) or np.issubdtype(dtype, np.bool_)
+
+    @staticmethod
+    def write_json(data, file_out):
+        tmp = '{}.{}.{}'.format(file_out, os.getpid(), int(time.time() * 1e6))
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, file_out)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""ApproximateKernelSVM.py:
+    Kernel SVMs for datasets too large for the exact SVC/SVR. The kernel is approximated with an explicit
+    feature map (Nystroem or random Fourier features) and a linear SVM is trained on the mapped features, so
+    the cost grows linearly with the number of rows. The classifier is calibrated to return probabilities.
+"""
+import numpy as np
+from scipy import sparse
+from sklearn.base import BaseEstimator, ClassifierMixin, RegressorMixin
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.kernel_approximation import Nystroem, RBFSampler
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+from sklearn.svm import LinearSVC, LinearSVR
+
+APPROXIMATIONS = ['nystroem', 'rff']
+SOLVERS = ['liblinear', 'sgd']
+
+
+class ApproximateKernelSVM(BaseEstimator):
+
+    def __init__(self, kernel='rbf', gamma='scale', degree=3, coef0=0, C=1.0, approximation='nystroem',
+                 n_components=1000, solver='liblinear', tol=1e-3, max_iter=1000, random_state=None):
+        """
+        @param kernel: kernel of the SVM, 'rbf', 'poly' or 'sigmoid' ('rbf' only with random Fourier features)
+        @param gamma: coefficient of the kernel, 'scale' and 'auto' as in SVC
+        @param approximation: 'nystroem' or 'rff' (random Fourier features)
+        @param n_components: dimension of the approximated feature space
+        @param solver: 'liblinear' (LinearSVC/LinearSVR) or 'sgd' (SGDClassifier/SGDRegressor)
+        """
+        self.kernel = kernel
+        self.gamma = gamma
+        self.degree = degree
+        self.coef0 = coef0
+        self.C = C
+        self.approximation = approximation
+        self.n_components = n_components
+        self.solver = solver
+        self.tol = tol
+        self.max_iter = max_iter
+        self.random_state = random_state
+
+    def get_gamma(self, X):
+        if self.gamma == 'scale':
+            if sparse.issparse(X):
+                var = X.multiply(X).mean() - X.mean() ** 2
+            else:
+                var = np.asarray(X).var()
+            return 1.0 / (X.shape[1] * var) if var != 0 else 1.0
+        if self.gamma == 'auto':
+            return 1.0 / X.shape[1]
+        return self.gamma
+
+    def make_map(self, X):
+        if self.approximation not in APPROXIMATIONS:
+            raise ValueError('approximation must be one of {}'.format(APPROXIMATIONS))
+        if self.solver not in SOLVERS:
+            raise ValueError('solver must be one of {}'.format(SOLVERS))
+
+        n_components = min(self.n_components, X.shape[0])
+        if self.approximation == 'rff':
+            if self.kernel != 'rbf':
+                raise ValueError('random Fourier features only approximate the rbf kernel')
+            return RBFSampler(gamma=self.get_gamma(X), n_components=n_components, random_state=self.random_state)
+        return Nystroem(kernel=self.kernel, gamma=self.get_gamma(X), degree=self.degree, coef0=self.coef0,
+                        n_components=n_components, random_state=self.random_state)
+
+    def fit_map(self, X):
+        """
+        Fits the feature map once, it does not depend on the target
+        @return: mapped features of X
+        """
+        self.map_ = self.make_map(X)
+        return self.map_.fit_transform(X)
+
+    def predict(self, X):
+        return self.model_.predict(self.map_.transform(X))
+
+
+class ApproximateKernelSVC(ClassifierMixin, ApproximateKernelSVM):
+
+    def __init__(self, kernel='rbf', gamma='scale', degree=3, coef0=0, C=1.0, approximation='nystroem',
+                 n_components=1000, solver='liblinear', tol=1e-3, max_iter=1000, random_state=None,
+                 class_weight=None, calibration='sigmoid', cv=3, n_jobs=None):
+        """
+        @param calibration: 'sigmoid' or 'isotonic', method to calibrate the probabilities
+        @param cv: folds of the calibration
+        @param n_jobs: folds of the calibration fitted at the same time
+        """
+        super().__init__(kernel=kernel, gamma=gamma, degree=degree, coef0=coef0, C=C, approximation=approximation,
+                         n_components=n_components, solver=solver, tol=tol, max_iter=max_iter,
+                         random_state=random_state)
+        self.class_weight = class_weight
+        self.calibration = calibration
+        self.cv = cv
+        self.n_jobs = n_jobs
+
+    def fit(self, X, y):
+        if self.solver == 'sgd':
+            # alpha is the inverse of C scaled by the number of rows, as in the hinge loss of LinearSVC
+            linear = SGDClassifier(loss='hinge', alpha=1.0 / (self.C * X.shape[0]), tol=self.tol,
+                                   max_iter=self.max_iter, class_weight=self.class_weight,
+                                   random_state=self.random_state)
+        else:
+            linear = LinearSVC(C=self.C, tol=self.tol, max_iter=self.max_iter, class_weight=self.class_weight,
+                               random_state=self.random_state)
+
+        # only the linear model is fitted again in every fold of the calibration
+        self.model_ = CalibratedClassifierCV(linear, method=self.calibration, cv=self.cv, n_jobs=self.n_jobs)
+        self.model_.fit(self.fit_map(X), y)
+        self.classes_ = self.model_.classes_
+        return self
+
+    def predict_proba(self, X):
+        return self.model_.predict_proba(self.map_.transform(X))
+
+
+class ApproximateKernelSVR(RegressorMixin, ApproximateKernelSVM):
+
+    def __init__(self, kernel='rbf', gamma='scale', degree=3, coef0=0, C=1.0, approximation='nystroem',
+                 n_components=1000, solver='liblinear', tol=1e-3, max_iter=1000, random_state=None, epsilon=0.0):
+        super().__init__(kernel=kernel, gamma=gamma, degree=degree, coef0=coef0, C=C, approximation=approximation,
+                         n_components=n_components, solver=solver, tol=tol, max_iter=max_iter,
+                         random_state=random_state)
+        self.epsilon = epsilon
+
+    def fit(self, X, y):
+        if self.solver == 'sgd':
+            linear = SGDRegressor(loss='epsilon_insensitive', epsilon=self.epsilon, alpha=1.0 / (self.C * X.shape[0]),
+                                  tol=self.tol, max_iter=self.max_iter, random_state=self.random_state)
+        else:
+            linear = LinearSVR(C=self.C, epsilon=self.epsilon, tol=self.tol, max_iter=self.max_iter,
+                               random_state=self.random_state)
+
+        self.model_ = linear.fit(self.fit_map(X), y)
+        return self
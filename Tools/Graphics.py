@@ -2,7 +2,6 @@ import numpy as np
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-import tensorflow as tf
 from sklearn.metrics import roc_curve, roc_auc_score, auc
 from os.path import splitext, join, exists
 from sklearn.tree import export_graphviz
@@ -10,19 +9,18 @@ import seaborn as sns
 import pandas as pd
 from Tools.IOData import IOData
 from Tools.ToolsModels import is_tf_model, is_rulefit_model, is_binary
+from Tools.sparse import densify
 from Common.Config.ConfigHolder import ATTR, FEATURE, MAX_SIZE_FEATURES, MAX_IMPORTANCES, CORR_CUTOFF, STD
-from plotly.subplots import make_subplots
-import plotly.graph_objects as go
 import math
-import shap
-from sklearn.inspection import plot_partial_dependence
-from alibi.explainers import plot_ale
 from glob import glob
 
+# tensorflow, shap, plotly and alibi are only imported by the plots that need them
+
 
 class Graphics:
     """ Draws the ANN model. Only valid for TensorFlow models """
     def draw_model(self, model, file_out):
+        import tensorflow as tf
         if isinstance(model, tf.keras.Model):
             tf.keras.utils.plot_model(model,
                                       to_file='{}_model.png'.format(file_out),
@@ -75,9 +73,11 @@ class Graphics:
             https://github.com/dataprofessor/code/blob/master/python/ROC_curve.ipynb
         """
         yppr = ypr
+        if is_tf_model(model):
+            xts = densify(xts)
 
         if is_tf_model(model) and file_out.find("RNN") >= 0:
-            xts = tf.expand_dims(xts, -1)
+            xts = np.expand_dims(xts, -1)
         elif not is_tf_model(model):
             # predict_proba() in sklearn produces returns two columns (N,K ) N number of datapoits, k number of classes
             yppr = model.predict_proba(xts)
@@ -96,7 +96,7 @@ class Graphics:
             self._generate_graph_roc(fpr, tpr, auc_value, proba_out, 'ROC curve prob class {}'.format(str(clazz)))
 
             if is_binary(cfg):
-                ypr_class = tf.round(yppr).numpy().astype(int)
+                ypr_class = np.round(yppr).astype(int)
                 fpr, tpr, thr = roc_curve(yts, ypr_class, pos_label=clazz)
                 auc_value = roc_auc_score(yts, ypr_class)
                 roc_out = splitext(file_out)[0] + "_{}.png".format(clazz)
@@ -273,6 +273,8 @@ class Graphics:
         total_items = len(df.columns)
         items_per_row = 3
         total_rows = math.ceil(total_items / items_per_row)
+        from plotly.subplots import make_subplots
+        import plotly.graph_objects as go
         fig = make_subplots(rows=total_rows, cols=items_per_row)
         cur_row = 1
         cur_col = 1
@@ -297,6 +299,8 @@ class Graphics:
         total_items = len(df.columns)
         items_per_row = 3
         total_rows = math.ceil(total_items / items_per_row)
+        from plotly.subplots import make_subplots
+        import plotly.graph_objects as go
         fig = make_subplots(rows=total_rows, cols=items_per_row, subplot_titles=df.columns)
         cur_row = 1
         cur_col = 1
@@ -356,6 +360,7 @@ class Graphics:
             f.write(html)
 
     def plot_shapley(self, xts, feature_names, shap_values, prefix):
+        import shap
         shap.summary_plot(shap_values, features=xts, feature_names=feature_names, show=False)
 
         plt.yticks(fontsize=8)  # make font smaller for a better reading
@@ -366,6 +371,7 @@ class Graphics:
         plt.rcParams.update(plt.rcParamsDefault)  # restore default fontsize and parameters
 
     def plot_shapley_local(self, shapley, feature_names, file_out, sample_id):
+        import shap
         shap.plots.bar(shap.Explanation(values=shapley.values,
                                         base_values=shapley.base_values,
                                         data=shapley.data,
@@ -381,6 +387,7 @@ class Graphics:
         plt.rcParams.update(plt.rcParamsDefault)  # restore default fontsize and parameters
 
     def plot_pdp_ice(self, model, xtr_df, feature, file_out, jobs=None, seed=0):
+        from sklearn.inspection import plot_partial_dependence
         display = plot_partial_dependence(model, xtr_df, [feature], kind='both', random_state=seed, n_jobs=jobs)
         for i in range(display.lines_.shape[1]):
             display.lines_[0, i, -1].set_color('gold')
@@ -390,6 +397,7 @@ class Graphics:
 
     """ Plots the Accumulated Local Effects plot for a given feature """
     def plot_ale(self, explainer, feature, file_out):
+        from alibi.explainers import plot_ale
         plot_ale(explainer, n_cols=1, sharey='row', features=[feature])
         self.save_fig(file_out)
 
@@ -430,7 +438,7 @@ class Graphics:
         
     """ Plots KNN cluster distribution """
     def graph_knn_points(self, model, xtr, ytr, id_list, file_out):
-        sns.scatterplot(x=xtr[:,0], y=ytr, palette=plt.cm.Paired, alpha=1.0, edgecolor="black")
+        sns.scatterplot(x=densify(xtr[:,0]).ravel(), y=ytr, palette=plt.cm.Paired, alpha=1.0, edgecolor="black")
         self.save_fig(file_out)
 
     """ Plot scopes rules """
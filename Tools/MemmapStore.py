@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""MemmapStore.py:
+    Out-of-core feature matrices (--memmap DIR). Every step of the pipeline (normalization, split, balancing)
+    writes its output into a .npy file memory-mapped from a local scratch folder, working by blocks of rows,
+    so that the matrix never needs to fit in memory.
+
+    Memory-mapped matrices are pickled as references to their files (see MemmapRef), so the _params.pkl of
+    the interpretability jobs stay small and every job maps the data instead of loading its own copy.
+"""
+import os
+from os.path import join, abspath
+import numpy as np
+from numpy.lib.format import open_memmap
+
+
+class MemmapStore:
+    BLOCK_ROWS = 4096
+
+    def __init__(self, folder, block_rows=BLOCK_ROWS):
+        self.folder = abspath(folder)
+        self.block_rows = block_rows
+        os.makedirs(self.folder, exist_ok=True)
+
+    def get_file(self, name):
+        return join(self.folder, '{}.npy'.format(name))
+
+    def create(self, name, shape, dtype=np.float64):
+        return open_memmap(self.get_file(name), mode='w+', dtype=dtype, shape=tuple(shape))
+
+    def copy(self, name, x, dtype=None):
+        """
+        Writes a matrix into a new memory-mapped file
+        @param name: name of the file, without extension
+        @param x: numpy.ndarray
+        """
+        out = self.create(name, x.shape, dtype or x.dtype)
+        for i in range(0, x.shape[0], self.block_rows):
+            out[i:i + self.block_rows] = x[i:i + self.block_rows]
+        out.flush()
+        return out
+
+    def take(self, name, x, idx, dtype=np.float64):
+        """
+        Writes the rows idx of x into a new memory-mapped file
+        """
+        out = self.create(name, (len(idx),) + x.shape[1:], dtype)
+        for i in range(0, len(idx), self.block_rows):
+            out[i:i + self.block_rows] = x[idx[i:i + self.block_rows]]
+        out.flush()
+        return out
+
+    def transform(self, name, x, func, dtype=np.float64):
+        """
+        Writes func(x) into a new memory-mapped file, applying func by blocks of rows
+        @param func: function on a block of rows, e.g. the transform method of a fitted scaler
+        """
+        first = np.asarray(func(x[:self.block_rows]), dtype=dtype)
+        out = self.create(name, (x.shape[0],) + first.shape[1:], dtype)
+        out[:first.shape[0]] = first
+        for i in range(self.block_rows, x.shape[0], self.block_rows):
+            out[i:i + self.block_rows] = func(x[i:i + self.block_rows])
+        out.flush()
+        return out
+
+
+class MemmapRef:
+    """ Picklable reference to a memory-mapped .npy file """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def open(self):
+        return np.load(self.filename, mmap_mode='r')
+
+
+def to_ref(x):
+    """
+    Returns a reference to x when x is a whole memory-mapped .npy file, or x itself otherwise
+    """
+    if isinstance(x, np.memmap) and x.filename and x.filename.endswith('.npy') and x.flags['C_CONTIGUOUS']:
+        try:
+            full = np.load(x.filename, mmap_mode='r')
+        except (OSError, ValueError):
+            return x
+        if full.shape == x.shape and full.dtype == x.dtype:
+            return MemmapRef(x.filename)
+    return x
+
+
+def from_ref(x):
+    return x.open() if isinstance(x, MemmapRef) else x
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""ModelScheduler.py:
+    Runs the pipelines of several models (-o RF SVM ANN ...) at the same time, each one in its own forked
+    process, so that the dataset loaded by the parent is shared read-only (copy-on-write) with all of them.
+
+    Every model reserves the cores it uses (ConfigHolder.get_cores, an even share of the budget when it asks
+    for all of them) from a global budget, and a model only starts when there are enough free cores, so the
+    node is never oversubscribed. The reserved cores are the
+    budget of the ResourceManager of the model. A model that uses the saved results of others (VOT loads the
+    base models) waits until all of them have finished.
+"""
+import multiprocessing as mp
+import os
+import traceback
+from multiprocessing.connection import wait
+from Tools.ResourceManager import ENV_CPUS, allocated_cpus, parse_cpus
+
+
+class ModelScheduler:
+
+    def __init__(self, cpus=None, io_data=None):
+        """
+        @param cpus: budget of cores for all the models, the cores allocated to the process by default
+        """
+        self.cpus = max(1, cpus or allocated_cpus())
+        self.io_data = io_data
+
+    @staticmethod
+    def can_fork():
+        return 'fork' in mp.get_all_start_methods()
+
+    def run(self, fn, tasks):
+        """
+        @param fn: function that runs the pipeline of a model, called as fn(name)
+        @param tasks: list of (name, cores) or (name, cores, after), after is the list of names of the models that
+                      must finish before it starts
+        @return: names of the models that failed
+        """
+        tasks = [(t[0], t[1], list(t[2]) if len(t) > 2 else []) for t in tasks]
+        if len(tasks) <= 1 or self.cpus <= 1 or not self.can_fork():
+            # the dependent models run the last ones
+            [fn(name) for name, _, after in tasks if not after]
+            [fn(name) for name, _, after in tasks if after]
+            return []
+
+        ctx = mp.get_context('fork')
+        share = max(1, self.cpus // len(tasks))
+        pending = [(name, min(parse_cpus(cores) or share, self.cpus), after) for name, cores, after in tasks]
+        running = {}
+        failed = []
+        free = self.cpus
+
+        while pending or running:
+            waiting = {name for name, _, _ in pending} | {name for _, name, _ in running.values()}
+            for task in list(pending):
+                name, cores, after = task
+                if cores <= free and not waiting.intersection(after):
+                    p = ctx.Process(target=self._run_task, args=(fn, name, cores), name='sibila-{}'.format(name))
+                    p.start()
+                    running[p.sentinel] = (p, name, cores)
+                    free -= cores
+                    pending.remove(task)
+                    self.print_m('{} started with {} cores ({} free)'.format(name, cores, free))
+
+            for sentinel in wait(list(running.keys())):
+                p, name, cores = running.pop(sentinel)
+                p.join()
+                free += cores
+                if p.exitcode != 0:
+                    failed.append(name)
+                    self.print_m('{} failed (exit code {})'.format(name, p.exitcode))
+                else:
+                    self.print_m('{} finished'.format(name))
+
+        return failed
+
+    @staticmethod
+    def _run_task(fn, name, cores):
+        os.environ[ENV_CPUS] = str(cores)
+        try:
+            fn(name)
+        except SystemExit:
+            # IOData.print_e has already printed the error
+            raise SystemExit(1)
+        except BaseException:
+            traceback.print_exc()
+            raise SystemExit(1)
+
+    def print_m(self, txt):
+        if self.io_data:
+            self.io_data.print_m(txt)
+        else:
+            print(txt)
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""PredictionServer.py:
+    Long-lived prediction process (python sibila.py serve). Loaded models are kept in a LRU cache, so
+    that only the first request to a model pays for loading it. Requests are sent over a local HTTP port
+    or a Unix socket:
+
+        POST /predict {"model": "folder/RF_dataset.joblib", "samples": [[...], ...], "ids": [...], "regression": false}
+        GET  /health
+
+    Concurrent requests to the same model are merged into micro-batches and predicted with a single call.
+"""
+import argparse
+import json
+import os
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import dirname, join, exists
+import numpy as np
+from Models.BaseModel import BaseModel
+from Tools.BatchPredictor import BatchPredictor, COL_ID, COL_CLASS, COL_PROBA
+from Tools.DataNormalization import DataNormalization
+
+
+class ModelCache:
+    """ LRU cache of models loaded with BaseModel.load """
+
+    def __init__(self, capacity, on_evict=None):
+        """
+        @param on_evict: function called with the file of every model removed from the cache
+        """
+        self.capacity = max(1, capacity)
+        self.on_evict = on_evict
+        self.models = OrderedDict()
+        self.loading = {}  # a lock per model being loaded, concurrent requests wait for a single load
+        self.lock = threading.Lock()
+
+    def get(self, file_model):
+        with self.lock:
+            if file_model in self.models:
+                self.models.move_to_end(file_model)
+                return self.models[file_model]
+            load_lock = self.loading.setdefault(file_model, threading.Lock())
+
+        with load_lock:
+            with self.lock:
+                if file_model in self.models:
+                    self.models.move_to_end(file_model)
+                    return self.models[file_model]
+            try:
+                entry = self.load(file_model)
+            finally:
+                with self.lock:
+                    self.loading.pop(file_model, None)
+
+            evicted = []
+            with self.lock:
+                self.models[file_model] = entry
+                self.models.move_to_end(file_model)
+                while len(self.models) > self.capacity:
+                    evicted.append(self.models.popitem(last=False)[0])
+
+        if self.on_evict is not None:
+            [self.on_evict(f) for f in evicted]
+        return entry
+
+    @staticmethod
+    def load(file_model):
+        if not exists(file_model):
+            raise FileNotFoundError('Model not found: {}'.format(file_model))
+
+        # models are trained on normalized data when the experiment used -n
+        file_normalization = join(dirname(file_model), DataNormalization.FILE_PERSISTED)
+        normalization = DataNormalization.load(file_normalization) if exists(file_normalization) else None
+        return BaseModel.load(file_model), normalization
+
+    def keys(self):
+        with self.lock:
+            return list(self.models.keys())
+
+
+class BatcherStopped(Exception):
+    pass
+
+
+class MicroBatcher:
+    """
+    Collects the requests to one model during at most max_wait seconds (or until max_batch samples are
+    waiting) and predicts all of them at once.
+    """
+
+    def __init__(self, cache, file_model, regression, max_batch, max_wait):
+        self.cache = cache
+        self.file_model = file_model
+        self.regression = regression
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pending = []
+        self.stopped = False
+        self.cond = threading.Condition()
+        threading.Thread(target=self._run, name='batcher-{}'.format(file_model), daemon=True).start()
+
+    def stop(self):
+        """
+        Ends the thread once the waiting requests are answered
+        """
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+
+    def predict(self, x):
+        """
+        @raise BatcherStopped: the batcher was stopped, the request must be sent to a new one
+        """
+        request = {'x': x, 'done': threading.Event(), 'result': None, 'error': None}
+        with self.cond:
+            if self.stopped:
+                raise BatcherStopped(self.file_model)
+            self.pending.append(request)
+            self.cond.notify()
+        request['done'].wait()
+        if request['error'] is not None:
+            raise request['error']
+        return request['result']
+
+    def _take_batch(self):
+        with self.cond:
+            while not self.pending and not self.stopped:
+                self.cond.wait()
+            if not self.pending:
+                return None
+            deadline = time.time() + self.max_wait
+            while sum(len(r['x']) for r in self.pending) < self.max_batch and not self.stopped:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            batch, self.pending = self.pending, []
+        return batch
+
+    @staticmethod
+    def n_features(model, normalization):
+        """
+        Columns expected by the model (by the first transformer when the data are normalized), None if unknown
+        """
+        first = normalization.transformers[0] if normalization is not None and normalization.transformers else model
+        n = getattr(first, 'n_features_in_', None)
+        return int(n) if n is not None else None
+
+    def _predict(self, batch, model, normalization):
+        x = np.concatenate([r['x'] for r in batch])
+        if normalization is not None:
+            x = normalization.transform(x)
+        predictor = BatchPredictor(model, regression=self.regression, batch_size=max(self.max_batch, len(x)))
+        ypr_class, ypr_prob = predictor.predict(x)
+
+        start = 0
+        for r in batch:
+            end = start + len(r['x'])
+            r['result'] = (ypr_class[start:end], ypr_prob[start:end])
+            start = end
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            try:
+                model, normalization = self.cache.get(self.file_model)
+
+                # a wrong request is answered with its error and does not reach the rest of the batch
+                n_features = self.n_features(model, normalization)
+                valid = []
+                for r in batch:
+                    if r['x'].ndim != 2 or (n_features is not None and r['x'].shape[1] != n_features):
+                        r['error'] = ValueError('Samples with shape {}, the model expects {} features'.format(r['x'].shape, n_features))
+                    else:
+                        valid.append(r)
+
+                try:
+                    if valid:
+                        self._predict(valid, model, normalization)
+                except Exception:
+                    for r in valid:
+                        try:
+                            self._predict([r], model, normalization)
+                        except Exception as e:
+                            r['error'] = e
+            except (Exception, SystemExit) as e:
+                # BaseModel.load exits on unknown formats, which must not kill the batching thread
+                for r in batch:
+                    r['error'] = e if isinstance(e, Exception) else ValueError('Model {} cannot be loaded'.format(self.file_model))
+            finally:
+                for r in batch:
+                    r['done'].set()
+
+
+class PredictionServer:
+    CACHE_SIZE = 8
+    MAX_BATCH = 4096
+    MAX_WAIT_MS = 10
+
+    def __init__(self, cache_size=CACHE_SIZE, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        # the batcher of a model ends when the model leaves the cache
+        self.cache = ModelCache(cache_size, on_evict=self.remove_batchers)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.
+        self.batchers = {}
+        self.lock = threading.Lock()
+
+    def get_batcher(self, file_model, regression):
+        key = (file_model, regression)
+        with self.lock:
+            if key not in self.batchers:
+                self.batchers[key] = MicroBatcher(self.cache, file_model, regression, self.max_batch, self.max_wait)
+            return self.batchers[key]
+
+    def remove_batchers(self, file_model):
+        with self.lock:
+            keys = [k for k in self.batchers if k[0] == file_model]
+            batchers = [self.batchers.pop(k) for k in keys]
+        [b.stop() for b in batchers]
+
+    def predict(self, request):
+        file_model = os.path.abspath(request['model'])
+        x = np.asarray(request['samples'], dtype=float)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        ids = request.get('ids', list(range(len(x))))
+
+        regression = bool(request.get('regression', False))
+        while True:
+            try:
+                ypr_class, ypr_prob = self.get_batcher(file_model, regression).predict(x)
+                break
+            except BatcherStopped:
+                # the model was evicted after its batcher was taken
+                continue
+        return {COL_ID: list(ids), COL_CLASS: ypr_class.tolist(), COL_PROBA: ypr_prob.tolist()}
+
+    def health(self):
+        return {'models': self.cache.keys()}
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') == '/health':
+                    self.reply(200, server.health())
+                else:
+                    self.reply(404, {'error': 'Unknown path {}'.format(self.path)})
+
+            def do_POST(self):
+                if self.path.rstrip('/') != '/predict':
+                    self.reply(404, {'error': 'Unknown path {}'.format(self.path)})
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    self.reply(200, server.predict(json.loads(self.rfile.read(length))))
+                except (KeyError, ValueError, TypeError, FileNotFoundError) as e:
+                    self.reply(400, {'error': str(e)})
+                except Exception as e:
+                    self.reply(500, {'error': str(e)})
+
+            def reply(self, code, body):
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def address_string(self):
+                # unix sockets have no client address
+                return str(self.client_address[0]) if self.client_address else 'unix'
+
+        return Handler
+
+    def serve(self, host='127.0.0.1', port=None, socket_file=None):
+        if socket_file:
+            if exists(socket_file):
+                os.remove(socket_file)
+            httpd = ThreadingUnixHTTPServer(socket_file, self.handler())
+            print('Serving predictions on unix socket {}'.format(socket_file))
+        else:
+            httpd = ThreadingHTTPServer((host, port), self.handler())
+            print('Serving predictions on http://{}:{}'.format(host, port))
+
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
+            if socket_file and exists(socket_file):
+                os.remove(socket_file)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def read_params(argv):
+    parser = argparse.ArgumentParser(prog='sibila.py serve', description='SIBILA prediction server')
+    parser.add_argument('--host', help='Interface to listen on', type=str, default='127.0.0.1')
+    parser.add_argument('--port', help='HTTP port', type=int, default=8765)
+    parser.add_argument('--socket', help='Listen on this unix socket instead of a port', type=str)
+    parser.add_argument('--cache-size', help='Number of models kept in memory', type=int, default=PredictionServer.CACHE_SIZE)
+    parser.add_argument('--max-batch', help='Maximum number of samples predicted at once', type=int, default=PredictionServer.MAX_BATCH)
+    parser.add_argument('--max-wait', help='Milliseconds waiting for concurrent requests to batch together', type=float, default=PredictionServer.MAX_WAIT_MS)
+    return parser.parse_args(argv)
+
+
+def serve(argv):
+    args = read_params(argv)
+    server = PredictionServer(args.cache_size, args.max_batch, args.max_wait)
+    server.serve(args.host, args.port, args.socket)
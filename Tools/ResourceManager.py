@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""ResourceManager.py:
+    Single place where the cores of a run are shared out, so that nested parallel stages never add up to more
+    threads than allocated cores:
+
+        search     hyperparameter search workers (GridSearchCV / RandomizedSearchCV n_jobs), with
+                   single-threaded estimators and BLAS inside every worker
+        fit        n_jobs of the final estimator, BLAS threads when the estimator has no n_jobs
+        tensorflow intra-op and inter-op thread pools
+        balancing  n_jobs of SMOTE and ADASYN
+        folds      processes running cross-validation folds, and threads of every process
+
+    The budget is read, in this order, from SIBILA_CPUS (--cpus, or the share given to a model by
+    ModelScheduler), the SLURM allocation and ConfigHolder.get_cores, always capped to the cores available
+    to the process. The n_jobs of a configuration is only a limit when it is a positive number, -1 (the
+    default) takes all the available cores. The assignments are saved in the _data.json of the model under 'Resources'.
+"""
+import os
+from contextlib import contextmanager
+
+ENV_CPUS = 'SIBILA_CPUS'
+
+
+def available_cpus():
+    """
+    Cores this process can run on: CPU affinity or all the cores of the node
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def parse_cpus(value):
+    """
+    Number of cores of a setting (env variable, n_jobs of a configuration), None if it is not a positive number
+    """
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def allocated_cpus(requested=None):
+    """
+    Cores allocated to the run
+    @param requested: cores asked by the configuration of the model (ConfigHolder.get_cores), -1 or None for all
+    """
+    for var in [ENV_CPUS, 'SLURM_CPUS_PER_TASK', 'SLURM_CPUS_ON_NODE']:
+        if parse_cpus(os.getenv(var)):
+            return min(parse_cpus(os.getenv(var)), available_cpus())
+
+    return min(parse_cpus(requested) or available_cpus(), available_cpus())
+
+
+class ResourceManager:
+
+    def __init__(self, cfg=None, searching=False, tensorflow=False):
+        """
+        @param cfg: Common.Config.ConfigHolder of the model
+        @param searching: a hyperparameter search is run with scikit-learn
+        @param tensorflow: the model is trained with tensorflow
+        """
+        self.cfg = cfg
+        self.cpus = allocated_cpus(cfg.get_cores() if cfg is not None else None)
+
+        # the outermost level gets all the cores and the inner ones run on a single thread
+        self.search_jobs = self.cpus if searching and not tensorflow else 1
+        self.search_estimator_jobs = 1
+        self.fit_jobs = self.cpus
+        self.tf_intra_threads = self.cpus
+        self.tf_inter_threads = min(2, self.cpus)
+        self.balancing_jobs = self.cpus
+
+    def get_resources(self):
+        return {
+            'cpus': self.cpus,
+            'search_jobs': self.search_jobs,
+            'search_estimator_jobs': self.search_estimator_jobs,
+            'fit_jobs': self.fit_jobs,
+            'tf_intra_threads': self.tf_intra_threads,
+            'tf_inter_threads': self.tf_inter_threads,
+            'balancing_jobs': self.balancing_jobs
+        }
+
+    def log(self, **extra):
+        if self.cfg is not None:
+            self.cfg.get_config()['Resources'] = {**self.get_resources(), **extra}
+
+    def split(self, n_tasks):
+        """
+        Shares the cores between tasks run at the same time
+        @return: number of worker processes, threads of every worker
+        """
+        workers = max(1, min(n_tasks, self.cpus))
+        return workers, max(1, self.cpus // workers)
+
+    @staticmethod
+    def set_n_jobs(model, n_jobs):
+        """
+        Sets n_jobs on estimators that have it (RF, KNN, LR, BAG, XGBOOST...)
+        @return: True if the estimator runs its own workers
+        """
+        try:
+            if 'n_jobs' in model.get_params(deep=False):
+                model.set_params(n_jobs=n_jobs)
+                return True
+        except Exception:
+            pass
+        return False
+
+    def search_grid(self, params_grid):
+        """
+        Copy of the search grid in which the estimators use a single core, the search gets all of them
+        """
+        if isinstance(params_grid, dict) and 'n_jobs' in params_grid:
+            params_grid = dict(params_grid)
+            params_grid['n_jobs'] = [self.search_estimator_jobs]
+        return params_grid
+
+    @contextmanager
+    def search_context(self):
+        """
+        Limits BLAS/OpenMP threads inside the workers of the search
+        """
+        from joblib import parallel_backend
+        try:
+            backend = parallel_backend('loky', inner_max_num_threads=self.search_estimator_jobs)
+        except TypeError:
+            # joblib < 0.14 cannot limit the threads of its workers
+            backend = parallel_backend('loky')
+        with backend:
+            yield
+
+    @contextmanager
+    def fit_context(self, estimator_parallel):
+        """
+        BLAS/OpenMP threads of the final fit: one when the estimator runs its own workers, all of them otherwise
+        """
+        with self.blas_limits(1 if estimator_parallel else self.cpus):
+            yield
+
+    @staticmethod
+    @contextmanager
+    def blas_limits(n_threads):
+        try:
+            from threadpoolctl import threadpool_limits
+        except ImportError:
+            yield
+            return
+        with threadpool_limits(limits=n_threads):
+            yield
+
+    def configure_tensorflow(self):
+        """
+        Thread pools of tensorflow. They can only be set before tensorflow runs its first operation.
+        """
+        import tensorflow as tf
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(self.tf_intra_threads)
+            tf.config.threading.set_inter_op_parallelism_threads(self.tf_inter_threads)
+        except RuntimeError:
+            pass
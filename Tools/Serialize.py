@@ -3,6 +3,7 @@
 """Serialize.py:
 """
 from Models import BaseModel
+from Tools.MemmapStore import to_ref, from_ref
 
 
 class Serialize:
@@ -29,6 +30,18 @@ class Serialize:
         self.idx_xts = idx_xts
         self.run_method = run_method  # only for a methode and called from a module
 
+    def __getstate__(self):
+        # memory-mapped matrices (--memmap) are pickled as references to their files
+        state = self.__dict__.copy()
+        state['xtr'] = to_ref(self.xtr)
+        state['xts'] = to_ref(self.xts)
+        return state
+
+    def __setstate__(self, state):
+        state['xtr'] = from_ref(state['xtr'])
+        state['xts'] = from_ref(state['xts'])
+        self.__dict__.update(state)
+
     def set_run_method(self, run_method):
         self.run_method = run_method
 
@@ -1,4 +1,3 @@
-import tensorflow as tf
 from Tools.TypeML import TypeML
 from Tools.ClassFactory import ClassFactory
 from Tools.Estimators.RipperEstimator import RipperEstimator
@@ -40,6 +39,7 @@ def is_binary(cfg):
     return False
 
 def make_model(cfg, id_list, input_shape=None):
+    import tensorflow as tf
     return tf.keras.Sequential([
         #tf.keras.layers.InputLayer(input_shape=input_shape),
         tf.keras.layers.Dense(16, activation='relu'),
@@ -1,12 +1,23 @@
+import json
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from sklearn.model_selection import train_test_split
 
 from os.path import splitext, isfile
+from Tools.DatasetCache import DatasetCache
+from Tools.sparse import issparse
 FIELD_TARGET = 'class'
+PANDAS_EXTENSIONS = ['.csv', '.pkl', '.parquet', '.feather']
+NUMPY_EXTENSIONS = ['.npy', '.npz']
 
 
-def read_data(file_in, io_data=None, head=None):
+def read_data(file_in, io_data=None, head=None, columns=None):
+    """
+    Reads a dataset into a dataframe
+    :param file_in: csv, pkl, parquet or feather file
+    :param columns: names of the columns to read, all of them by default
+    """
     if isfile(file_in):
         if io_data:
             io_data.print_m("Read Data {}".format(file_in))
@@ -14,11 +25,23 @@ def read_data(file_in, io_data=None, head=None):
         if ext == ".pkl":
             if io_data:
                 io_data.print_m("End read data (pkl)")
-            return pd.read_pickle(file_in)
+            df = pd.read_pickle(file_in)
+            return df if columns is None else df[columns]
         elif ext == ".csv":
             if io_data:
                 io_data.print_m("End read data (csv)")
-            return pd.read_csv(file_in)
+            return pd.read_csv(file_in, usecols=columns)
+        elif ext in [".parquet", ".feather"]:
+            try:
+                # parquet and feather are columnar, so only the requested columns are read from disk
+                df = pd.read_parquet(file_in, columns=columns) if ext == ".parquet" else pd.read_feather(file_in, columns=columns)
+            except ImportError:
+                if io_data:
+                    io_data.print_e("pyarrow is required to read {} files".format(ext))
+                raise
+            if io_data:
+                io_data.print_m("End read data ({})".format(ext[1:]))
+            return df
         else:
             if io_data:
                 io_data.print_e("Unsupported format: " + ext)
@@ -27,16 +50,122 @@ def read_data(file_in, io_data=None, head=None):
             io_data.print_e("File not found: " + file_in)
 
 
-def get_dataset(data_set, io_data=None, predicting=False):
+def read_header(file_in):
+    """
+    Names of the columns of a dataset, without reading its rows when the format allows it
+    """
+    ext = splitext(file_in)[1]
+    if ext == ".csv":
+        return pd.read_csv(file_in, nrows=0).columns.tolist()
+    elif ext == ".parquet":
+        import pyarrow.parquet as pq
+        return pq.read_schema(file_in).names
+    elif ext == ".feather":
+        import pyarrow.ipc as ipc
+        return ipc.open_file(file_in).schema.names
+    return read_data(file_in).columns.tolist()
+
+
+def select_columns(header, columns, predicting, io_data=None):
+    """
+    Columns to read: the IDs, the selected features and, when training, the class
+    """
+    selected = set(columns)
+    missing = selected.difference(header)
+    if missing and io_data:
+        io_data.print_e("Columns not found in the dataset: {}".format(', '.join(map(str, sorted(missing)[:10]))))
+    last = len(header) if predicting else len(header) - 1
+    return [header[0]] + [c for c in header[1:last] if c in selected] + ([] if predicting else [header[-1]])
+
+
+def read_numpy(data_set, io_data=None, predicting=False, columns=None):
+    """
+    Reads a dataset saved with NumPy:
+        .npz: arrays x (samples x features), y and, optionally, features and ids
+        .npz saved with scipy.sparse.save_npz: sparse x, with a sidecar <name>.json holding features, ids and y
+        .npy: matrix x (samples x features), with a sidecar <name>.json holding features, ids and y
+    The .npy matrix is memory-mapped, so that x is not copied unless some columns are selected.
+    :return: x, y, feature names and IDs
+    """
+    meta = None
+    if splitext(data_set)[1] == ".npz":
+        with np.load(data_set, allow_pickle=False) as npz:
+            if 'format' not in npz.files:
+                meta = {k: npz[k] for k in npz.files if k != 'x'}
+                x = npz['x']
+        if meta is None:
+            x = sparse.load_npz(data_set).tocsr()
+    else:
+        x = np.load(data_set, mmap_mode='r')
+
+    if meta is None:
+        file_meta = '{}.json'.format(splitext(data_set)[0])
+        meta = {}
+        if isfile(file_meta):
+            with open(file_meta) as f:
+                meta = json.load(f)
+        elif io_data:
+            io_data.print_m("{} not found. Default feature names and IDs are used".format(file_meta))
+
+    feature_list = [str(f) for f in meta['features']] if 'features' in meta else ['F{}'.format(i) for i in range(x.shape[1])]
+    idx_samples = np.asarray(meta['ids']).tolist() if 'ids' in meta else list(range(x.shape[0]))
+    if predicting or 'y' not in meta:
+        if not predicting and io_data:
+            io_data.print_e("The dataset {} has no target values (y)".format(data_set))
+        y = np.zeros(x.shape[0], dtype=int)
+    else:
+        y = np.asarray(meta['y'])
+
+    if len(feature_list) != x.shape[1] or len(idx_samples) != x.shape[0] or len(y) != x.shape[0]:
+        if io_data:
+            io_data.print_e("The features, IDs and y do not match the shape of {}".format(data_set))
+
+    if columns is not None:
+        selected = set(columns)
+        missing = selected.difference(feature_list)
+        if missing and io_data:
+            io_data.print_e("Columns not found in the dataset: {}".format(', '.join(map(str, sorted(missing)[:10]))))
+        idx_cols = [i for i, f in enumerate(feature_list) if f in selected]
+        x = x[:, idx_cols]
+        feature_list = [feature_list[i] for i in idx_cols]
+
+    if io_data:
+        io_data.print_m("End read data ({})".format(splitext(data_set)[1][1:]))
+    return x, y, feature_list, idx_samples
+
+
+def get_dataset(data_set, io_data=None, predicting=False, columns=None, cache=False, dtype=None):
     """
     Load the dataset into memory
     :param data_set
+    :param columns: features to read, all of them by default
+    :param cache: keep the parsed dataset in the binary cache (Tools/DatasetCache.py)
+    :param dtype: type of the features (e.g. float32), the type read from the file by default
     :return:
     """
 
+    if cache and type(data_set) is str and isfile(data_set) and splitext(data_set)[1] in PANDAS_EXTENSIONS:
+        dataset_cache = DatasetCache()
+        key = dataset_cache.get_key(data_set, predicting, columns, dtype)
+        cached = dataset_cache.load(key)
+        if cached is not None:
+            if io_data:
+                io_data.print_m("Read cached data {}".format(data_set))
+            return cached
+
+        dataset = get_dataset(data_set, io_data, predicting, columns, dtype=dtype)
+        dataset_cache.save(key, *dataset)
+        return dataset
+
     if type(data_set) is str and isfile(data_set):
-        if splitext(data_set)[1] == ".csv" or splitext(data_set)[1] == ".pkl":
-            dataset = read_data(data_set, io_data)
+        ext = splitext(data_set)[1]
+        if ext in NUMPY_EXTENSIONS:
+            x, y, feature_list, idx_samples = read_numpy(data_set, io_data, predicting, columns)
+            target_classes = len(np.unique(y))
+        elif ext in PANDAS_EXTENSIONS:
+            if columns is not None:
+                columns = select_columns(read_header(data_set), columns, predicting, io_data)
+            dataset = read_data(data_set, io_data, columns=columns)
             features = dataset.columns
 
             if not predicting:
@@ -79,10 +208,54 @@ def get_dataset(data_set, io_data=None, predicting=False):
     else:
         io_data.print_e("Dataset not found")
 
-    return np.array(x), np.array(y), feature_list, idx_samples, target_classes
+    # columnar formats are already held in a single float block, so no copy is made here
+    x = x if issparse(x) else np.asarray(x)
+    if dtype is not None:
+        x = x.astype(dtype, copy=False)
+    return x, np.asarray(y), feature_list, idx_samples, target_classes
 
 
-def split_samples(x, y, train_size, io_data, random_state, idx_samples, is_regression=False):
+def read_chunks(data_set, chunk_size, io_data=None, columns=None, dtype=float):
+    """
+    Reads a dataset to predict by blocks of rows, so that it never has to fit in memory.
+    As in prediction mode, the first column holds the IDs and the rest are features.
+    :param data_set: csv, parquet or npy file (pkl, feather and npz files cannot be read partially and they are loaded at once)
+    :param chunk_size: number of rows of every block
+    :param columns: features to read, all of them by default
+    :param dtype: type of the features
+    :return: generator of (ids, x) blocks
+    """
+    if not isfile(data_set):
+        if io_data:
+            io_data.print_e("Dataset not found")
+        return
+
+    ext = splitext(data_set)[1]
+    if ext in NUMPY_EXTENSIONS:
+        # .npy files are memory-mapped, so only the current block is loaded
+        x, _, _, idx_samples = read_numpy(data_set, io_data, True, columns)
+        idx_samples = np.asarray(idx_samples)
+        for i in range(0, x.shape[0], chunk_size):
+            chunk = x[i:i + chunk_size]
+            yield idx_samples[i:i + chunk_size], chunk.astype(dtype) if issparse(chunk) else np.asarray(chunk, dtype=dtype)
+        return
+
+    if columns is not None:
+        columns = select_columns(read_header(data_set), columns, True, io_data)
+    if ext == ".csv":
+        reader = pd.read_csv(data_set, chunksize=chunk_size, usecols=columns)
+    elif ext == ".parquet":
+        import pyarrow.parquet as pq
+        reader = (batch.to_pandas() for batch in pq.ParquetFile(data_set).iter_batches(batch_size=chunk_size, columns=columns))
+    else:
+        dataset = read_data(data_set, io_data, columns=columns)
+        reader = (dataset.iloc[i:i + chunk_size] for i in range(0, dataset.shape[0], chunk_size))
+
+    for chunk in reader:
+        yield chunk.iloc[:, 0].to_numpy(), chunk.iloc[:, 1:].to_numpy(dtype=dtype)
+
+
+def split_samples(x, y, train_size, io_data, random_state, idx_samples, is_regression=False, store=None, dtype=float):
     """
         Split the samples by the percentage indicated in samble_test
     :param x:
@@ -90,22 +263,40 @@ def split_samples(x, y, train_size, io_data, random_state, idx_samples, is_regre
     :param train_size:
     :param io_data:
     @param random_state:
+    :param idx_samples: IDs of the samples
+    :param is_regression: classification splits are stratified by class
+    :param store: Tools.MemmapStore.MemmapStore. xtr and xts are written into memory-mapped files
+    :param dtype: type of xtr and xts
     :return:
     """
-    # Split the data into training and testing sets
-    x = np.insert(x.astype(str), 0, idx_samples, axis=1)  # add index
-
-    xtr, xts, ytr, yts = train_test_split(x, y, train_size=train_size, random_state=random_state)
+    # Split the indices of the samples, so that the feature matrix is only copied once into xtr and xts
+    idx = np.arange(x.shape[0])
+    stratify = None if is_regression else get_stratify(y)
+    try:
+        idx_tr, idx_ts = train_test_split(idx, train_size=train_size, random_state=random_state, stratify=stratify)
+    except ValueError:
+        # too few samples to keep every class on both sides
+        idx_tr, idx_ts = train_test_split(idx, train_size=train_size, random_state=random_state)
 
-    # 1st column contains IDs and the rest are converted to numbers
-    idx_xtr = xtr[:, 0]  # get index
-    idx_xts = xts[:, 0]  # get index
+    # IDs travel apart from the features
+    idx_samples = np.asarray(idx_samples).astype(str)
+    idx_xtr = idx_samples[idx_tr]
+    idx_xts = idx_samples[idx_ts]
 
-    xtr = xtr[:, 1:].astype(float)
-    xts = xts[:, 1:].astype(float)
+    if issparse(x):
+        # CSR rows are gathered without densifying
+        xtr = x[idx_tr].astype(dtype)
+        xts = x[idx_ts].astype(dtype)
+    elif store is not None:
+        xtr = store.take('xtr', x, idx_tr, dtype)
+        xts = store.take('xts', x, idx_ts, dtype)
+    else:
+        xtr = np.take(x, idx_tr, axis=0).astype(dtype, copy=False)
+        xts = np.take(x, idx_ts, axis=0).astype(dtype, copy=False)
+    ytr, yts = y[idx_tr], y[idx_ts]
 
     io_data.print_m('Number of samples: {}'.format(x.shape[0]))
-    io_data.print_m('Number of features: {}'.format(x.shape[1]-1))
+    io_data.print_m('Number of features: {}'.format(x.shape[1]))
     if not is_regression:
         io_data.print_m('Target classes: {}'.format(','.join(np.unique(y).astype(str))))
 
@@ -131,3 +322,11 @@ def split_samples(x, y, train_size, io_data, random_state, idx_samples, is_regre
 
     return xtr, xts, ytr, yts, idx_xtr, idx_xts
 
+
+
+def get_stratify(y):
+    """
+    Classes are only stratified when all of them have at least two samples
+    """
+    _, counts = np.unique(y, return_counts=True)
+    return y if len(counts) > 1 and counts.min() >= 2 else None
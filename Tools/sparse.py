@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""sparse.py:
+    Helpers for sparse feature matrices (scipy.sparse CSR). Data are kept sparse through the split, the
+    MaxAbs scaling and the models that accept them, and they are only densified by blocks of rows where
+    a dense matrix is needed (TensorFlow models, explainers).
+"""
+import numpy as np
+from scipy import sparse
+
+BATCH_SIZE = 4096
+
+
+def issparse(x):
+    return sparse.issparse(x)
+
+
+def to_csr(x, dtype=None):
+    """
+    Converts a matrix into CSR, e.g. a dataset read from csv with --sparse
+    @param dtype: type of the values, by default the floating type of x (float64 for other types)
+    """
+    if dtype is None:
+        dtype = x.dtype if np.issubdtype(x.dtype, np.floating) else np.float64
+    if issparse(x):
+        return x.tocsr().astype(dtype, copy=False)
+    return sparse.csr_matrix(np.asarray(x, dtype=dtype))
+
+
+def densify(x, batch_size=BATCH_SIZE):
+    """
+    Dense copy of a sparse matrix, built by blocks of rows. Dense matrices are returned unchanged.
+    """
+    if not issparse(x):
+        return x
+    x = x.tocsr()
+    out = np.empty(x.shape, dtype=x.dtype)
+    for i in range(0, x.shape[0], batch_size):
+        out[i:i + batch_size] = x[i:i + batch_size].toarray()
+    return out
+
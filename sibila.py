@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from Common.Analysis.Interpretability import Interpretability
-from Tools.datasets import get_dataset, split_samples, FIELD_TARGET
+from Tools.datasets import get_dataset, split_samples, read_chunks, FIELD_TARGET
 from Tools.IOData import IOData, get_serialized_params
 from Common.Config.ConfigHolder import ConfigHolder
 from Common.Config.config import get_config, get_basic_config
@@ -15,17 +15,27 @@ from datetime import datetime
 from Tools.DataNormalization import DataNormalization
 from Tools.ToolsModels import is_regression_by_config, is_tf_model
 import os
+import sys
 from os.path import join, basename, splitext, dirname, exists
 from Tools.Serialize import Serialize
 from Tools.DatasetBalanced import DatasetBalanced
 import numpy as np
 import pandas as pd
-from Models import *
+from Models import BaseModel, get_model_class
 from Tools.Timer import Timer
+from Tools.MemmapStore import MemmapStore
+from Tools.ModelScheduler import ModelScheduler
+from Tools.ResourceManager import ResourceManager, ENV_CPUS
+from Tools.sparse import issparse, to_csr, densify
+from Tools.BatchPredictor import BatchPredictor, COL_ID, COL_CLASS, COL_PROBA
 from Tools.Bash.Queue_manager.JobManager import JobManager
 from Tools.GPUTracker import GPUTracker
-import tensorflow as tf
-tf.get_logger().setLevel('ERROR')
+from Tools.PredictionServer import serve
+import logging
+logging.getLogger('tensorflow').setLevel(logging.ERROR)  # same logger as tf.get_logger(), without importing tensorflow
+
+# models built from the saved results of the other models of the experiment
+DEPENDENT_MODELS = ['VOT']
 
 
 def get_cfg(folder_experiment, file_dataset, type_model, args):
@@ -47,6 +57,8 @@ def main():
     options = args.option
 
     io_data = IOData()
+    if args.cpus:
+        os.environ[ENV_CPUS] = str(args.cpus)
 
     if args.explanation is not None:
         Interpretability(get_serialized_params(args.explanation))
@@ -61,11 +73,31 @@ def main():
     else:
         io_data.create_dirs_no_remove(args.folder) 
 
-    t = Timer('Load data')
-    x, y, id_list, idx_samples, n_classes = get_dataset(file_dataset, io_data, args.model)
-    x = DataNormalization().choice_method_normalize(x, args)
+    if args.model and args.stream:
+        [execute_pred_stream(io_data, file_dataset, type_model, args) for type_model in args.model]
+        exit()
 
-    if not args.model and not args.skip_dataset_analysis:
+    t = Timer('Load data')
+    x, y, id_list, idx_samples, n_classes = get_dataset(file_dataset, io_data, args.model, args.columns, cache=not args.no_cache, dtype=args.dtype)
+    if args.sparse and not issparse(x):
+        x = to_csr(x, dtype=args.dtype)
+    store = get_memmap_store(args) if not issparse(x) else None
+    if store is not None and not isinstance(x, np.memmap):
+        x = store.copy('x', x)
+    if args.model:
+        # new samples get the preprocessing fitted on the training data
+        transform = load_normalization(args, io_data)
+        if transform is not None:
+            x = transform(x)
+    else:
+        normalization = DataNormalization()
+        x = normalization.choice_method_normalize(x, args, store)
+        if args.normalize:
+            normalization.save(join(args.folder, DataNormalization.FILE_PERSISTED))
+
+    if not args.model and not args.skip_dataset_analysis and issparse(x):
+        io_data.print_m('The analysis of the dataset is skipped for sparse data')
+    elif not args.model and not args.skip_dataset_analysis:
         Graphics().graph_dataset(x, y, id_list, FIELD_TARGET, join(args.folder, 'Dataset/'))
     t.save('{}/load_time.txt'.format(args.folder), io_data)
 
@@ -79,10 +111,19 @@ def main():
         if is_regression_by_config(get_cfg("", file_dataset, options[0], args)):
             y = DataNormalization().choice_method_normalize(y.reshape(-1, 1), args).ravel()
         #x, y, idx_samples = DatasetBalanced().choice_method_balanced(x, y, args, idx_samples)
-        [
-            execute(x, y, id_list, idx_samples, io_data, args.folder, file_dataset, type_model, args, n_classes)
-            for type_model in options
-        ]
+        run_model = lambda type_model: execute(x, y, id_list, idx_samples, io_data, args.folder, file_dataset, type_model, args, n_classes)
+        if args.parallel:
+            # every model runs in a forked process that shares the loaded dataset
+            scheduler = ModelScheduler(args.cpus, io_data)
+            # the voting model loads the base models once they are saved
+            tasks = [(type_model, get_cfg(args.folder, file_dataset, type_model, args).get_cores(),
+                      [m for m in options if m not in DEPENDENT_MODELS] if type_model in DEPENDENT_MODELS else [])
+                     for type_model in options]
+            failed = scheduler.run(run_model, tasks)
+            if failed:
+                io_data.print_m('Models with errors: {}'.format(', '.join(failed)))
+        else:
+            [run_model(type_model) for type_model in options]
 
     if not args.queue:
         MergeResults(args.folder)
@@ -92,15 +133,21 @@ def execute(x, y, id_list, idx_samples, io_data, folder_experiment, file_dataset
     cfg = get_cfg(folder_experiment, file_dataset, type_model, args)
     is_regression = is_regression_by_config(cfg)
 
-    model = globals()[type_model](io_data, cfg, id_list)
+    model = get_model_class(type_model)(io_data, cfg, id_list)
     print("\n")
     cfg.set_prefix(model.get_prefix())
 
     gt = GPUTracker(cfg.get_prefix())
     gt.start(type_model)
 
-    xtr, xts, ytr, yts, idx_xtr, idx_xts = split_samples(x, y, (args.trainsize / 100), io_data, args.seed, idx_samples, is_regression=is_regression)
-    xtr, ytr, idx_samples = DatasetBalanced().choice_method_balanced(xtr, ytr, args, idx_samples)
+    store = get_memmap_store(args, type_model) if not issparse(x) else None
+    xtr, xts, ytr, yts, idx_xtr, idx_xts = split_samples(x, y, (args.trainsize / 100), io_data, args.seed, idx_samples, is_regression=is_regression, store=store, dtype=args.dtype)
+    xtr, ytr, idx_samples = DatasetBalanced().choice_method_balanced(xtr, ytr, args, idx_samples, n_jobs=ResourceManager(cfg).balancing_jobs)
+    if store is not None and not isinstance(xtr, np.memmap):
+        xtr = store.copy('xtr_balanced', xtr)
+    if issparse(xtr) and not model.ACCEPTS_SPARSE:
+        io_data.print_m('{} does not accept sparse data, the training and test sets are densified'.format(type_model))
+        xtr, xts = densify(xtr), densify(xts)
 
     t = Timer('Training')
     model.train(xtr, ytr)
@@ -130,32 +177,13 @@ def execute_pred(x, y, id_list, idx_samples, io_data, folder_experiment, file_da
     gt = GPUTracker(cfg.get_prefix())
     gt.start(type_model)
 
-    ypr_class, ypr_prob = [], []
-    for xts in x:
-        try:
-            if 'predict_proba' in dir(model):
-                yhat = model.predict_proba(np.array([xts]))
-            else:
-                yhat = model.predict(np.array([xts]))
-        except:
-            xts = tf.expand_dims(xts, -1)
-            yhat = model.predict(np.array([xts]))
-    
-        if not args.regression:
-            ypr_class.append(yhat.argmax(axis=1))
-            ypr_prob.append(np.amax(yhat, axis=1))
-        else:
-            ypr_class.append(-1)
-            ypr_prob.append(np.amax(yhat))
-
-    ypr_class = np.squeeze(ypr_class)
-    ypr_prob = np.squeeze(ypr_prob)
+    ypr_class, ypr_prob = BatchPredictor(model, regression=args.regression, batch_size=args.batch_size).predict(x)
 
     cfg.set_time_end()
 
     # export predictions to csv
-    outfile = 'prediction_{}__{}.csv'.format(splitext(basename(type_model))[0], splitext(basename(args.dataset))[0])
-    df = pd.DataFrame({'Sample ID': idx_samples, 'Predicted class': ypr_class, 'Probability': ypr_prob})
+    outfile = get_prediction_file(type_model, args)
+    df = pd.DataFrame({COL_ID: idx_samples, COL_CLASS: ypr_class, COL_PROBA: ypr_prob})
     df.to_csv(outfile, index=False)
     print('Results saved in {}'.format(outfile))
 
@@ -164,5 +192,57 @@ def execute_pred(x, y, id_list, idx_samples, io_data, folder_experiment, file_da
 
     exit()
 
+
+def execute_pred_stream(io_data, file_dataset, type_model, args):
+    """
+    Predicts the dataset by blocks of --batch-size rows, so that it does not need to fit in memory.
+    Data are normalized with the preprocessing persisted when the model was trained.
+    """
+    cfg = get_basic_cfg(args.folder, file_dataset, args)
+    model = BaseModel.load(type_model)
+    cfg.set_prefix(join(args.folder, basename(type_model)))
+    transform = load_normalization(args, io_data)
+
+    gt = GPUTracker(cfg.get_prefix())
+    gt.start(type_model)
+
+    outfile = get_prediction_file(type_model, args)
+    predictor = BatchPredictor(model, regression=args.regression, batch_size=args.batch_size)
+    n_samples = predictor.predict_stream(read_chunks(file_dataset, args.batch_size, io_data, args.columns, args.dtype), outfile, transform=transform)
+    cfg.set_time_end()
+    print('{} samples predicted. Results saved in {}'.format(n_samples, outfile))
+
+    gt.stop()
+    gt.plot()
+
+
+def load_normalization(args, io_data):
+    """
+    Preprocessing persisted when the models were trained, applied to the samples predicted with -m.
+    @return: transform function, None when the prediction run does not ask for normalization (-n)
+    """
+    if not args.normalize:
+        return None
+    file_normalization = join(args.folder, DataNormalization.FILE_PERSISTED)
+    if not exists(file_normalization):
+        io_data.print_e('Predictions need the normalization persisted during training: {}'.format(file_normalization))
+    return DataNormalization.load(file_normalization).transform
+
+
+def get_memmap_store(args, *subfolders):
+    """
+    Folder of the memory-mapped matrices of the experiment (--memmap), or None when they are kept in memory
+    """
+    if not args.memmap:
+        return None
+    return MemmapStore(join(args.memmap, basename(os.path.normpath(args.folder)), *subfolders))
+
+
+def get_prediction_file(type_model, args):
+    return 'prediction_{}__{}.csv'.format(splitext(basename(type_model))[0], splitext(basename(args.dataset))[0])
+
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve(sys.argv[2:])
+    else:
+        main()